@@ -1,70 +1,87 @@
-import ccxt
-import pandas as pd
-import matplotlib.pyplot as plt
-from io import BytesIO
 import asyncio
+import os
 import nest_asyncio
 from telegram import Bot
 import config3  # Import the config3 module
+from market_data import MarketDataClient
+from candle_buffer import Candles
+from tick_scheduler import TickScheduler
+from prescan import prescan_amplitude
+from telegram_outbox import TelegramOutbox
+from state_store import state
 
 interval = '4h'  # 1-day candlesticks
+cycle_timeframe = '15m'  # Polling cycles run just after each bar of this timeframe closes
 
-# Initialize bybitclient
-bybit= ccxt.bybit({
-    'apiKey': config3.API_KEY,
-    'secret': config3.API_SECRET,
-})
+# Maximum number of prescan candidates checked per pass (None for no limit)
+prescan_top_n = 100
+
+# Initialize shared async market-data client
+market_data = MarketDataClient(config3.API_KEY, config3.API_SECRET)
+
+# Wakes the polling loop just after each cycle_timeframe bar closes on the exchange clock
+ticks = TickScheduler(cycle_timeframe, market_data)
+
+# State kept in the state store under this script's name, restored after a restart
+state_scope = os.path.basename(__file__)
 
 # Dictionary to store the last alert messages for each symbol
-last_alert_messages = {}
+last_alert_messages = state.mapping(state_scope, 'last_alert_messages')
 
 # Function to get historical candlestick data
-def get_historical_data(symbol, interval, limit=10):
-    ohlcv = bybit.fetch_ohlcv(symbol, interval, limit=limit)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    return df
+async def get_historical_data(symbol, interval, limit=10):
+    ohlcv = await market_data.fetch_ohlcv(symbol, interval, limit=limit)
+    return Candles.from_ohlcv(ohlcv)
 
 # Function to calculate amplitude ratio
-def calculate_amplitude_ratio(df):
-    prev_day_high = df['high'].iloc[-1]
-    prev_day_low = df['low'].iloc[-1]
+def calculate_amplitude_ratio(candles):
+    prev_day_high = candles.high[-1]
+    prev_day_low = candles.low[-1]
     amplitude_ratio = prev_day_high / prev_day_low
     return amplitude_ratio
 
-# Function to send Telegram message (async)
-async def send_telegram_message(symbol, message):
-    # Check if the current message is the same as the previous one for this symbol
-    if last_alert_messages.get(symbol) != message:
-        await telegram_bot.send_message(chat_id=config3.CHAT_ID, text=message)
-        # Update the last alert message for this symbol
-        last_alert_messages[symbol] = message
+# Function to queue a Telegram message, bursts are merged into one message
+def send_telegram_message(symbol, message):
+    # The outbox skips messages already sent or queued for this symbol
+    telegram_outbox.submit(symbol, message)
+
+# Function to check a single symbol for an amplitude alert
+async def process_symbol(symbol):
+    try:
+        # Get historical data
+        historical_data = await get_historical_data(symbol, interval)
+        
+        # Calculate amplitude ratio
+        amplitude_ratio = calculate_amplitude_ratio(historical_data)
+
+        # If amplitude ratio is significant, send an alert
+        if amplitude_ratio >= 1.10:  # Change threshold as needed
+            message = f'/set_symbols #{symbol} - {amplitude_ratio:.2f}'
+            send_telegram_message(symbol, message)
+
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
 
 # Main function (async)
 async def main():
     while True:
-        for symbol in config3.SELECTED_SYMBOLS:
-            try:
-                # Get historical data
-                historical_data = get_historical_data(symbol, interval)
-                
-                # Calculate amplitude ratio
-                amplitude_ratio = calculate_amplitude_ratio(historical_data)
-
-                # If amplitude ratio is significant, send an alert
-                if amplitude_ratio >= 1.10:  # Change threshold as needed
-                    message = f'/set_symbols #{symbol} - {amplitude_ratio:.2f}'
-                    await send_telegram_message(symbol, message)
+        # Rank symbols by 24h amplitude from one all-tickers request, then fetch candles only for candidates
+        try:
+            candidates = await prescan_amplitude(market_data, config3.SELECTED_SYMBOLS, 1.10, prescan_top_n)
+        except Exception as e:
+            print(f"Prescan failed, checking all symbols: {e}")
+            candidates = config3.SELECTED_SYMBOLS
 
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
+        # Check the candidates concurrently
+        await market_data.run_for_symbols(candidates, process_symbol)
+        print(telegram_outbox.summary())
 
-        # Sleep for a specified interval before checking again
-        await asyncio.sleep(900)  # Adjust the sleep duration as needed
+        # Wait for the next bar close before checking again
+        await ticks.wait()
 
 # Initialize Telegram Bot
 telegram_bot = Bot(token=config3.TELEGRAM_TOKEN)
+telegram_outbox = TelegramOutbox(telegram_bot, config3.CHAT_ID, last_alert_messages)
 
 # Use nest_asyncio to allow running asyncio in Jupyter notebooks
 nest_asyncio.apply()
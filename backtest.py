@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import ccxt
+from market_data import MarketDataClient
+from candle_store import CandleStore
+
+# Vectorized backtests of the live signal rules over OHLCV from the local candle store.
+# Signals are computed for every bar at once with numpy/pandas, evaluated as the live loops
+# see them right after bar i closes: iloc[-2] is bar i and higher-timeframe references are
+# taken as of the next bar's open. Fills happen at the next bar's open (the trigger_price
+# the live scripts send is the forming bar's close at that moment).
+
+FEE_RATE = 0.00055  # Bybit taker fee per side
+
+SIGNAL_COLUMNS = ['enter_long', 'enter_short', 'exit_long', 'exit_short']
+SUMMARY_COLUMNS = ['symbol', 'strategy', 'trades', 'wins', 'win_rate', 'pnl', 'open'] + SIGNAL_COLUMNS
+
+# Function to run ewm(span=period, adjust=False), optionally with ta's min_periods
+def ema(values, period, min_periods=0):
+    return pd.Series(values).ewm(span=period, adjust=False, min_periods=min_periods).mean().to_numpy()
+
+# Function to get each bar's previous higher-timeframe close and amplitude, and optionally the forming amplitude
+def higher_timeframe(bars, timeframe, forming=False):
+    tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    n = len(bars['timestamp'])
+    bucket = bars['timestamp'] // tf_ms
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    highs = np.maximum.reduceat(bars['high'], starts)
+    lows = np.minimum.reduceat(bars['low'], starts)
+    closes = bars['close'][np.r_[starts[1:] - 1, n - 1]]
+
+    # The live scripts read the previous closed bucket (ohlcv[-2]) at the time the next bar opens
+    eval_group = np.r_[group[1:], group[-1]]
+    prev = eval_group - 1
+    valid = prev >= 0
+    prev = np.where(valid, prev, 0)
+    prev_close = np.where(valid, closes[prev], np.nan)
+    prev_amplitude = np.where(valid, highs[prev] / lows[prev], np.nan)
+
+    if not forming:
+        return prev_close, prev_amplitude, None
+
+    # High/low of the bucket containing each bar, up to and including that bar
+    forming_high = pd.Series(bars['high']).groupby(group).cummax().to_numpy()
+    forming_low = pd.Series(bars['low']).groupby(group).cummin().to_numpy()
+    return prev_close, prev_amplitude, forming_high / forming_low
+
+# Function to mark bars where a series crosses above/below another (bar i vs bar i-1)
+def crosses(short, long):
+    short_prev = np.r_[np.nan, short[:-1]]
+    long_prev = np.r_[np.nan, long[:-1]]
+    cross_over = (short > long) & (short_prev <= long_prev)
+    cross_under = (short < long) & (short_prev >= long_prev)
+    return cross_over, cross_under
+
+# Strategy signal functions return (enter_long, enter_short, exit_long, exit_short) boolean arrays
+
+# main.py entries (check_sma_crossover_vs_day_open) with exit.py exits, day open taken from 4h bars
+def sma_day_open_signals(bars, short_period=3, amplitude_threshold=1.10, exit_amplitude_threshold=1.01,
+                         reference_timeframe='4h'):
+    day_open, amplitude, _ = higher_timeframe(bars, reference_timeframe)
+    sma = pd.Series(bars['close']).rolling(short_period).mean().to_numpy()
+    sma_prev = np.r_[np.nan, sma[:-1]]
+    entry_ok = amplitude >= amplitude_threshold
+    exit_ok = amplitude >= exit_amplitude_threshold
+    enter_long = entry_ok & (sma > day_open)
+    enter_short = entry_ok & (sma < day_open)
+    exit_long = exit_ok & (sma < day_open) & (sma_prev > day_open)
+    exit_short = exit_ok & (sma > day_open) & (sma_prev < day_open)
+    return enter_long, enter_short, exit_long, exit_short
+
+# main.py entries with day_close exits: leave when SMA(2) falls back under the previous daily close * 1.1
+# (longs) or climbs back over it * 0.9 (shorts)
+def sma_day_close_signals(bars, short_period=3, amplitude_threshold=1.10, exit_short_period=2,
+                          exit_upper=1.1, exit_lower=0.9):
+    enter_long, enter_short, _, _ = sma_day_open_signals(bars, short_period, amplitude_threshold)
+    weekly_open, _, _ = higher_timeframe(bars, '1d')
+    sma = pd.Series(bars['close']).rolling(exit_short_period).mean().to_numpy()
+    sma_prev = np.r_[np.nan, sma[:-1]]
+    exit_long = (sma_prev > weekly_open * exit_upper) & (sma < weekly_open * exit_upper)
+    exit_short = (sma_prev < weekly_open * exit_lower) & (sma > weekly_open * exit_lower)
+    return enter_long, enter_short, exit_long, exit_short
+
+# emamain.py entries and emaexit.py exits (check_ema_crossover), gated by the two-day amplitude filter
+def ema_crossover_signals(bars, short_period=10, long_period=200, exit_short_period=5, exit_long_period=50,
+                          amplitude_threshold=1.20):
+    _, prev_day_amplitude, curr_day_amplitude = higher_timeframe(bars, '1d', forming=True)
+    amplitude_ok = (prev_day_amplitude >= amplitude_threshold) | (curr_day_amplitude >= amplitude_threshold)
+    closes = bars['close']
+    enter_long, enter_short = crosses(ema(closes, short_period), ema(closes, long_period))
+    exit_long, exit_short = crosses(ema(closes, exit_short_period), ema(closes, exit_long_period))
+    return amplitude_ok & enter_long, amplitude_ok & enter_short, amplitude_ok & exit_long, amplitude_ok & exit_short
+
+# ema/ema2 (check_ema_conditions), with the forming-bar peek approximated by the bar's close
+def ema_conditions_signals(bars, short_period=2, long_period=20):
+    ema_short = ema(bars['close'], short_period)
+    ema_long = ema(bars['close'], long_period)
+    enter_long, enter_short = crosses(ema_short, ema_long)
+    return enter_long, enter_short, ema_short < ema_long, ema_short > ema_long
+
+# macdalert (check_macd_cross); it only alerts, so the opposite cross closes the position
+def macd_cross_signals(bars, window_fast=12, window_slow=26, window_sign=9):
+    closes = bars['close']
+    macd = ema(closes, window_fast, window_fast) - ema(closes, window_slow, window_slow)
+    histogram = macd - ema(macd, window_sign, window_sign)
+    histogram_prev = np.r_[np.nan, histogram[:-1]]
+    cross_over = histogram > histogram_prev
+    cross_under = histogram_prev > histogram
+    return cross_over, cross_under, cross_under, cross_over
+
+STRATEGIES = {
+    'sma_day_open': sma_day_open_signals,
+    'sma_day_close': sma_day_close_signals,
+    'ema_crossover': ema_crossover_signals,
+    'ema_conditions': ema_conditions_signals,
+    'macd_cross': macd_cross_signals,
+}
+
+# Function to get, for every bar, the index of the next True at or after it (len(mask) if none)
+def next_true(mask):
+    n = len(mask)
+    index = np.where(mask, np.arange(n), n)
+    return np.r_[np.minimum.accumulate(index[::-1])[::-1], n, n]
+
+# Function to simulate the position_status state machine from ema/ema2 on signal arrays.
+# Flat -> long on enter_long, long -> flat on exit_long, and the same for shorts; a position
+# opened on a bar can be closed from the next bar on, and re-entry waits for the bar after an exit.
+# Only signal bars are visited, so the loop runs once per trade rather than once per bar.
+def simulate_positions(enter_long, enter_short, exit_long, exit_short):
+    n = len(enter_long)
+    next_enter_long, next_enter_short = next_true(enter_long), next_true(enter_short)
+    next_exit_long, next_exit_short = next_true(exit_long), next_true(exit_short)
+    trades = []
+    bar = 0
+    while bar < n:
+        long_at, short_at = next_enter_long[bar], next_enter_short[bar]
+        if long_at >= n and short_at >= n:
+            break
+        if long_at <= short_at:
+            side, entry, exit_ = 1, long_at, next_exit_long[long_at + 1]
+        else:
+            side, entry, exit_ = -1, short_at, next_exit_short[short_at + 1]
+        trades.append((side, entry, exit_))
+        bar = exit_ + 1
+    return trades
+
+# Per-symbol backtest result
+class BacktestResult:
+    def __init__(self, symbol, strategy, trades, signal_counts):
+        self.symbol = symbol
+        self.strategy = strategy
+        self.trades = trades  # DataFrame, one row per trade
+        self.signal_counts = signal_counts
+
+    def summary(self):
+        closed = self.trades[~self.trades['open']]
+        return {
+            'symbol': self.symbol,
+            'strategy': self.strategy,
+            'trades': len(self.trades),
+            'wins': int((closed['pnl'] > 0).sum()),
+            'win_rate': float((closed['pnl'] > 0).mean()) if len(closed) else 0.0,
+            'pnl': float(self.trades['pnl'].sum()),
+            'open': bool(self.trades['open'].any()),
+            **self.signal_counts,
+        }
+
+# Function to backtest one strategy on one symbol's bars
+def backtest_symbol(symbol, bars, strategy='sma_day_open', fee_rate=FEE_RATE, **params):
+    n = len(bars['close'])
+    if n:
+        signals = STRATEGIES[strategy](bars, **params)
+        fill = np.r_[bars['open'][1:], bars['close'][-1]]
+    else:
+        # No bars: no signals and no trades, but the same (empty) table
+        signals = (np.zeros(0, dtype=bool),) * 4
+        fill = np.zeros(0)
+    enter_long, enter_short, exit_long, exit_short = signals
+    trades = simulate_positions(*signals)
+
+    side = np.array([t[0] for t in trades], dtype=np.int8)
+    entry = np.array([t[1] for t in trades], dtype=np.int64)
+    exit_ = np.array([t[2] for t in trades], dtype=np.int64)
+    is_open = exit_ >= n
+    exit_ = np.minimum(exit_, n - 1)  # Open positions are marked at the last close
+    entry_price = fill[entry]
+    exit_price = np.where(is_open, bars['close'][-1] if n else np.nan, fill[exit_])
+    pnl = side * (exit_price / entry_price - 1) - fee_rate * (1 + ~is_open)
+
+    frame = pd.DataFrame({
+        'entry_time': pd.to_datetime(bars['timestamp'][entry], unit='ms'),
+        'exit_time': pd.to_datetime(bars['timestamp'][exit_], unit='ms'),
+        'side': np.where(side > 0, 'long', 'short'),
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'pnl': pnl,
+        'open': is_open,
+    })
+    signal_counts = {
+        'enter_long': int(enter_long.sum()),
+        'enter_short': int(enter_short.sum()),
+        'exit_long': int(exit_long.sum()),
+        'exit_short': int(exit_short.sum()),
+    }
+    return BacktestResult(symbol, strategy, frame, signal_counts)
+
+# Function to backtest one strategy across symbols, returning the results and a summary table
+# (with its columns even when there are no symbols)
+def run_backtest(history, strategy='sma_day_open', fee_rate=FEE_RATE, **params):
+    results = [backtest_symbol(symbol, bars, strategy, fee_rate, **params) for symbol, bars in history.items()]
+    table = pd.DataFrame([result.summary() for result in results], columns=SUMMARY_COLUMNS)
+    return results, table
+
+# Function to read stored history for symbols as zero-copy column views
+def history_from_store(store, symbols, timeframe, since=None):
+    history = {}
+    for symbol in symbols:
+        stored = store.load(symbol, timeframe)
+        if stored is not None:
+            history[symbol] = stored.bars(since)
+    return history
+
+# Function to build random-walk bars for benchmarking
+def synthetic_bars(count, timeframe='1m', seed=0, start_ms=1_700_000_000_000):
+    rng = np.random.default_rng(seed)
+    tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.003, count)) * close
+    return {
+        'timestamp': start_ms - start_ms % tf_ms + np.arange(count, dtype=np.int64) * tf_ms,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+    }
+
+async def load_history(args, store, since):
+    if not args.no_sync:
+        market_data = MarketDataClient()
+        try:
+            await store.sync_symbols(market_data, args.symbols, args.timeframe, since)
+        finally:
+            await market_data.close()
+    return history_from_store(store, args.symbols, args.timeframe, since)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the live signal rules over historical candles")
+    parser.add_argument('--strategy', choices=list(STRATEGIES) + ['all'], default='all')
+    parser.add_argument('--symbols', nargs='+', default=['BTC/USDT', 'ETH/USDT'])
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--synthetic', type=int, default=0, help="Use N random-walk symbols instead of exchange data")
+    parser.add_argument('--fee-rate', type=float, default=FEE_RATE)
+    parser.add_argument('--no-sync', action='store_true', help="Use the candle store as is, without downloading")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        bars_per_symbol = args.days * 86_400_000 // (ccxt.Exchange.parse_timeframe(args.timeframe) * 1000)
+        history = {f"SYN{i}/USDT": synthetic_bars(bars_per_symbol, args.timeframe, seed=i) for i in range(args.synthetic)}
+    else:
+        since = int(time.time() * 1000) - args.days * 86_400_000
+        history = asyncio.run(load_history(args, CandleStore(), since))
+
+    strategies = list(STRATEGIES) if args.strategy == 'all' else [args.strategy]
+    pd.set_option('display.width', 200)
+    for strategy in strategies:
+        start = time.perf_counter()
+        _, table = run_backtest(history, strategy, args.fee_rate)
+        elapsed = time.perf_counter() - start
+        bars = sum(len(bars['close']) for bars in history.values())
+        print(f"\n{strategy}: {len(history)} symbols, {bars} bars in {elapsed:.2f}s")
+        print(table.sort_values('pnl', ascending=False).head(20).to_string(index=False))
+        print(f"Total trades {table['trades'].sum()}, total pnl {table['pnl'].sum():.4f}")
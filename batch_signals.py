@@ -0,0 +1,36 @@
+import numpy as np
+
+# Cross-symbol signal evaluation on a (symbols x bars) close matrix, used by main.py's polling cycle.
+# Column -1 is the forming bar and column -2 the latest closed bar, matching the
+# [-1]/[-2] reads of the candles in the per-symbol check functions. The EMA and MACD scripts
+# keep per-symbol indicators.IndicatorSeries instead, which update in O(1) per new bar.
+
+# Function to align the latest `bars` closes of each symbol into one matrix, left-padded with NaN
+def align_closes(columns, bars):
+    matrix = np.full((len(columns), bars), np.nan)
+    for row, closes in enumerate(columns):
+        closes = np.asarray(closes, dtype=np.float64)[-bars:]
+        matrix[row, bars - len(closes):] = closes
+    return matrix
+
+# Function to get the rolling mean ending at column `at` of each row (or of one symbol's closes),
+# like rolling(period).mean().iloc[at]
+def rolling_mean_at(matrix, period, at=-2):
+    end = matrix.shape[-1] + at + 1
+    if end - period < 0:
+        return np.full(matrix.shape[:-1], np.nan)
+    return matrix[..., end - period:end].mean(axis=-1)
+
+# Function to evaluate check_sma_crossover_vs_day_open and the amplitude filter for all symbols
+def sma_vs_day_open_signals(symbols, closes, day_open, amplitude, short_period=3, amplitude_threshold=1.10,
+                            long_action="enter_long", short_action="enter_short"):
+    sma = rolling_mean_at(closes, short_period)
+    amplitude_ok = np.asarray(amplitude) >= amplitude_threshold
+    return triggered(symbols, amplitude_ok & (sma > day_open), amplitude_ok & (sma < day_open), long_action, short_action)
+
+# Function to turn boolean signal vectors into (symbol, action) pairs, long taking precedence like the if/elif
+def triggered(symbols, long_mask, short_mask, long_action, short_action):
+    return [
+        (symbols[row], long_action if long_mask[row] else short_action)
+        for row in np.flatnonzero(long_mask | short_mask)
+    ]
@@ -0,0 +1,87 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from batch_signals import rolling_mean_at
+from candle_buffer import Candles, CandleBuffer
+from htf_cache import previous_close, previous_amplitude
+
+# Per-symbol CPU cost of main.py's signal path: candles in, crossover flags and close price out.
+# "dataframe" is the original path (a DataFrame with a datetime index per 1m fetch and per 4h
+# reference value), "candles" builds Candles from the same ccxt rows, and "buffer" reads them as
+# views of a CandleBuffer, as the scripts do now.
+
+# Function to generate ccxt-style [timestamp, open, high, low, close, volume] rows as a random walk
+def synthetic_ohlcv(count, timeframe_ms, seed, start_ms=1_700_000_000_000):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    spread = np.abs(rng.normal(0, 0.001, count)) * closes
+    return [[start_ms + i * timeframe_ms, float(opens[i]), float(max(opens[i], closes[i]) + spread[i]),
+             float(min(opens[i], closes[i]) - spread[i]), float(closes[i]), float(rng.uniform(1, 100))]
+            for i in range(count)]
+
+# Function to build a DataFrame the way the scripts used to for every fetch
+def legacy_frame(ohlcv):
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+    return df
+
+def dataframe_path(ohlcv, reference):
+    df = legacy_frame(ohlcv)
+    day_open_price = legacy_frame(reference)['close'].iloc[-2]
+    df_daily = legacy_frame(reference)
+    amplitude_ratio = df_daily['high'].iloc[-2] / df_daily['low'].iloc[-2]
+    df['sma_short'] = df['close'].rolling(window=3).mean()
+    sma = df['sma_short'].iloc[-2]
+    return sma > day_open_price, sma < day_open_price, df['close'].iloc[-1], amplitude_ratio
+
+def candles_path(candles, reference):
+    day_open_price = previous_close(reference)
+    amplitude_ratio = previous_amplitude(reference)
+    sma = rolling_mean_at(candles.close, 3)
+    return sma > day_open_price, sma < day_open_price, candles.close[-1], amplitude_ratio
+
+# Function to time `evaluate` over every symbol, returning CPU microseconds per symbol
+def measure(evaluate, inputs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        for args in inputs:
+            evaluate(*args)
+        best = min(best, time.process_time() - start)
+    return best / len(inputs) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-symbol CPU cost of the DataFrame and Candles signal paths")
+    parser.add_argument('--symbols', type=int, default=400)
+    parser.add_argument('--bars', type=int, default=20, help="1m bars per symbol (main.py fetches 20)")
+    parser.add_argument('--repeat', type=int, default=5, help="Passes per path, the fastest is reported")
+    args = parser.parse_args()
+
+    rows = [synthetic_ohlcv(args.bars, 60_000, seed) for seed in range(args.symbols)]
+    references = [synthetic_ohlcv(5, 14_400_000, seed) for seed in range(args.symbols)]
+    buffers = []
+    for ohlcv in rows:
+        buffer = CandleBuffer(args.bars)
+        buffer.merge(ohlcv)
+        buffers.append(buffer)
+
+    # Every path must reach the same signals before its cost means anything
+    for ohlcv, buffer, reference in zip(rows, buffers, references):
+        expected = dataframe_path(ohlcv, reference)
+        for candles in (Candles.from_ohlcv(ohlcv), buffer.candles()):
+            result = candles_path(candles, reference)
+            assert result[:2] == expected[:2] and np.isclose(result[2:], expected[2:]).all()
+
+    results = {
+        'dataframe': measure(dataframe_path, list(zip(rows, references)), args.repeat),
+        'candles': measure(lambda ohlcv, reference: candles_path(Candles.from_ohlcv(ohlcv), reference),
+                           list(zip(rows, references)), args.repeat),
+        'buffer': measure(lambda buffer, reference: candles_path(buffer.candles(), reference),
+                          list(zip(buffers, references)), args.repeat),
+    }
+    print(f"Symbols: {args.symbols}, bars: {args.bars}, CPU time per symbol (best of {args.repeat}):")
+    for name, cost in results.items():
+        print(f"  {name:>9}: {cost:8.1f} us  ({results['dataframe'] / cost:5.1f}x)")
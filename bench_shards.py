@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from functools import partial
+import numpy as np
+from candle_buffer import CandleBufferSet
+from fake_exchange import FakeExchange
+from rate_limiter import BUCKETS, RequestScheduler
+from shard_pool import ShardPool
+from tick_scheduler import TickScheduler
+from webhook_stub_server import start_stub
+from state_store import state
+
+# Scaling benchmark for shard_pool: runs a strategy script over 1..N worker processes against
+# FakeExchange for a fixed time and reports the cycle time of each shard (what has to fit inside
+# the script's cycle cadence) and how many signals the coordinator delivered to the webhook stub.
+# The first cycle of every shard fetches full history and is not counted.
+
+DEFAULT_WORKERS = [1, 2, 4]
+
+# Function to point a worker at the fake exchange, run at `timeframe` and keep its output and metrics port quiet.
+# Its candle buffers have no store, as in bench_strategies, so synthetic bars never reach the live candles/.
+def fake_setup(latency, timeframe, module, shard):
+    module.market_data.exchange = FakeExchange(latency=latency)
+    module.market_data.scheduler = RequestScheduler({name: (1e9, 1e9) for name in BUCKETS})
+    module.candle_buffers = CandleBufferSet(module.market_data)
+    module.ticks = TickScheduler(timeframe, module.market_data, delay=0)
+    module.metrics_port = None
+    sys.stdout = open(os.devnull, 'w')
+
+# Shard pool that keeps every cycle duration
+class BenchPool(ShardPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = {}
+
+    def record_cycle(self, shard, symbols, seconds):
+        self.durations.setdefault(shard, []).append(seconds)
+        super().record_cycle(shard, symbols, seconds)
+
+async def measure(path, workers, count, seconds, latency, timeframe):
+    state.open(None)  # Benchmark alerts must not reach the live scripts' saved state
+    pool = BenchPool(path, workers, setup=partial(fake_setup, latency, timeframe), state_path=None)
+    pool.module.selected_symbols = [f"SYN{i:03d}/USDT" for i in range(count)]
+    stub, url, _ = await start_stub(latency=latency)
+    pool.module.webhook.url = url
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            task = asyncio.create_task(pool.run())
+            await asyncio.sleep(seconds)
+            task.cancel()
+            await pool.close()
+    finally:
+        await stub.cleanup()
+
+    per_shard = [durations[1:] for durations in pool.durations.values() if len(durations) > 1]
+    durations = [duration for shard in per_shard for duration in shard]
+    if not durations:
+        raise RuntimeError(f"No cycles completed in {seconds}s, run longer")
+    return {
+        'workers': workers,
+        'symbols': count,
+        'cycles': len(durations),
+        'p50_cycle_s': float(np.percentile(durations, 50)),
+        'max_cycle_s': max(durations),
+        'slowest_shard_s': max(sum(shard) / len(shard) for shard in per_shard),
+        'forwarded': pool.stats['signals'],
+        'delivered': pool.module.webhook.stats['delivered'],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark shard_pool worker counts against a fake exchange")
+    parser.add_argument('--strategy', default='main.py')
+    parser.add_argument('--workers', nargs='+', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--symbols', type=int, default=400)
+    parser.add_argument('--seconds', type=float, default=20, help="Run time per worker count")
+    parser.add_argument('--timeframe', default='1s', help="Cycle cadence used instead of the script's own")
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake exchange and webhook latency in seconds")
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        started = time.perf_counter()
+        case = asyncio.run(measure(args.strategy, workers, args.symbols, args.seconds, args.latency, args.timeframe))
+        print(f"{workers:>2} workers, {case['symbols']} symbols: {case['cycles']} cycles, p50 {case['p50_cycle_s']:.3f}s, "
+              f"max {case['max_cycle_s']:.3f}s, slowest shard avg {case['slowest_shard_s']:.3f}s, "
+              f"{case['forwarded']} signals forwarded, {case['delivered']} delivered "
+              f"({time.perf_counter() - started:.0f}s)")
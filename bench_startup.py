@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold-start benchmark: loads each strategy script in a fresh interpreter, as the supervisor does
+# after a restart, and reports how long the import takes, which heavy modules it pulled in, the
+# RSS after import, and how long the first cycle (the earliest a signal can go out) takes against
+# FakeExchange, starting from an empty candle store in a temporary directory so the synthetic bars
+# never reach the live one. Shared modules the alert scripts load are timed the same way.
+
+DEFAULT_STRATEGIES = ['main.py', 'emamain.py']
+DEFAULT_MODULES = ['chart_renderer', 'telegram_outbox']
+HEAVY_MODULES = ('ccxt', 'pandas', 'telegram', 'matplotlib', 'mplfinance', 'ta', 'websockets')
+
+# Function to load a script or module in this (fresh) interpreter and run its first cycle, returns timings
+def child(target, symbols, latency):
+    started = time.perf_counter()
+    import asyncio
+    import contextlib
+    import importlib
+    import resource
+    from importlib.machinery import SourceFileLoader
+    from state_store import state
+    state.open(None)  # Keep the live scripts' saved state out of the benchmark
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if os.path.exists(target):
+            loader = SourceFileLoader('strategy', target)
+            module = importlib.util.module_from_spec(importlib.util.spec_from_loader('strategy', loader))
+            loader.exec_module(module)
+        else:
+            module = importlib.import_module(target)
+    result = {
+        'import_s': time.perf_counter() - started,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'heavy': [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+    if not hasattr(module, 'run_cycle'):
+        return result
+
+    from candle_store import CandleStore
+    from fake_exchange import FakeExchange
+    from webhook_stub_server import start_stub
+
+    async def first_cycle():
+        module.market_data.exchange = FakeExchange(latency=latency)
+        candle_buffers = getattr(module, 'candle_buffers', None)
+        if candle_buffers is not None:
+            candle_buffers.store = CandleStore(store_dir)
+        module.selected_symbols = [f"SYN{i:03d}/USDT" for i in range(symbols)]
+        stub, url, _ = await start_stub(latency=latency)
+        webhook = getattr(module, 'webhook', None)
+        if webhook is not None:
+            webhook.url = url
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                await module.run_cycle()
+                elapsed = time.perf_counter() - start
+                if webhook is not None:
+                    await webhook.close()
+            if candle_buffers is not None:
+                await candle_buffers.flush()
+        finally:
+            await stub.cleanup()
+        return elapsed
+
+    store_dir = tempfile.mkdtemp(prefix='bench_startup_candles_')
+    try:
+        result['first_cycle_s'] = asyncio.run(first_cycle())
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    result['first_signal_s'] = result['import_s'] + result['first_cycle_s']
+    return result
+
+# Function to measure one target in a new interpreter, `process_s` includes interpreter startup
+def run_child(target, symbols, latency):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, __file__, '--child', target, '--symbols', str(symbols),
+                             '--latency', str(latency)], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    result['process_s'] = time.perf_counter() - start
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start import and first-cycle latency of the strategy scripts")
+    parser.add_argument('--strategies', nargs='+', default=DEFAULT_STRATEGIES)
+    parser.add_argument('--modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake exchange and webhook latency in seconds")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes per target, medians are reported")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.symbols, args.latency)))
+        sys.exit(0)
+
+    for target in args.strategies + args.modules:
+        runs = [run_child(target, args.symbols, args.latency) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0] if key != 'heavy'}
+        line = f"{target:>16}: import {median['import_s']:.3f}s, process {median['process_s']:.3f}s, RSS {median['rss_mb']:.0f} MB"
+        if 'first_cycle_s' in median:
+            line += f", first cycle {median['first_cycle_s']:.3f}s, first signal {median['first_signal_s']:.3f}s"
+        print(line)
+        print(f"{'':>16}  loaded: {', '.join(runs[0]['heavy']) or 'none'}")
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from fake_exchange import FakeExchange
+from market_data import MarketDataClient
+from rate_limiter import BUCKETS, RequestScheduler
+from candle_buffer import CandleBufferSet
+from htf_cache import HigherTimeframeCache
+from runner import load_plugin
+from webhook_stub_server import start_stub
+from state_store import state
+
+# Throughput benchmark for the strategy loops: runs each script's real run_cycle() against
+# FakeExchange at several universe sizes, writes the results as JSON and compares them with a
+# saved baseline. Every case runs in a fresh process so peak RSS is its own.
+
+DEFAULT_STRATEGIES = ['main.py', 'emamain.py']
+DEFAULT_SIZES = [10, 100, 400]
+REGRESSION_THRESHOLD = 0.2  # Allowed relative slowdown / growth before a case counts as regressed
+
+async def measure(path, count, cycles, warmup, latency, exchange_limits):
+    state.open(None)  # Benchmark alerts must not reach the live scripts' saved state
+    market_data = MarketDataClient(scheduler=None if exchange_limits else
+                                   RequestScheduler({name: (1e9, 1e9) for name in BUCKETS}))
+    market_data.exchange = FakeExchange(latency=latency)
+    plugin = load_plugin(path, market_data, CandleBufferSet(market_data), HigherTimeframeCache(market_data))
+    module = plugin.module
+    module.selected_symbols = [f"SYN{i:03d}/USDT" for i in range(count)]
+
+    stub, url, _ = await start_stub(latency=latency)
+    module.webhook.url = url
+    durations = []
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for cycle in range(warmup + cycles):
+                start = time.perf_counter()
+                await module.run_cycle()
+                if cycle >= warmup:
+                    durations.append(time.perf_counter() - start)
+            await module.webhook.close()
+    finally:
+        await stub.cleanup()
+
+    return {
+        'strategy': plugin.name,
+        'symbols': count,
+        'cycles': cycles,
+        'cycles_per_sec': cycles / sum(durations),
+        'symbols_per_sec': count * cycles / sum(durations),
+        'p50_cycle_s': float(np.percentile(durations, 50)),
+        'p99_cycle_s': float(np.percentile(durations, 99)),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'requests': market_data.exchange.calls.get('fetch_ohlcv', 0),
+    }
+
+def run_case(*args):
+    return asyncio.run(measure(*args))
+
+# Function to list the cases that got slower or bigger than the baseline by more than `threshold`
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    previous = {(case['strategy'], case['symbols']): case for case in baseline['results']}
+    regressions = []
+    for case in results['results']:
+        base = previous.get((case['strategy'], case['symbols']))
+        if base is None:
+            continue
+        name = f"{case['strategy']} @ {case['symbols']} symbols"
+        if case['cycles_per_sec'] < base['cycles_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {case['cycles_per_sec']:.2f} cycles/s, baseline {base['cycles_per_sec']:.2f}")
+        for key in ('p99_cycle_s', 'peak_rss_mb'):
+            if case[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {case[key]:.3f}, baseline {base[key]:.3f}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the strategy loops against a fake exchange")
+    parser.add_argument('--strategies', nargs='+', default=DEFAULT_STRATEGIES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2, help="Cycles run before measuring (history fetch)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake exchange and webhook latency in seconds")
+    parser.add_argument('--exchange-limits', action='store_true', help="Keep the real request budget")
+    parser.add_argument('--output', default='bench_strategies.json')
+    parser.add_argument('--baseline', help="Fail if results regress against this file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--save-baseline', help="Also write the results here as the new baseline")
+    args = parser.parse_args()
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'latency': args.latency,
+        'exchange_limits': args.exchange_limits,
+        'results': [],
+    }
+    context = multiprocessing.get_context('spawn')
+    for path in args.strategies:
+        for count in args.sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                case = pool.submit(run_case, path, count, args.cycles, args.warmup, args.latency,
+                                   args.exchange_limits).result()
+            results['results'].append(case)
+            print(f"{case['strategy']:>12} {count:>4} symbols: {case['cycles_per_sec']:7.2f} cycles/s, "
+                  f"{case['symbols_per_sec']:8.1f} symbols/s, p50 {case['p50_cycle_s']:.3f}s, "
+                  f"p99 {case['p99_cycle_s']:.3f}s, peak RSS {case['peak_rss_mb']:.0f} MB")
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
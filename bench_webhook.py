@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import time
+from webhook_dispatcher import WebhookDispatcher
+from webhook_stub_server import start_stub
+
+# Burst-load throughput check for WebhookDispatcher against the local webhook stand-in
+
+async def run(signals, latency, failure_rate, workers):
+    runner, url, stub = await start_stub(latency=latency, failure_rate=failure_rate)
+    last_alert_messages = {}
+    dispatcher = WebhookDispatcher(url, last_alert_messages, workers=workers, max_queue_size=signals)
+    try:
+        start = time.perf_counter()
+        for i in range(signals):
+            symbol = f"SYM{i}USDT"
+            dispatcher.submit(symbol, "enter_long", {"action": "enter_long", "bot_uuid": "bench", "tv_instrument": symbol})
+        await dispatcher.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        await dispatcher.close()
+        await runner.cleanup()
+
+    print(f"Signals: {signals}, workers: {workers}, stub latency: {latency}s, failure rate: {failure_rate}")
+    print(f"Delivered {dispatcher.stats['delivered']}, failed {dispatcher.stats['failed']}, "
+          f"retries {dispatcher.stats['retries']}, requests received {stub['received']}")
+    print(f"Elapsed {elapsed:.2f}s, {dispatcher.stats['delivered'] / elapsed:.1f} signals/s "
+          f"(sequential blocking posts would need ~{signals * latency:.1f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhook dispatcher burst benchmark")
+    parser.add_argument('--signals', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.signals, args.latency, args.failure_rate, args.workers))
@@ -0,0 +1,178 @@
+import asyncio
+from typing import NamedTuple
+import ccxt
+import numpy as np
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+MIN_STORED_TIMEFRAME = '1m'  # Shorter timeframes are not written to the candle store
+
+# OHLCV candles as parallel NumPy arrays, oldest bar first. The signal functions read scalars
+# straight from the arrays (candles.close[-2]); a DataFrame is only built by to_dataframe() when
+# a chart or a backtest needs one.
+class Candles(NamedTuple):
+    timestamp: np.ndarray  # int64 ms
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    # Function to build candles from ccxt [timestamp, open, high, low, close, volume] rows
+    @classmethod
+    def from_ohlcv(cls, ohlcv):
+        values = np.array(ohlcv, dtype=np.float64).reshape(-1, 6).T
+        return cls(values[0].astype(np.int64), *values[1:])
+
+    # Function to copy the arrays, for readers that keep candles while the buffer takes new bars
+    def copy(self):
+        return Candles(*(column.copy() for column in self))
+
+    # Builds a DataFrame indexed by bar open time (copies), for charts and other pandas-heavy consumers
+    def to_dataframe(self):
+        import pandas as pd  # Imported on first use, the signal path never needs it
+        df = pd.DataFrame({name: getattr(self, name) for name in COLUMNS})
+        df.index = pd.to_datetime(self.timestamp, unit='ms')
+        df.index.name = 'timestamp'
+        return df
+
+# Fixed-capacity OHLCV ring buffer backed by NumPy arrays.
+# Every bar is written twice (at i and i + capacity) so the latest bars are always
+# one contiguous slice, which lets readers get views instead of copies.
+class CandleBuffer:
+    __slots__ = ('capacity', 'timestamps', 'values', 'head', 'size')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.values = np.zeros((len(COLUMNS), 2 * capacity), dtype=np.float64)
+        self.head = 0  # Position of the next write, always in [0, capacity)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[self.head - 1 + self.capacity]) if self.size else None
+
+    def _write(self, pos, bar):
+        for i in (pos, pos + self.capacity):
+            self.timestamps[i] = bar[0]
+            self.values[:, i] = bar[1:6]
+
+    def append(self, bar):
+        self._write(self.head, bar)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def update_last(self, bar):
+        self._write((self.head - 1) % self.capacity, bar)
+
+    # Function to merge ccxt [timestamp, open, high, low, close, volume] rows, updating the forming bar in place
+    def merge(self, ohlcv):
+        for bar in ohlcv:
+            last_timestamp = self.last_timestamp
+            if last_timestamp is None or bar[0] > last_timestamp:
+                self.append(bar)
+            elif bar[0] == last_timestamp:
+                self.update_last(bar)
+
+    # Function to replace the contents with the latest bars of column arrays (timestamps, (5, n) values)
+    def load(self, timestamps, values):
+        count = min(len(timestamps), self.capacity)
+        for start in (0, self.capacity):
+            self.timestamps[start:start + count] = timestamps[len(timestamps) - count:]
+            self.values[:, start:start + count] = values[:, len(timestamps) - count:]
+        self.head = count % self.capacity
+        self.size = count
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    def _window(self):
+        end = self.head + self.capacity
+        return end - self.size, end
+
+    # Zero-copy view of a column, oldest bar first
+    def column(self, name):
+        start, end = self._window()
+        if name == 'timestamp':
+            return self.timestamps[start:end]
+        return self.values[COLUMNS.index(name), start:end]
+
+    # Zero-copy candles over the buffered bars, oldest first
+    def candles(self):
+        start, end = self._window()
+        return Candles(self.timestamps[start:end], *self.values[:, start:end])
+
+# Candle buffers keyed by (symbol, timeframe), refreshed with only the bars newer than the last one held
+# With a CandleStore, new buffers are warmed from disk and closed bars are written back,
+# so a restart only fetches the bars missed while the process was down. Writes are coalesced
+# per series and done by one background task in a worker thread, so the event loop never waits
+# on the store's lock, memmap writes or file rewrites; bars still queued when the process exits
+# are fetched again on the next start. Sub-minute series (main.py's 1s bars) stay in memory:
+# they would add 86,400 bars per symbol per day to the store to save one short warm-up fetch.
+class CandleBufferSet:
+    def __init__(self, market_data, store=None, min_stored_timeframe=MIN_STORED_TIMEFRAME):
+        self.market_data = market_data
+        self.store = store
+        self.min_stored_ms = ccxt.Exchange.parse_timeframe(min_stored_timeframe) * 1000
+        self.buffers = {}
+        self.unsaved = {}  # (symbol, timeframe) -> closed rows waiting for the writer
+        self.writer = None
+
+    def _stored(self, timeframe_ms):
+        return self.store is not None and timeframe_ms >= self.min_stored_ms
+
+    async def refresh(self, symbol, timeframe, limit):
+        key = (symbol, timeframe)
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        buffer = self.buffers.get(key)
+        if buffer is None or buffer.capacity != limit:
+            buffer = self.buffers[key] = CandleBuffer(limit)
+            stored = self.store.load(symbol, timeframe) if self._stored(timeframe_ms) else None
+            if stored is not None:
+                buffer.load(stored.timestamps, stored.values)
+
+        since = buffer.last_timestamp
+        if since is not None and (self.market_data.now_ms() - since) // timeframe_ms >= limit:
+            # Too far behind for an incremental fetch to reach the present, warm up again
+            buffer.clear()
+            since = None
+
+        # Fetching from the last timestamp re-reads the forming bar so it gets its final values
+        ohlcv = await self.market_data.fetch_ohlcv(symbol, timeframe, limit=limit, since=since)
+        buffer.merge(ohlcv)
+        if self._stored(timeframe_ms):
+            # Bars are judged closed now, on the exchange clock, not when the writer gets to them
+            now_ms = self.market_data.server_now_ms()
+            closed = [row for row in ohlcv if row[0] + timeframe_ms <= now_ms]
+            if closed:
+                self.unsaved.setdefault(key, []).extend(closed)
+                if self.writer is None or self.writer.done():
+                    self.writer = asyncio.ensure_future(self._write_unsaved())
+        return buffer
+
+    # Writer task: hands everything queued so far to a worker thread, until nothing is left
+    async def _write_unsaved(self):
+        while self.unsaved:
+            batch, self.unsaved = self.unsaved, {}
+            await asyncio.to_thread(self._write_batch, batch)
+
+    def _write_batch(self, batch):
+        for (symbol, timeframe), rows in batch.items():
+            try:
+                self.store.append(symbol, timeframe, rows, now_ms=float('inf'))  # Already filtered to closed bars
+            except Exception as e:
+                print(f"Error storing candles for {symbol}: {e}")
+
+    # Function to wait until every queued bar is written
+    async def flush(self):
+        while self.writer is not None and not self.writer.done():
+            await self.writer
+
+    def discard(self, symbols):
+        keep = set(symbols)
+        for key in [key for key in self.buffers if key[0] not in keep]:
+            del self.buffers[key]
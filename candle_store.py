@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import fcntl
+import os
+import time
+import numpy as np
+import ccxt
+from candle_buffer import COLUMNS
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'candles')
+PAGE_LIMIT = 1000
+
+# File layout: a 64-byte header (magic, count, capacity, timeframe ms), then the int64 timestamp
+# column and the float64 open/high/low/close/volume columns, each `capacity` slots long.
+# Rows past `count` are unused, so appends only write new slots and then bump the count.
+MAGIC = b'OHLCV001'
+HEADER_SIZE = 64
+MIN_CAPACITY = 1024
+
+# Function to turn a symbol into a file name ('BTC/USDT:USDT' -> 'BTCUSDT_USDT')
+def symbol_filename(symbol):
+    return symbol.replace('/', '').replace(':', '_')
+
+# Read-only zero-copy view of one stored (symbol, timeframe) series
+class StoredCandles:
+    __slots__ = ('timestamps', 'values', 'timeframe_ms')
+
+    def __init__(self, timestamps, values, timeframe_ms):
+        self.timestamps = timestamps
+        self.values = values
+        self.timeframe_ms = timeframe_ms
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[-1]) if len(self.timestamps) else None
+
+    def column(self, name):
+        if name == 'timestamp':
+            return self.timestamps
+        return self.values[COLUMNS.index(name)]
+
+    # Function to get the bars from `since` on as a dict of column views (the backtest bars format)
+    def bars(self, since=None):
+        start = int(np.searchsorted(self.timestamps, since)) if since is not None else 0
+        bars = {'timestamp': self.timestamps[start:]}
+        for i, name in enumerate(COLUMNS):
+            bars[name] = self.values[i, start:]
+        return bars
+
+    # Function to get the missing ranges as (first missing timestamp, last missing timestamp) pairs
+    def gaps(self):
+        steps = np.diff(self.timestamps)
+        return [
+            (int(self.timestamps[i]) + self.timeframe_ms, int(self.timestamps[i + 1]) - self.timeframe_ms)
+            for i in np.flatnonzero(steps > self.timeframe_ms)
+        ]
+
+# On-disk OHLCV store with one memory-mapped columnar file per (symbol, timeframe).
+# Only closed bars are stored. Writers hold an exclusive flock, so several strategy
+# processes can append to the same file; readers map the file without locking.
+class CandleStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, timeframe, symbol_filename(symbol) + '.ohlcv')
+
+    def _read_header(self, f):
+        f.seek(0)
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:8] != MAGIC:
+            return None
+        count, capacity, timeframe_ms = np.frombuffer(header, dtype=np.int64, count=3, offset=8)
+        return int(count), int(capacity), int(timeframe_ms)
+
+    def _write_header(self, f, count, capacity, timeframe_ms):
+        f.seek(0)
+        f.write(MAGIC + np.array([count, capacity, timeframe_ms], dtype=np.int64).tobytes())
+
+    def _map(self, path, mode, capacity):
+        timestamps = np.memmap(path, dtype=np.int64, mode=mode, offset=HEADER_SIZE, shape=(capacity,))
+        values = np.memmap(path, dtype=np.float64, mode=mode, offset=HEADER_SIZE + 8 * capacity,
+                           shape=(len(COLUMNS), capacity))
+        return timestamps, values
+
+    # Function to map a stored series read-only, or None if nothing is stored yet
+    def load(self, symbol, timeframe):
+        path = self.path(symbol, timeframe)
+        try:
+            with open(path, 'rb') as f:
+                header = self._read_header(f)
+        except FileNotFoundError:
+            return None
+        if header is None or header[0] == 0:
+            return None
+        count, capacity, timeframe_ms = header
+        timestamps, values = self._map(path, 'r', capacity)
+        return StoredCandles(timestamps[:count], values[:, :count], timeframe_ms)
+
+    # Function to write a whole series to a new file and swap it in (used to grow or to fill gaps)
+    def _rewrite(self, path, timestamps, values, timeframe_ms):
+        count = len(timestamps)
+        capacity = max(MIN_CAPACITY, 2 * count)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self._write_header(f, count, capacity, timeframe_ms)
+            f.truncate(HEADER_SIZE + 8 * capacity * (1 + len(COLUMNS)))
+        new_timestamps, new_values = self._map(tmp_path, 'r+', capacity)
+        new_timestamps[:count] = timestamps
+        new_values[:, :count] = values
+        new_timestamps.flush()
+        new_values.flush()
+        del new_timestamps, new_values
+        os.replace(tmp_path, path)
+
+    # Function to open and exclusively lock the current file at path, retrying if another
+    # writer swapped in a rewritten file while we waited for the lock
+    def _locked(self, path):
+        while True:
+            f = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                return f
+            f.close()
+
+    # Function to store ccxt OHLCV rows, dropping the forming bar: bars that have not closed by
+    # `now_ms`, which callers with a market data client take from its exchange clock (the local clock
+    # otherwise). Rows newer than the last stored bar are appended in place; older ones (gap backfill)
+    # are merged in with a rewrite. A timestamp given more than once keeps its last row.
+    def append(self, symbol, timeframe, ohlcv, now_ms=None):
+        if not len(ohlcv):
+            return 0
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        rows = rows[rows[:, 0] + timeframe_ms <= now_ms]
+        if not len(rows):
+            return 0
+        _, last = np.unique(rows[::-1, 0], return_index=True)
+        rows = rows[len(rows) - 1 - last]
+
+        path = self.path(symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._locked(path) as f:
+            header = self._read_header(f)
+            count, capacity = (header[0], header[1]) if header else (0, 0)
+            if count:
+                timestamps, values = self._map(path, 'r+', capacity)
+                last_timestamp = timestamps[count - 1]
+            else:
+                last_timestamp = -1
+
+            new_rows = rows[rows[:, 0] > last_timestamp]
+            old_rows = rows[rows[:, 0] <= last_timestamp]
+            if len(old_rows):
+                old_rows = old_rows[~np.isin(old_rows[:, 0].astype(np.int64), timestamps[:count])]
+
+            if len(old_rows) or count + len(new_rows) > capacity:
+                # Merge everything in timestamp order into a fresh, larger file
+                stored = np.column_stack([timestamps[:count], values[:, :count].T]) if count else np.empty((0, 6))
+                merged = np.concatenate([stored, old_rows, new_rows])
+                merged = merged[np.argsort(merged[:, 0], kind='stable')]
+                merged = merged[np.r_[True, np.diff(merged[:, 0]) > 0]]
+                self._rewrite(path, merged[:, 0].astype(np.int64), merged[:, 1:6].T, timeframe_ms)
+                return len(old_rows) + len(new_rows)
+
+            if len(new_rows):
+                timestamps[count:count + len(new_rows)] = new_rows[:, 0].astype(np.int64)
+                values[:, count:count + len(new_rows)] = new_rows[:, 1:6].T
+                timestamps.flush()
+                values.flush()
+                # The count is bumped last so readers never see half-written rows
+                self._write_header(f, count + len(new_rows), capacity, timeframe_ms)
+                f.flush()
+            return len(new_rows)
+
+    # Function to download [start, end] in pages and store it, returns the number of new bars
+    async def _fetch_range(self, market_data, symbol, timeframe, start, end):
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        added = 0
+        cursor = start
+        while cursor <= end:
+            page = await market_data.fetch_ohlcv(symbol, timeframe, limit=PAGE_LIMIT, since=cursor)
+            page = [row for row in page if cursor <= row[0] <= end]
+            if not page:
+                break
+            added += self.append(symbol, timeframe, page, market_data.server_now_ms())
+            cursor = page[-1][0] + timeframe_ms
+        return added
+
+    # Function to bring a series up to date: history back to `since`, holes left by outages, then the tail
+    async def sync(self, market_data, symbol, timeframe, since):
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        now_ms = int(market_data.server_now_ms())
+        stored = self.load(symbol, timeframe)
+        if stored is None:
+            return await self._fetch_range(market_data, symbol, timeframe, since, now_ms)
+
+        added = 0
+        first_timestamp = int(stored.timestamps[0])
+        if since < first_timestamp:
+            added += await self._fetch_range(market_data, symbol, timeframe, since, first_timestamp - timeframe_ms)
+        for gap_start, gap_end in stored.gaps():
+            added += await self._fetch_range(market_data, symbol, timeframe, gap_start, gap_end)
+        added += await self._fetch_range(market_data, symbol, timeframe, stored.last_timestamp + timeframe_ms, now_ms)
+        return added
+
+    # Function to sync several symbols concurrently through the shared client
+    async def sync_symbols(self, market_data, symbols, timeframe, since):
+        async def sync_symbol(symbol):
+            try:
+                return await self.sync(market_data, symbol, timeframe, since)
+            except Exception as e:
+                print(f"Error syncing {symbol} {timeframe}: {e}")
+                return 0
+        return dict(zip(symbols, await market_data.run_for_symbols(symbols, sync_symbol)))
+
+async def sync_from_command_line(args):
+    from market_data import MarketDataClient
+    market_data = MarketDataClient()
+    store = CandleStore(args.root)
+    since = int(time.time() * 1000) - args.days * 86_400_000
+    try:
+        start = time.perf_counter()
+        added = await store.sync_symbols(market_data, args.symbols, args.timeframe, since)
+        for symbol, count in added.items():
+            stored = store.load(symbol, args.timeframe)
+            print(f"{symbol} {args.timeframe}: +{count} bars, {len(stored) if stored else 0} stored, "
+                  f"{len(stored.gaps()) if stored else 0} gaps")
+        print(f"Synced {len(args.symbols)} symbols in {time.perf_counter() - start:.1f}s")
+    finally:
+        await market_data.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download and backfill candles into the local store")
+    parser.add_argument('--symbols', nargs='+', required=True)
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--root', default=STORE_DIR)
+    args = parser.parse_args()
+
+    asyncio.run(sync_from_command_line(args))
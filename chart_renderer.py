@@ -0,0 +1,160 @@
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from metrics import metrics
+
+RENDER_WORKERS = 2
+CACHE_SIZE = 256
+
+# mplfinance and the style shared by every chart, imported and built once per process on first use,
+# so scripts load matplotlib only in the render workers and only once a chart is drawn
+_mpf = None
+_style = None
+
+def plotting():
+    global _mpf
+    if _mpf is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Render off-screen, workers have no display
+        import mplfinance
+        _mpf = mplfinance
+    return _mpf
+
+def chart_style():
+    global _style
+    if _style is None:
+        mpf = plotting()
+        # Create custom market colors for up and down candlesticks
+        mc = mpf.make_marketcolors(up='#2fc71e', down='#ed2f1a', inherit=True)
+        _style = mpf.make_mpf_style(base_mpl_style=['bmh', 'dark_background'], marketcolors=mc, y_on_right=True)
+    return _style
+
+# Function to build the DataFrame mplfinance expects (Open/High/Low/Close, datetime index) from candles
+def chart_frame(candles):
+    return candles.to_dataframe()[['open', 'high', 'low', 'close']].rename(columns=str.capitalize)
+
+# Function to add the title and encode the figure as PNG bytes
+def _to_png(fig, axlist, symbol, title):
+    axlist[0].set_title(f"{symbol} - {title}", fontsize=25, style='italic', fontfamily='sans-serif')
+    buf = BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    import matplotlib.pyplot as plt
+    # Close the figure to avoid memory overflow
+    plt.close(fig)
+    return buf.getvalue()
+
+# Function to plot candlesticks (img.py alerts)
+def plot_candles(candles, symbol, title, ylabel="Precio ($)"):
+    mpf = plotting()
+    fig, axlist = mpf.plot(chart_frame(candles),
+                           figratio=(10, 6),
+                           type="candle",
+                           style=chart_style(),
+                           tight_layout=True,
+                           datetime_format='%H:%M',
+                           ylabel=ylabel,
+                           returnfig=True)
+    return _to_png(fig, axlist, symbol, title)
+
+# Function to plot candlesticks with EMA lines and the MACD histogram (macdalert alerts)
+def plot_macd_candles(candles, symbol, title, short_period=3, long_period=7):
+    import ta
+    mpf = plotting()
+    df = chart_frame(candles)
+    short_ema = ta.trend.EMAIndicator(df['Close'], window=short_period).ema_indicator()
+    long_ema = ta.trend.EMAIndicator(df['Close'], window=long_period).ema_indicator()
+    histogram = ta.trend.MACD(df['Close']).macd_diff()
+
+    # Green when the histogram rises from the previous bar, red otherwise, gray for the first bar
+    macd_colors = ['gray'] + [
+        'green' if histogram.iloc[i] > histogram.iloc[i - 1] else 'red'
+        for i in range(1, len(histogram))
+    ]
+
+    fig, axlist = mpf.plot(
+        df,
+        figratio=(10, 6),
+        type="candle",
+        style=chart_style(),
+        tight_layout=True,
+        datetime_format='%H:%M',
+        ylabel="Price ($)",
+        addplot=[
+            mpf.make_addplot(short_ema, color='cyan', width=1.5, linestyle='-'),
+            mpf.make_addplot(long_ema, color='magenta', width=1.5, linestyle='-'),
+            mpf.make_addplot(histogram, type='bar', color=macd_colors, panel=1, ylabel="MACD Histogram")
+        ],
+        returnfig=True
+    )
+    return _to_png(fig, axlist, symbol, title)
+
+# Function to get a chart's cache key. The last bar is usually still forming (img.py charts the
+# forming 4h bar), so its OHLCV is part of the key: a later alert in the same bar gets a new chart.
+def chart_key(plot, candles, symbol, title):
+    last_bar = tuple(float(column[-1]) for column in candles[1:])
+    return (plot.__name__, symbol, int(candles.timestamp[-1]), last_bar, title)
+
+# Renders charts in a process pool so mplfinance never blocks the event loop.
+# PNGs are cached by chart_key (plot function, symbol, last bar and title), and concurrent
+# requests for the same chart share one render.
+class ChartRenderer:
+    def __init__(self, workers=RENDER_WORKERS, cache_size=CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.pool = None
+        self.stats = {'renders': 0, 'cache_hits': 0, 'errors': 0}
+
+    def _ensure_pool(self):
+        if self.pool is None:
+            # Spawned, not forked: by the first render the script runs the state store writer and the
+            # event loop's executor threads, and a fork could copy a lock one of them holds.
+            # The plot functions live here, so workers only need this module importable.
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=chart_style)
+        return self.pool
+
+    # Function to get a chart as PNG bytes, or None if rendering failed
+    async def render(self, plot, candles, symbol, title):
+        key = chart_key(plot, candles, symbol, title)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return self.cache[key]
+        if key in self.in_flight:
+            self.stats['cache_hits'] += 1
+            return await self.in_flight[key]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.in_flight[key] = future
+        png = None
+        try:
+            # Candles go to the worker as arrays, the DataFrame is built there
+            with metrics.timer('render', symbol):
+                png = await loop.run_in_executor(self._ensure_pool(), plot, candles, symbol, title)
+            self.stats['renders'] += 1
+            self.cache[key] = png
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        except BrokenProcessPool as e:
+            print(f"Chart render pool died while rendering {symbol}: {e}")
+            self.stats['errors'] += 1
+            self.pool = None  # Start a fresh pool on the next render
+        except Exception as e:
+            print(f"Error rendering chart for {symbol}: {e}")
+            self.stats['errors'] += 1
+        finally:
+            del self.in_flight[key]
+            future.set_result(png)
+        return png
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
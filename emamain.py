@@ -1,62 +1,114 @@
-import ccxt
-import pandas as pd
 import asyncio
-import requests
+import os
 import config
 from datetime import datetime, timezone
-from telegram import Update
-from telegram.ext import Application, CommandHandler
+from typing import TYPE_CHECKING
+from market_data import MarketDataClient
+from tick_scheduler import TickScheduler
+from metrics import metrics, start_metrics_server
+from webhook_dispatcher import WebhookDispatcher
+from candle_buffer import CandleBufferSet
+from candle_store import CandleStore
+from indicators import EMA, IndicatorSeries
+from htf_cache import HigherTimeframeCache, previous_amplitude
+from rate_limiter import SymbolPriorities, threshold_distance, crossing_distance
+from kline_stream import KlineStream, BYBIT_PUBLIC_LINEAR_URL
+from state_store import state
+
+if TYPE_CHECKING:
+    from telegram import Update  # Handler annotations only, python-telegram-bot is imported when the bot starts
 
 interval = '1m'
+cycle_timeframe = '1m'  # Polling cycles run just after each bar of this timeframe closes
+metrics_port = 9105  # Local Prometheus endpoint at http://127.0.0.1:9105/metrics
+
+# Set to True to stream klines over WebSocket instead of polling REST
+stream_mode = False
+stream_url = BYBIT_PUBLIC_LINEAR_URL
+
+# Initialize shared async market-data client
+market_data = MarketDataClient(config.API_KEY, config.API_SECRET)
+
+# Wakes the polling loop just after each cycle_timeframe bar closes on the exchange clock
+ticks = TickScheduler(cycle_timeframe, market_data)
 
-# Initialize bybit client
-bybit = ccxt.bybit({
-    'apiKey': config.API_KEY,
-    'secret': config.API_SECRET,
-})
+# Per-symbol candle buffers, warmed from the local candle store and refreshed incrementally
+candle_buffers = CandleBufferSet(market_data, CandleStore())
+
+# Higher-timeframe candles, refetched only after the next bar boundary
+htf_cache = HigherTimeframeCache(market_data)
+
+# State kept in the state store under this script's name, restored after a restart
+state_scope = os.path.basename(__file__)
 
 # Dictionary to store the last alert messages for each symbol
-last_alert_messages = {}
+last_alert_messages = state.mapping(state_scope, 'last_alert_messages')
+
+# Pooled async 3commas webhook sender, updates last_alert_messages only on HTTP 200
+webhook = WebhookDispatcher(config.THREE_COMMAS_WEBHOOK_URL, last_alert_messages)
+
+# config.AVAILABLE_SYMBOLS as a set, built once for the membership checks in set_symbols
+available_symbols = frozenset(config.AVAILABLE_SYMBOLS)
 
 # List of selected symbols from Telegram (global variable)
-selected_symbols = []
+selected_symbols = state.value(state_scope, 'selected_symbols', [])
+
+# Incremental EMA state per symbol, seeded from history once
+ema_states = {}
+
+# How close each symbol is to a signal, hot symbols are fetched first and cold ones deferred under load
+priorities = SymbolPriorities()
 
 # Function to get historical candlestick data
-def get_historical_data(symbol, interval, limit=500):
-    ohlcv = bybit.fetch_ohlcv(symbol, interval, limit=limit)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    return df
+async def get_historical_data(symbol, interval, limit=500):
+    buffer = await candle_buffers.refresh(symbol, interval, limit)
+    return buffer.candles()
 
-# Function to calculate EMA
-def calculate_ema(df, period):
-    return df['close'].ewm(span=period, adjust=False).mean()
+# Function to calculate EMA over the whole history (pandas, only used without per-symbol state)
+def calculate_ema(candles, period):
+    import pandas as pd
+    return pd.Series(candles.close).ewm(span=period, adjust=False).mean()
+
+# Function to get the incremental EMA state for a symbol
+def get_ema_state(symbol, short_period, long_period):
+    if symbol not in ema_states:
+        ema_states[symbol] = IndicatorSeries({
+            'ema_short': lambda: EMA(short_period),
+            'ema_long': lambda: EMA(long_period),
+        })
+    return ema_states[symbol]
 
 # Function to check EMA crossover (long EMA vs short EMA)
-def check_ema_crossover(df, short_period=10, long_period=200):
-    df['ema_short'] = calculate_ema(df, short_period)
-    df['ema_long'] = calculate_ema(df, long_period)
-    cross_over = df['ema_short'].iloc[-2] > df['ema_long'].iloc[-2] and df['ema_short'].iloc[-3] <= df['ema_long'].iloc[-3]
-    cross_under = df['ema_short'].iloc[-2] < df['ema_long'].iloc[-2] and df['ema_short'].iloc[-3] >= df['ema_long'].iloc[-3]
+def check_ema_crossover(candles, short_period=10, long_period=200, symbol=None):
+    if symbol is not None:
+        # Update the symbol's EMAs with the newly closed bars only
+        ema_state = get_ema_state(symbol, short_period, long_period)
+        ema_state.sync(candles.timestamp, candles.close)
+        short_curr, short_prev = ema_state.get('ema_short', 1), ema_state.get('ema_short', 2)
+        long_curr, long_prev = ema_state.get('ema_long', 1), ema_state.get('ema_long', 2)
+    else:
+        ema_short = calculate_ema(candles, short_period)
+        ema_long = calculate_ema(candles, long_period)
+        short_curr, short_prev = ema_short.iloc[-2], ema_short.iloc[-3]
+        long_curr, long_prev = ema_long.iloc[-2], ema_long.iloc[-3]
+    cross_over = short_curr > long_curr and short_prev <= long_prev
+    cross_under = short_curr < long_curr and short_prev >= long_prev
     return cross_over, cross_under
 
 # Function to get amplitude ratios for previous and current day
-def get_amplitude_ratios(symbol):
-    daily_ohlcv = bybit.fetch_ohlcv(symbol, '1d', limit=5)
-    df_daily = pd.DataFrame(daily_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df_daily['timestamp'] = pd.to_datetime(df_daily['timestamp'], unit='ms')
-    df_daily.set_index('timestamp', inplace=True)
-
-    # Amplitude ratio for previous day (-2)
-    prev_day_high = df_daily['high'].iloc[-2]
-    prev_day_low = df_daily['low'].iloc[-2]
-    prev_day_amplitude_ratio = prev_day_high / prev_day_low
-
-    # Amplitude ratio for current day (-1)
-    curr_day_high = df_daily['high'].iloc[-1]
-    curr_day_low = df_daily['low'].iloc[-1]
-    curr_day_amplitude_ratio = curr_day_high / curr_day_low
+async def get_amplitude_ratios(symbol, historical_data):
+    daily = await htf_cache.get(symbol, '1d')
+
+    # Amplitude ratio for previous day (-2), computed once per closed day
+    prev_day_amplitude_ratio = daily.value(previous_amplitude)
+
+    # Amplitude ratio for current day (-1), kept current with the 1-minute candles
+    curr_day = daily.extend_forming(
+        historical_data.timestamp,
+        historical_data.high,
+        historical_data.low,
+    )
+    curr_day_amplitude_ratio = curr_day[2] / curr_day[3]
 
     return prev_day_amplitude_ratio, curr_day_amplitude_ratio
 
@@ -75,32 +127,22 @@ def send_3commas_message(symbol, action, close_price, bot_uuid, secret):
             "bot_uuid": bot_uuid
         }
 
-        try:
-            url = config.THREE_COMMAS_WEBHOOK_URL
-            response = requests.post(url, json=payload)
-
-            if response.status_code == 200:
-                print(f"Successfully sent alert for {symbol} with action {action} to bot {bot_uuid}")
-                last_alert_messages[symbol] = action
-            else:
-                print(f"Failed to send alert for {symbol} to bot {bot_uuid}: {response.content}")
-
-        except requests.RequestException as e:
-            print(f"Error sending request for {symbol} to bot {bot_uuid}: {e}")
+        webhook.submit(symbol, action, payload)
 
 # Updated function to set symbols by matching against config.AVAILABLE_SYMBOLS
-async def set_symbols(update: Update, context) -> None:
+async def set_symbols(update: 'Update', context) -> None:
     global selected_symbols
     user_symbols = context.args
 
     if user_symbols:
         # Convert user input to uppercase and filter only those in config.AVAILABLE_SYMBOLS
-        valid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() in config.AVAILABLE_SYMBOLS]
-        invalid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() not in config.AVAILABLE_SYMBOLS]
+        valid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() in available_symbols]
+        invalid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() not in available_symbols]
 
         # Add valid symbols to the selected_symbols list, avoiding duplicates
         new_symbols = [symbol for symbol in valid_symbols if symbol not in selected_symbols]
         selected_symbols.extend(new_symbols)
+        state.save(state_scope, 'selected_symbols', selected_symbols)
 
         # Prepare a response message
         response_message = ""
@@ -117,41 +159,84 @@ async def set_symbols(update: Update, context) -> None:
         await update.message.reply_text("No symbols provided. Usage: /set_symbols BTC/USDT ETH/USDT")
 
 # Command to reset symbols
-async def reset_symbols(update: Update, context) -> None:
+async def reset_symbols(update: 'Update', context) -> None:
     global selected_symbols
     selected_symbols = []
+    state.save(state_scope, 'selected_symbols', selected_symbols)
+    candle_buffers.discard(selected_symbols)
+    htf_cache.discard(selected_symbols)
+    ema_states.clear()
+    priorities.discard(selected_symbols)
     await update.message.reply_text("Symbols have been reset.")
 
+# Function to evaluate signals for a symbol from its candles and daily amplitude ratios
+def evaluate_symbol(symbol, historical_data, prev_day_amplitude_ratio, curr_day_amplitude_ratio):
+    with metrics.timer('indicators', symbol):
+        cross_over, cross_under = check_ema_crossover(historical_data, symbol=symbol)
+    close_price = historical_data.close[-1]
+    
+    print(f"Amplitude ratios for {symbol} - Previous day: {prev_day_amplitude_ratio}, Current day: {curr_day_amplitude_ratio}")
+    
+    # Send message if amplitude ratio of either day is >= 1.20
+    if prev_day_amplitude_ratio >= 1.20 or curr_day_amplitude_ratio >= 1.20:
+        if cross_over:
+            send_3commas_message(symbol, "enter_long", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
+        elif cross_under:
+            send_3commas_message(symbol, "enter_short", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
+    else:
+        print(f"Amplitude condition not met for {symbol}, skipping...")
+
+    # A symbol signals once either day's amplitude passes 1.20 and the EMAs cross
+    ema_state = ema_states[symbol]
+    amplitude_gap = min(threshold_distance(prev_day_amplitude_ratio, 1.20), threshold_distance(curr_day_amplitude_ratio, 1.20))
+    priorities.set(symbol, max(amplitude_gap, crossing_distance(ema_state.get('ema_short', 1), ema_state.get('ema_long', 1))))
+
+# Function to fetch data and evaluate signals for a single symbol
+async def process_symbol(symbol):
+    try:
+        historical_data = await get_historical_data(symbol, interval)
+        prev_day_amplitude_ratio, curr_day_amplitude_ratio = await get_amplitude_ratios(symbol, historical_data)
+        with metrics.timer('evaluate', symbol):
+            evaluate_symbol(symbol, historical_data, prev_day_amplitude_ratio, curr_day_amplitude_ratio)
+
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+
+# Function to evaluate signals when a streamed bar closes
+async def on_bar_close(symbol, historical_data):
+    try:
+        prev_day_amplitude_ratio, curr_day_amplitude_ratio = await get_amplitude_ratios(symbol, historical_data)
+        with metrics.timer('evaluate', symbol):
+            evaluate_symbol(symbol, historical_data, prev_day_amplitude_ratio, curr_day_amplitude_ratio)
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+
+# Function to run one polling cycle over all selected symbols concurrently
+async def run_cycle():
+    await market_data.run_for_symbols(list(selected_symbols), process_symbol, priorities)
+
 # Main trading function
 async def main_trading():
     while True:
-        for symbol in selected_symbols:
-            try:
-                historical_data = get_historical_data(symbol, interval)
-                cross_over, cross_under = check_ema_crossover(historical_data)
-                close_price = historical_data['close'].iloc[-1]
-                
-                # Get amplitude ratios for previous and current day
-                prev_day_amplitude_ratio, curr_day_amplitude_ratio = get_amplitude_ratios(symbol)
-                
-                print(f"Amplitude ratios for {symbol} - Previous day: {prev_day_amplitude_ratio}, Current day: {curr_day_amplitude_ratio}")
-                
-                # Send message if amplitude ratio of either day is >= 1.20
-                if prev_day_amplitude_ratio >= 1.20 or curr_day_amplitude_ratio >= 1.20:
-                    if cross_over:
-                        send_3commas_message(symbol, "enter_long", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
-                    elif cross_under:
-                        send_3commas_message(symbol, "enter_short", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
-                else:
-                    print(f"Amplitude condition not met for {symbol}, skipping...")
-
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-
-        await asyncio.sleep(20)
+        with metrics.timer('cycle'):
+            await run_cycle()
+        print(market_data.scheduler.report())
+        await ticks.wait()
+
+# Streaming trading function, evaluates each symbol on every confirmed bar close
+async def main_streaming():
+    stream = KlineStream(interval, on_bar_close, market_data, url=stream_url, history=500)
+    await stream.run(lambda: selected_symbols)
+
+# Command to show per-stage latencies and event counts
+async def stats(update: 'Update', context) -> None:
+    await update.message.reply_text(metrics.summary())
 
 # Start Telegram bot
 async def start_telegram_bot():
+    # Imported here rather than at load time, so the first trading cycle does not wait for it
+    from telegram.ext import Application, CommandHandler
+
     application = Application.builder().token(config.TELEGRAM_TOKEN).build()
     
     # Initialize the application (fixes the error)
@@ -159,15 +244,17 @@ async def start_telegram_bot():
 
     application.add_handler(CommandHandler('set_symbols', set_symbols))
     application.add_handler(CommandHandler('reset_symbols', reset_symbols))
+    application.add_handler(CommandHandler('stats', stats))
 
     await application.start()
     await application.updater.start_polling()
 
 # Main function to run both bot and trading
 async def main():
+    await start_metrics_server(metrics_port)
     await asyncio.gather(
-        start_telegram_bot(),
-        main_trading()
+        main_streaming() if stream_mode else main_trading(),
+        start_telegram_bot()
     )
 
 # Run the main function
@@ -1,66 +1,75 @@
-import ccxt
-import pandas as pd
 import asyncio
-import requests
+import os
 import config2
 from datetime import datetime, timezone
-from telegram import Update
-from telegram.ext import Application, CommandHandler
+from typing import TYPE_CHECKING
+from market_data import MarketDataClient
+from tick_scheduler import TickScheduler
+from metrics import metrics, start_metrics_server
+from webhook_dispatcher import WebhookDispatcher
+from candle_buffer import CandleBufferSet
+from batch_signals import rolling_mean_at
+from candle_store import CandleStore
+from htf_cache import HigherTimeframeCache, previous_close, previous_amplitude
+from state_store import state
+
+if TYPE_CHECKING:
+    from telegram import Update  # Handler annotations only, python-telegram-bot is imported when the bot starts
 
 interval = '1s'
+cycle_timeframe = '10s'  # Polling cycles run just after each bar of this timeframe closes
+metrics_port = 9102  # Local Prometheus endpoint at http://127.0.0.1:9102/metrics
 
-# Initialize bybit client
-bybit = ccxt.bybit({
-    'apiKey': config2.API_KEY,
-    'secret': config2.API_SECRET,
-})
+# Initialize shared async market-data client
+market_data = MarketDataClient(config2.API_KEY, config2.API_SECRET)
+
+# Wakes the polling loop just after each cycle_timeframe bar closes on the exchange clock
+ticks = TickScheduler(cycle_timeframe, market_data)
+
+# Per-symbol candle buffers, warmed from the local candle store and refreshed incrementally
+candle_buffers = CandleBufferSet(market_data, CandleStore())
+
+# Higher-timeframe candles, refetched only after the next bar boundary
+htf_cache = HigherTimeframeCache(market_data)
+
+# State kept in the state store under this script's name, restored after a restart
+state_scope = os.path.basename(__file__)
 
 # Dictionary to store the last alert messages for each symbol
-last_alert_messages = {}
+last_alert_messages = state.mapping(state_scope, 'last_alert_messages')
+
+# Pooled async 3commas webhook sender, updates last_alert_messages only on HTTP 200
+webhook = WebhookDispatcher(config2.THREE_COMMAS_WEBHOOK_URL, last_alert_messages)
+
+# config2.AVAILABLE_SYMBOLS as a set, built once for the membership checks in set_symbols
+available_symbols = frozenset(config2.AVAILABLE_SYMBOLS)
 
 # List of selected symbols from Telegram (global variable)
-selected_symbols = []
+selected_symbols = state.value(state_scope, 'selected_symbols', [])
 
 # Function to get historical candlestick data
-def get_historical_data(symbol, interval, limit=200):
-    ohlcv = bybit.fetch_ohlcv(symbol, interval, limit=limit)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    return df
+async def get_historical_data(symbol, interval, limit=200):
+    buffer = await candle_buffers.refresh(symbol, interval, limit)
+    return buffer.candles()
 
 # Function to get day open price
-def get_day_open_price(symbol):
-    day_ohlcv = bybit.fetch_ohlcv(symbol, '4h', limit=3)
-    df_day = pd.DataFrame(day_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df_day['timestamp'] = pd.to_datetime(df_day['timestamp'], unit='ms')
-    df_day.set_index('timestamp', inplace=True)
-    day_open_price = df_day['close'].iloc[-2]
-    return day_open_price
-
-# Function to calculate SMA
-def calculate_sma(df, period):
-    return df['close'].rolling(window=period).mean()
+async def get_day_open_price(symbol):
+    return await htf_cache.value(symbol, '4h', previous_close)
+
+# Function to calculate the SMA of the closes at bar `at` (rolling(period).mean().iloc[at])
+def calculate_sma(candles, period, at=-2):
+    return rolling_mean_at(candles.close, period, at)
 
 # Function to check SMA crossover against day open price with configurable exit percentages
-def check_sma_crossover_vs_day_open(df, day_open_price, short_period=3, cross_over_percentage=1.03, cross_under_percentage=0.97):
-    df['sma_short'] = calculate_sma(df, short_period)  # Already returns a Series, so no squeeze needed
-    cross_over = df['sma_short'].iloc[-2] < day_open_price and df['sma_short'].iloc[-3] > day_open_price #cross_over_percentage and df['sma_short'].iloc[-3] > day_open_price * cross_over_percentage
-    cross_under = df['sma_short'].iloc[-2] > day_open_price and df['sma_short'].iloc[-3] < day_open_price #cross_under_percentage and df['sma_short'].iloc[-3] < day_open_price * cross_under_percentage
+def check_sma_crossover_vs_day_open(candles, day_open_price, short_period=3, cross_over_percentage=1.03, cross_under_percentage=0.97):
+    sma_curr, sma_prev = calculate_sma(candles, short_period, -2), calculate_sma(candles, short_period, -3)
+    cross_over = sma_curr < day_open_price and sma_prev > day_open_price #cross_over_percentage and sma_prev > day_open_price * cross_over_percentage
+    cross_under = sma_curr > day_open_price and sma_prev < day_open_price #cross_under_percentage and sma_prev < day_open_price * cross_under_percentage
     return cross_over, cross_under
 
 # Function to get previous day's amplitude ratio
-def get_previous_day_amplitude(symbol):
-    daily_ohlcv = bybit.fetch_ohlcv(symbol, '4h', limit=5)
-    df_daily = pd.DataFrame(daily_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df_daily['timestamp'] = pd.to_datetime(df_daily['timestamp'], unit='ms')
-    df_daily.set_index('timestamp', inplace=True)
-    
-    prev_day_high = df_daily['high'].iloc[-2]
-    prev_day_low = df_daily['low'].iloc[-2]
-    
-    amplitude_ratio = prev_day_high / prev_day_low
-    return amplitude_ratio
+async def get_previous_day_amplitude(symbol):
+    return await htf_cache.value(symbol, '4h', previous_amplitude)
 
 # Function to send a message to 3commas using a webhook
 def send_3commas_message(symbol, action, close_price, bot_uuid, secret):
@@ -77,32 +86,22 @@ def send_3commas_message(symbol, action, close_price, bot_uuid, secret):
             "bot_uuid": bot_uuid
         }
 
-        try:
-            url = config2.THREE_COMMAS_WEBHOOK_URL
-            response = requests.post(url, json=payload)
-
-            if response.status_code == 200:
-                print(f"Successfully sent alert for {symbol} with action {action} to bot {bot_uuid}")
-                last_alert_messages[symbol] = action
-            else:
-                print(f"Failed to send alert for {symbol} to bot {bot_uuid}: {response.content}")
-
-        except requests.RequestException as e:
-            print(f"Error sending request for {symbol} to bot {bot_uuid}: {e}")
+        webhook.submit(symbol, action, payload)
 
 # Updated function to set symbols by matching against config2.AVAILABLE_SYMBOLS
-async def set_symbols(update: Update, context) -> None:
+async def set_symbols(update: 'Update', context) -> None:
     global selected_symbols
     user_symbols = context.args
 
     if user_symbols:
         # Convert user input to uppercase and filter only those in config2.AVAILABLE_SYMBOLS
-        valid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() in config2.AVAILABLE_SYMBOLS]
-        invalid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() not in config2.AVAILABLE_SYMBOLS]
+        valid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() in available_symbols]
+        invalid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() not in available_symbols]
 
         # Add valid symbols to the selected_symbols list, avoiding duplicates
         new_symbols = [symbol for symbol in valid_symbols if symbol not in selected_symbols]
         selected_symbols.extend(new_symbols)
+        state.save(state_scope, 'selected_symbols', selected_symbols)
 
         # Prepare a response message
         response_message = ""
@@ -119,42 +118,61 @@ async def set_symbols(update: Update, context) -> None:
         await update.message.reply_text("No symbols provided. Usage: /set_symbols BTC/USDT ETH/USDT")
 
 # Command to reset symbols
-async def reset_symbols(update: Update, context) -> None:
+async def reset_symbols(update: 'Update', context) -> None:
     global selected_symbols
     selected_symbols = []
+    state.save(state_scope, 'selected_symbols', selected_symbols)
+    candle_buffers.discard(selected_symbols)
+    htf_cache.discard(selected_symbols)
     await update.message.reply_text("Symbols have been reset.")
 
+# Function to fetch data and evaluate signals for a single symbol
+async def process_symbol(symbol):
+    try:
+        historical_data, day_open_price, amplitude_ratio = await asyncio.gather(
+            get_historical_data(symbol, interval),
+            get_day_open_price(symbol),
+            get_previous_day_amplitude(symbol),
+        )
+
+        # Check crossovers with different exit percentages
+        for percentage in [1.03, 1.05, 1.07, 1.09]:  # Adjust these as needed
+            cross_over, cross_under = check_sma_crossover_vs_day_open(historical_data, day_open_price, cross_over_percentage=percentage, cross_under_percentage=1/percentage)
+            close_price = historical_data.close[-1]
+            
+            print(f"Amplitude ratio for {symbol}: {amplitude_ratio}")
+            
+            if amplitude_ratio >= 1.01:
+                if cross_over:
+                    send_3commas_message(symbol, "exit_long", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config2.SECRET_1)
+                elif cross_under:
+                    send_3commas_message(symbol, "exit_short", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config2.SECRET_1)
+            else:
+                print(f"Amplitude condition not met for {symbol}, skipping...")
+
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+
+# Function to run one polling cycle over all selected symbols concurrently
+async def run_cycle():
+    await market_data.run_for_symbols(list(selected_symbols), process_symbol)
+
 # Main trading function
 async def main_trading():
     while True:
-        for symbol in selected_symbols:
-            try:
-                historical_data = get_historical_data(symbol, interval)
-                day_open_price = get_day_open_price(symbol)
-
-                # Check crossovers with different exit percentages
-                for percentage in [1.03, 1.05, 1.07, 1.09]:  # Adjust these as needed
-                    cross_over, cross_under = check_sma_crossover_vs_day_open(historical_data, day_open_price, cross_over_percentage=percentage, cross_under_percentage=1/percentage)
-                    close_price = historical_data['close'].iloc[-1]
-                    amplitude_ratio = get_previous_day_amplitude(symbol)
-                    
-                    print(f"Amplitude ratio for {symbol}: {amplitude_ratio}")
-                    
-                    if amplitude_ratio >= 1.01:
-                        if cross_over:
-                            send_3commas_message(symbol, "exit_long", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config2.SECRET_1)
-                        elif cross_under:
-                            send_3commas_message(symbol, "exit_short", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config2.SECRET_1)
-                    else:
-                        print(f"Amplitude condition not met for {symbol}, skipping...")
-
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-
-        await asyncio.sleep(10)
+        with metrics.timer('cycle'):
+            await run_cycle()
+        await ticks.wait()
+
+# Command to show per-stage latencies and event counts
+async def stats(update: 'Update', context) -> None:
+    await update.message.reply_text(metrics.summary())
 
 # Start Telegram bot
 async def start_telegram_bot():
+    # Imported here rather than at load time, so the first trading cycle does not wait for it
+    from telegram.ext import Application, CommandHandler
+
     application = Application.builder().token(config2.TELEGRAM_TOKEN).build()
     
     # Initialize the application (fixes the error)
@@ -162,15 +180,17 @@ async def start_telegram_bot():
 
     application.add_handler(CommandHandler('set_symbols', set_symbols))
     application.add_handler(CommandHandler('reset_symbols', reset_symbols))
+    application.add_handler(CommandHandler('stats', stats))
 
     await application.start()
     await application.updater.start_polling()
 
 # Main function to run both bot and trading
 async def main():
+    await start_metrics_server(metrics_port)
     await asyncio.gather(
-        start_telegram_bot(),
-        main_trading()
+        main_trading(),
+        start_telegram_bot()
     )
 
 # Run the main function
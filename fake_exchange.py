@@ -0,0 +1,188 @@
+import asyncio
+import math
+import random
+import time
+import zlib
+import numpy as np
+import ccxt
+
+# Deterministic offline stand-in for the ccxt async bybit client, used by the benchmarks.
+# Candles come from a per-symbol price curve, so any window of any timeframe is reproducible
+# without storing history, and the curve swings widely enough for the strategies to signal.
+# Market orders fill `fill_delay` seconds after they are placed, at the curve's price then;
+# client order ids are unique as on Bybit, and `lost_ack_rate` drops the acknowledgement of
+# that share of orders after placing them, to exercise timeout handling.
+# Assign an instance to MarketDataClient.exchange before the first request to use it.
+
+DEFAULT_LIMIT = 200  # Bars returned when no limit is given, as on Bybit
+
+# Function to get a stable per-symbol seed
+def symbol_seed(symbol):
+    return zlib.crc32(symbol.encode())
+
+class FakeExchange:
+    def __init__(self, latency=0.02, jitter=0.0, seed=0, clock=time.time, server_offset_ms=0, symbols=(),
+                 fill_delay=0.2, slippage_bps=0.0, lost_ack_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.clock = clock  # Seconds since the epoch, replace for virtual time
+        self.server_offset_ms = server_offset_ms
+        self.symbols = list(symbols)  # Universe returned by fetch_tickers
+        self.fill_delay = fill_delay
+        self.slippage = slippage_bps / 10_000
+        self.lost_ack_rate = lost_ack_rate
+        self.curves = {}
+        self.orders = {}  # client order id -> order
+        self.calls = {}
+
+    async def _respond(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        delay = self.latency + self.jitter * self.random.random()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def now_ms(self):
+        return int(self.clock() * 1000) + self.server_offset_ms
+
+    # Function to get a symbol's curve parameters: base price, slow and fast swing sizes and phases
+    def _curve(self, symbol):
+        curve = self.curves.get(symbol)
+        if curve is None:
+            rng = random.Random(symbol_seed(symbol))
+            curve = self.curves[symbol] = (
+                10 ** rng.uniform(-1, 4),  # base price
+                rng.uniform(0.02, 0.12), rng.uniform(0, 2 * math.pi),  # 6h swing
+                rng.uniform(0.002, 0.01), rng.uniform(0, 2 * math.pi),  # 20 minute swing
+                rng.uniform(0.0002, 0.001),  # Per-bar wick size per sqrt(minute)
+            )
+        return curve
+
+    # Function to get prices at the given times in ms
+    def prices(self, symbol, times_ms):
+        base, slow, slow_phase, fast, fast_phase, _ = self._curve(symbol)
+        t = np.asarray(times_ms, dtype=np.float64)
+        return base * (1 + slow * np.sin(2 * np.pi * t / 21_600_000 + slow_phase)
+                       + fast * np.sin(2 * np.pi * t / 1_200_000 + fast_phase)
+                       + 0.0005 * np.sin(2 * np.pi * t / 97_000))
+
+    # Function to get the price at one time in ms (what a market order filled then would pay)
+    def price(self, symbol, time_ms):
+        return float(self.prices(symbol, [time_ms])[0])
+
+    # Function to build OHLCV rows for bars starting at `starts`, the last one forming at now_ms
+    def candles(self, symbol, timeframe_ms, starts, now_ms):
+        if not len(starts):
+            return []
+        wick = self._curve(symbol)[5] * math.sqrt(timeframe_ms / 60_000)
+        opens = self.prices(symbol, starts)
+        closes = self.prices(symbol, np.minimum(starts + timeframe_ms, now_ms))
+        highs = np.maximum(opens, closes) * (1 + wick)
+        lows = np.minimum(opens, closes) * (1 - wick)
+        volumes = 1000 + (starts // timeframe_ms) % 97
+        rows = np.column_stack([starts, opens, highs, lows, closes, volumes])
+        return [[int(row[0])] + row[1:].tolist() for row in rows]
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        await self._respond('fetch_ohlcv')
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        limit = limit or DEFAULT_LIMIT
+        now_ms = self.now_ms()
+        last_start = now_ms // timeframe_ms * timeframe_ms
+        if since is None:
+            first = last_start - (limit - 1) * timeframe_ms
+        else:
+            first = -(-since // timeframe_ms) * timeframe_ms
+        starts = np.arange(first, min(first + limit * timeframe_ms, last_start + 1), timeframe_ms, dtype=np.int64)
+        return self.candles(symbol, timeframe_ms, starts, now_ms)
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        await self._respond('fetch_tickers')
+        now_ms = self.now_ms()
+        hour_starts = np.arange(now_ms // 3_600_000 - 23, now_ms // 3_600_000 + 1, dtype=np.int64) * 3_600_000
+        tickers = {}
+        for symbol in symbols or self.symbols:
+            hours = self.candles(symbol, 3_600_000, hour_starts, now_ms)
+            tickers[symbol] = {
+                'symbol': symbol,
+                'timestamp': now_ms,
+                'high': max(row[2] for row in hours),
+                'low': min(row[3] for row in hours),
+                'open': hours[0][1],
+                'last': hours[-1][4],
+                'close': hours[-1][4],
+            }
+        return tickers
+
+    async def fetch_time(self, params={}):
+        await self._respond('fetch_time')
+        return self.now_ms()
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        await self._respond('create_order')
+        client_id = params.get('clientOrderId') or f"fake-{len(self.orders) + 1}"
+        if client_id in self.orders:
+            raise ccxt.InvalidOrder('bybit {"retCode":110072,"retMsg":"OrderLinkedID is duplicate"}')
+        now_ms = self.now_ms()
+        fill_ms = now_ms + int(self.fill_delay * 1000)
+        if type == 'market':
+            price = self.price(symbol, fill_ms) * (1 + self.slippage if side == 'buy' else 1 - self.slippage)
+        self.orders[client_id] = {
+            'id': str(len(self.orders) + 1),
+            'clientOrderId': client_id,
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'timestamp': now_ms,
+            'fill_ms': fill_ms,
+        }
+        if self.random.random() < self.lost_ack_rate:
+            raise ccxt.RequestTimeout('bybit create_order timed out')
+        return {'id': self.orders[client_id]['id'], 'clientOrderId': client_id, 'symbol': symbol, 'status': None}
+
+    # Function to cancel an open order, like Bybit it fails once the order is filled or canceled
+    async def cancel_order(self, id, symbol=None, params={}):
+        await self._respond('cancel_order')
+        order = next((order for order in self.orders.values() if order['id'] == id), None)
+        if order is None or order.get('canceled') or self._order_status(order)['status'] == 'closed':
+            raise ccxt.OrderNotFound(f'bybit order {id} does not exist or is already filled or canceled')
+        order['canceled'] = True
+        return self._order_status(order)
+
+    # Function to get an order as ccxt reports it now, market orders are filled once fill_ms has passed
+    def _order_status(self, order):
+        filled = not order.get('canceled') and order['type'] == 'market' and self.now_ms() >= order['fill_ms']
+        return {
+            'id': order['id'],
+            'clientOrderId': order['clientOrderId'],
+            'symbol': order['symbol'],
+            'type': order['type'],
+            'side': order['side'],
+            'amount': order['amount'],
+            'price': order['price'],
+            'timestamp': order['timestamp'],
+            'status': 'closed' if filled else 'canceled' if order.get('canceled') else 'open',
+            'filled': order['amount'] if filled else 0.0,
+            'remaining': 0.0 if filled else order['amount'],
+            'average': order['price'] if filled else None,
+            'lastTradeTimestamp': order['fill_ms'] if filled else None,
+        }
+
+    async def _fetch_orders(self, method, status, symbol, params):
+        await self._respond(method)
+        client_id = params.get('orderLinkId')
+        orders = [self.orders[client_id]] if client_id in self.orders else [] if client_id else list(self.orders.values())
+        orders = [self._order_status(order) for order in orders if symbol is None or order['symbol'] == symbol]
+        # Like Bybit's order history, closed orders include the canceled ones
+        return [order for order in orders if order['status'] == status or (status == 'closed' and order['status'] == 'canceled')]
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        return await self._fetch_orders('fetch_open_orders', 'open', symbol, params)
+
+    async def fetch_closed_orders(self, symbol=None, since=None, limit=None, params={}):
+        return await self._fetch_orders('fetch_closed_orders', 'closed', symbol, params)
+
+    async def close(self):
+        pass
@@ -0,0 +1,81 @@
+import asyncio
+import ccxt
+
+# Seconds to wait after a bar boundary before refetching, so the exchange has rolled the bar over
+BOUNDARY_GRACE = 2
+
+# Function to get the close of the last closed bar (e.g. the "day open" used by the SMA strategies)
+def previous_close(ohlcv):
+    return ohlcv[-2][4]
+
+# Function to get the high/low amplitude ratio of the last closed bar
+def previous_amplitude(ohlcv):
+    return ohlcv[-2][2] / ohlcv[-2][3]
+
+# Higher-timeframe candles for one (symbol, timeframe), valid until the forming bar closes
+class CachedBars:
+    __slots__ = ('ohlcv', 'expires_at', 'values')
+
+    def __init__(self, ohlcv, expires_at):
+        self.ohlcv = ohlcv
+        self.expires_at = expires_at
+        self.values = {}  # Derived values keyed by the function that computed them
+
+    # Function to compute a derived value once per closed bar
+    def value(self, compute):
+        if compute not in self.values:
+            self.values[compute] = compute(self.ohlcv)
+        return self.values[compute]
+
+    # Function to widen the forming bar's high/low with lower-timeframe bars seen since it was fetched
+    def extend_forming(self, timestamps, highs, lows):
+        forming = self.ohlcv[-1]
+        mask = timestamps >= forming[0]
+        if mask.any():
+            forming[2] = max(forming[2], float(highs[mask].max()))
+            forming[3] = min(forming[3], float(lows[mask].min()))
+        return forming
+
+# Cache of higher-timeframe candles keyed by (symbol, timeframe), refreshed only when the next bar boundary passes
+class HigherTimeframeCache:
+    def __init__(self, market_data):
+        self.market_data = market_data
+        self.entries = {}
+        self.inflight = {}
+
+    async def get(self, symbol, timeframe, limit=5):
+        key = (symbol, timeframe)
+        now_ms = self.market_data.now_ms()
+        entry = self.entries.get(key)
+        if entry is not None and now_ms < entry.expires_at:
+            return entry
+
+        # Concurrent callers for the same key share a single request
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = asyncio.ensure_future(self._fetch(symbol, timeframe, limit, entry))
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await task
+
+    async def _fetch(self, symbol, timeframe, limit, previous):
+        ohlcv = await self.market_data.fetch_ohlcv(symbol, timeframe, limit=limit)
+        now_ms = self.market_data.now_ms()
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        expires_at = ohlcv[-1][0] + timeframe_ms + BOUNDARY_GRACE * 1000
+        if expires_at <= now_ms:
+            # The exchange has not opened the next bar yet, retry shortly
+            expires_at = now_ms + BOUNDARY_GRACE * 1000
+        entry = CachedBars([list(bar) for bar in ohlcv], expires_at)
+        if previous is not None and previous.ohlcv[-1][0] == entry.ohlcv[-1][0]:
+            entry.values = previous.values  # Same closed bars, keep the derived values
+        self.entries[(symbol, timeframe)] = entry
+        return entry
+
+    async def value(self, symbol, timeframe, compute, limit=5):
+        entry = await self.get(symbol, timeframe, limit)
+        return entry.value(compute)
+
+    def discard(self, symbols):
+        keep = set(symbols)
+        for key in [key for key in self.entries if key[0] not in keep]:
+            del self.entries[key]
@@ -1,112 +1,92 @@
-import ccxt
-import pandas as pd
-import matplotlib.pyplot as plt
-import mplfinance as mpf
-from io import BytesIO
 import asyncio
+import os
 import nest_asyncio
 from telegram import Bot
 import config4  # Import the config module
+from market_data import MarketDataClient
+from candle_buffer import Candles
+from tick_scheduler import TickScheduler
+from prescan import prescan_amplitude
+from telegram_outbox import TelegramOutbox
+from chart_renderer import ChartRenderer, plot_candles
+from state_store import state
 
 interval = '4h'  # 4-hour candlesticks
+cycle_timeframe = '15m'  # Polling cycles run just after each bar of this timeframe closes
 
-# Initialize Bybit client
-bybit = ccxt.bybit({
-    'apiKey': config4.API_KEY,
-    'secret': config4.API_SECRET,
-})
+# Maximum number of prescan candidates checked per pass (None for no limit)
+prescan_top_n = 100
+
+# Initialize shared async market-data client
+market_data = MarketDataClient(config4.API_KEY, config4.API_SECRET)
+
+# Wakes the polling loop just after each cycle_timeframe bar closes on the exchange clock
+ticks = TickScheduler(cycle_timeframe, market_data)
+
+# Charts are rendered in worker processes, off the event loop
+chart_renderer = ChartRenderer()
+
+# State kept in the state store under this script's name, restored after a restart
+state_scope = os.path.basename(__file__)
 
 # Dictionary to store the last alert messages for each symbol
-last_alert_messages = {}
+last_alert_messages = state.mapping(state_scope, 'last_alert_messages')
 
 # Function to get historical candlestick data
-def get_historical_data(symbol, interval, limit=50):
-    ohlcv = bybit.fetch_ohlcv(symbol, interval, limit=limit)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    
-    # Renaming columns to match the expected format
-    df.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-    return df
-
-# Updated function to plot candlesticks and return an image buffer
-def plot_candles(df, symbol, title):
-    # Ensure the index is in datetime format and the data is in the correct format for mplfinance
-    mpf_data = df[['Open', 'High', 'Low', 'Close']].copy()
-
-    # Create custom market colors for up and down candlesticks
-    mc = mpf.make_marketcolors(up='#2fc71e', down='#ed2f1a', inherit=True)
-
-    # Create a custom style using the market colors and other style settings
-    s = mpf.make_mpf_style(base_mpl_style=['bmh', 'dark_background'], marketcolors=mc, y_on_right=True)
-
-    # Prepare the plot figure with a custom ratio and return figure for further customization
-    fig, axlist = mpf.plot(mpf_data,
-                           figratio=(10, 6),
-                           type="candle",
-                           style=s,
-                           tight_layout=True,
-                           datetime_format='%H:%M',
-                           ylabel="Precio ($)",
-                           returnfig=True)
-
-    # Add Title with a more commonly available font
-    axlist[0].set_title(f"{symbol} - {title}", fontsize=25, style='italic', fontfamily='sans-serif')
-
-    # Adjust layout and save plot to a BytesIO object (removed plt.tight_layout)
-    buf = BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-
-    # Close the figure to avoid memory overflow
-    plt.close(fig)
-
-    return buf
-
-# Function to send Telegram message and image (now defined as async)
-async def send_telegram_message(symbol, message, image_buffer):
-    # Check if the current message is the same as the previous one for this symbol
-    if last_alert_messages.get(symbol) != message:
-        try:
-            await telegram_bot.send_message(chat_id=config4.CHAT_ID, text=message)
-            # Send image
-            await telegram_bot.send_photo(chat_id=config4.CHAT_ID, photo=image_buffer)
-            # Update the last alert message for this symbol
-            last_alert_messages[symbol] = message
-        except Exception as e:
-            print(f"Error sending message for {symbol}: {e}")
+async def get_historical_data(symbol, interval, limit=50):
+    ohlcv = await market_data.fetch_ohlcv(symbol, interval, limit=limit)
+    return Candles.from_ohlcv(ohlcv)
+
+# Function to queue a Telegram alert with its chart as one captioned photo
+async def send_telegram_message(symbol, message, historical_data, title):
+    # Skip messages already sent or queued for this symbol before paying for a render
+    if telegram_outbox.is_duplicate(symbol, message):
+        return
+    image = await chart_renderer.render(plot_candles, historical_data, symbol, title)
+    telegram_outbox.submit(symbol, message, image)
+
+# Function to check a single symbol and send an alert with chart
+async def process_symbol(symbol):
+    try:
+        historical_data = await get_historical_data(symbol, interval)
+        
+        # Check amplitude ratio for the latest candle
+        amplitude_ratio = historical_data.high[-1] / historical_data.low[-1]
+        
+        if amplitude_ratio >= 1.1:
+            # Include amplitude ratio in the message
+            message = f'/set_symbols {symbol} {amplitude_ratio:.2f}'
+            title = f'Amplitude Alert for {symbol}'
+            await send_telegram_message(symbol, message, historical_data, title)
+
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
 
 # Main function (now defined as async)
 async def main():
     while True:
-        for symbol in config4.SELECTED_SYMBOLS:
-            try:
-                historical_data = get_historical_data(symbol, interval)
-                
-                # Check amplitude ratio for the latest candle
-                latest_candle = historical_data.iloc[-1]
-                amplitude_ratio = latest_candle['High'] / latest_candle['Low']
-                
-                if amplitude_ratio >= 1.1:
-                    # Include amplitude ratio in the message
-                    message = f'/set_symbols {symbol} {amplitude_ratio:.2f}'
-                    title = f'Amplitude Alert for {symbol}'
-                    # Plot and get image buffer
-                    image_buffer = plot_candles(historical_data, symbol, title)
-                    await send_telegram_message(symbol, message, image_buffer)
-
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-
-        # Sleep for a specified interval before checking again
-        await asyncio.sleep(900)  # Adjust the sleep duration as needed
+        # Rank symbols by 24h amplitude from one all-tickers request, then fetch candles only for candidates
+        try:
+            candidates = await prescan_amplitude(market_data, config4.SELECTED_SYMBOLS, 1.1, prescan_top_n)
+        except Exception as e:
+            print(f"Prescan failed, checking all symbols: {e}")
+            candidates = config4.SELECTED_SYMBOLS
+
+        # Check the candidates concurrently
+        await market_data.run_for_symbols(candidates, process_symbol)
+        print(telegram_outbox.summary())
+
+        # Wait for the next bar close before checking again
+        await ticks.wait()
 
 # Initialize Telegram Bot
 telegram_bot = Bot(token=config4.TELEGRAM_TOKEN)
+telegram_outbox = TelegramOutbox(telegram_bot, config4.CHAT_ID, last_alert_messages)
 
-# Use nest_asyncio to allow running asyncio in Jupyter notebooks
-nest_asyncio.apply()
+# Run only when executed directly: the chart render workers are spawned and re-import this script
+if __name__ == "__main__":
+    # Use nest_asyncio to allow running asyncio in Jupyter notebooks
+    nest_asyncio.apply()
 
-# Create and run the event loop
-asyncio.run(main())
\ No newline at end of file
+    # Create and run the event loop
+    asyncio.run(main())
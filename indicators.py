@@ -0,0 +1,158 @@
+from collections import deque
+import numpy as np
+
+# Incremental indicators: each update() is O(1) and matches the pandas/ta formulas used by the
+# strategies (ewm(span=period, adjust=False), rolling(window).mean(), ta.trend.MACD).
+# EMA values before `ready` are still returned but correspond to NaN in the pandas/ta outputs;
+# SMA and MACD return None there.
+
+# Exponential moving average, same recursion as ewm(span=period, adjust=False)
+class EMA:
+    __slots__ = ('period', 'alpha', 'value', 'count')
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value = None
+        self.count = 0
+
+    @property
+    def ready(self):
+        return self.count >= self.period
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.value
+
+    # Value the EMA would have after x, without committing it (for a still-forming bar)
+    def peek(self, x):
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+
+    # Function to seed a fresh EMA from a window of closes, returns the values at the last `keep` bars.
+    # The recursion unrolled: the value at bar t weighs bar k by alpha * (1 - alpha) ** (t - k), and the
+    # first bar by (1 - alpha) ** t, so each value is one dot product instead of a loop over the window.
+    def seed(self, closes, keep=1):
+        closes = np.asarray(closes, dtype=np.float64)
+        count = len(closes)
+        decay = (1 - self.alpha) ** np.arange(count - 1, -1, -1)
+        values = []
+        for t in range(max(0, count - keep), count):
+            weights = self.alpha * decay[count - 1 - t:]
+            weights[0] = decay[count - 1 - t]
+            values.append(float(weights @ closes[:t + 1]))
+        self.value = values[-1] if values else None
+        self.count = count
+        return values
+
+# Simple moving average over a fixed window, same as rolling(window).mean()
+class SMA:
+    __slots__ = ('period', 'window', 'total', 'value')
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.value = None
+
+    @property
+    def ready(self):
+        return len(self.window) == self.period
+
+    def update(self, x):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        self.value = self.total / self.period if self.ready else None
+        return self.value
+
+    def peek(self, x):
+        if len(self.window) < self.period - 1:
+            return None
+        dropped = self.window[0] if len(self.window) == self.period else 0.0
+        return (self.total - dropped + x) / self.period
+
+    # Function to seed a fresh SMA from a window of closes, returns the values at the last `keep` bars.
+    # Only the bars still inside the last `keep` windows matter.
+    def seed(self, closes, keep=1):
+        return [self.update(float(x)) for x in closes[-(self.period + keep - 1):]][-keep:]
+
+# MACD line, signal and histogram, same as ta.trend.MACD(close, 26, 12, 9)
+class MACD:
+    __slots__ = ('fast', 'slow', 'signal_ema', 'macd', 'signal', 'histogram')
+
+    def __init__(self, window_fast=12, window_slow=26, window_sign=9):
+        self.fast = EMA(window_fast)
+        self.slow = EMA(window_slow)
+        self.signal_ema = EMA(window_sign)
+        self.macd = None
+        self.signal = None
+        self.histogram = None
+
+    @property
+    def ready(self):
+        return self.signal_ema.ready
+
+    def update(self, x):
+        fast = self.fast.update(x)
+        slow = self.slow.update(x)
+        if not (self.fast.ready and self.slow.ready):
+            return None
+        # The signal line starts at the first valid MACD value, like ewm over a series with leading NaNs
+        self.macd = fast - slow
+        self.signal = self.signal_ema.update(self.macd)
+        # ta leaves the histogram NaN until the signal line has window_sign values
+        self.histogram = self.macd - self.signal if self.signal_ema.ready else None
+        return self.histogram
+
+    # Function to seed a fresh MACD from a window of closes, returns the histogram at the last `keep` bars
+    def seed(self, closes, keep=1):
+        return [self.update(float(x)) for x in closes][-keep:]
+
+# Indicators for one symbol, fed with closed bars only. The first sync seeds them from the whole
+# fetched window, matching the strategies' pandas/ta values on that window; after that only the
+# newly closed bars are fed, O(1) per bar, so the values are those of pandas/ta over every bar
+# since the first sync rather than over the current window. They converge on the same values
+# once the window is a few periods longer than the indicator (see tests/test_indicators.py).
+# The series is seeded again only if the window no longer reaches the last bar fed (a gap).
+# get(name, back=1) is the value at the latest closed bar (index -2 of the strategy candles),
+# back=2 the bar before it, and so on.
+class IndicatorSeries:
+    def __init__(self, factories, keep=3):
+        self.factories = factories  # name -> callable building a fresh indicator
+        self.keep = keep
+        self.reset()
+
+    def reset(self):
+        self.indicators = {name: factory() for name, factory in self.factories.items()}
+        self.history = deque(maxlen=self.keep)
+        self.forming = {}
+        self.last_timestamp = None
+
+    # Function to feed the closed bars newer than the last one seen; the final bar is treated as forming
+    def sync(self, timestamps, closes, peek_forming=False):
+        closed = len(timestamps) - 1
+        if closed <= 0:
+            return self
+        if self.last_timestamp is None or int(timestamps[0]) > self.last_timestamp:
+            # First call, or bars are missing between the last one fed and the window: seed from the window
+            self.reset()
+            seeded = {name: indicator.seed(closes[:closed], self.keep) for name, indicator in self.indicators.items()}
+            self.history.extend(dict(zip(seeded, values)) for values in zip(*seeded.values()))
+            start = closed
+        else:
+            start = int(np.searchsorted(timestamps[:closed], self.last_timestamp, side='right'))
+
+        for i in range(start, closed):
+            close = float(closes[i])
+            self.history.append({name: indicator.update(close) for name, indicator in self.indicators.items()})
+        self.last_timestamp = int(timestamps[closed - 1])
+
+        if peek_forming:
+            close = float(closes[-1])
+            self.forming = {name: indicator.peek(close) for name, indicator in self.indicators.items()}
+        return self
+
+    def get(self, name, back=1):
+        return self.history[-back][name]
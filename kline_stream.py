@@ -0,0 +1,156 @@
+import asyncio
+import json
+import ccxt
+from candle_buffer import CandleBuffer
+
+BYBIT_PUBLIC_LINEAR_URL = 'wss://stream.bybit.com/v5/public/linear'
+
+# Bybit kline topic intervals keyed by ccxt timeframe
+WS_INTERVALS = {
+    '1m': '1', '3m': '3', '5m': '5', '15m': '15', '30m': '30',
+    '1h': '60', '2h': '120', '4h': '240', '6h': '360', '12h': '720',
+    '1d': 'D', '1w': 'W', '1M': 'M',
+}
+
+# Bybit limits the number of topics per subscribe request
+SUBSCRIBE_BATCH_SIZE = 10
+PING_INTERVAL = 20
+RECONNECT_DELAY = 5
+SYMBOL_SYNC_INTERVAL = 1
+
+# Function to convert a ccxt symbol (BTC/USDT:USDT) to its Bybit topic form (BTCUSDT)
+def topic_symbol(symbol):
+    return symbol.split(':')[0].replace('/', '')
+
+# Subscribes to Bybit kline topics and keeps each symbol's candle series in memory
+class KlineStream:
+    def __init__(self, timeframe, on_bar_close, market_data=None, url=BYBIT_PUBLIC_LINEAR_URL, history=500):
+        self.timeframe = timeframe
+        self.ws_interval = WS_INTERVALS[timeframe]
+        self.timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.on_bar_close = on_bar_close
+        self.market_data = market_data
+        self.url = url
+        self.history = history
+        self.series = {}  # symbol -> CandleBuffer
+        self.topics = {}  # topic -> symbol
+        self.ws = None
+        self.pending = set()
+        self.provisional = set()  # Symbols whose last bar is a provisional one opened by candles()
+
+    def topic(self, symbol):
+        return f"kline.{self.ws_interval}.{topic_symbol(symbol)}"
+
+    # Function to warm up a symbol's series from REST before streaming updates arrive
+    async def seed(self, symbol):
+        self.provisional.discard(symbol)
+        series = CandleBuffer(self.history)
+        if self.market_data is not None:
+            try:
+                series.merge(await self.market_data.fetch_ohlcv(symbol, self.timeframe, limit=self.history))
+            except Exception as e:
+                print(f"Error seeding {symbol}: {e}")
+        self.series[symbol] = series
+
+    async def send_op(self, op, topics):
+        for i in range(0, len(topics), SUBSCRIBE_BATCH_SIZE):
+            await self.ws.send(json.dumps({'op': op, 'args': topics[i:i + SUBSCRIBE_BATCH_SIZE]}))
+
+    # Function to subscribe to new symbols and unsubscribe from removed ones
+    async def sync_symbols(self, symbols):
+        wanted = {self.topic(symbol): symbol for symbol in symbols}
+        added = [topic for topic in wanted if topic not in self.topics]
+        removed = [topic for topic in self.topics if topic not in wanted]
+        if not added and not removed:
+            return
+
+        await asyncio.gather(*(self.seed(wanted[topic]) for topic in added))
+        for topic in removed:
+            self.series.pop(self.topics[topic], None)
+            self.provisional.discard(self.topics[topic])
+        self.topics = wanted
+
+        await self.send_op('subscribe', added)
+        await self.send_op('unsubscribe', removed)
+
+    # Function to merge a kline update into the series, returns True when the bar is confirmed
+    def apply_kline(self, symbol, kline):
+        bar = [
+            int(kline['start']),
+            float(kline['open']),
+            float(kline['high']),
+            float(kline['low']),
+            float(kline['close']),
+            float(kline['volume']),
+        ]
+        series = self.series.get(symbol)
+        if series is None:
+            series = self.series[symbol] = CandleBuffer(self.history)
+        if symbol in self.provisional:
+            if bar[0] <= series.column('timestamp')[-2]:
+                return False  # Repeated update for the bar that already closed
+            # The first update of the next bar replaces the provisional one, whatever its start time
+            self.provisional.discard(symbol)
+            series.update_last(bar)
+            return bool(kline.get('confirm'))
+        last_timestamp = series.last_timestamp
+        if last_timestamp is not None and bar[0] < last_timestamp:
+            return False  # Stale update for an older bar
+        series.merge([bar])
+        return bool(kline.get('confirm'))
+
+    async def handle_message(self, raw):
+        message = json.loads(raw)
+        symbol = self.topics.get(message.get('topic'))
+        if symbol is None:
+            return
+        for kline in message.get('data', []):
+            if self.apply_kline(symbol, kline):
+                # Run the callback in its own task so many simultaneous closes don't queue behind each other
+                task = asyncio.create_task(self.on_bar_close(symbol, self.candles(symbol)))
+                self.pending.add(task)
+                task.add_done_callback(self.pending.discard)
+
+    # Function to get a snapshot of the candles for a symbol right after a bar closed. The callback task
+    # runs later, so it gets copies: views would see the next updates overwrite the ring buffer.
+    def candles(self, symbol):
+        series = self.series[symbol]
+        # Open a provisional forming bar so the confirmed bar sits at index -2, as in REST polling mode.
+        # The first real update for the next bar overwrites it in place.
+        close = float(series.column('close')[-1])
+        series.append([series.last_timestamp + self.timeframe_ms, close, close, close, close, 0.0])
+        self.provisional.add(symbol)
+        return series.candles().copy()
+
+    async def ping(self):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            await self.ws.send(json.dumps({'op': 'ping'}))
+
+    async def follow_symbols(self, get_symbols):
+        while True:
+            await self.sync_symbols(list(get_symbols()))
+            await asyncio.sleep(SYMBOL_SYNC_INTERVAL)
+
+    # Function to stream klines for the symbols returned by get_symbols, reconnecting on errors
+    async def run(self, get_symbols):
+        import websockets  # Only streaming mode needs it, so polling scripts never load it
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    self.ws = ws
+                    self.topics = {}  # Resubscribe and reseed everything after a reconnect
+                    tasks = [
+                        asyncio.create_task(self.ping()),
+                        asyncio.create_task(self.follow_symbols(get_symbols)),
+                    ]
+                    try:
+                        async for raw in ws:
+                            await self.handle_message(raw)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+            except Exception as e:
+                print(f"Kline stream error: {e}")
+            self.ws = None
+            await asyncio.sleep(RECONNECT_DELAY)
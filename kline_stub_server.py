@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import websockets
+
+# Local stand-in for the Bybit public kline WebSocket, used to exercise stream mode offline.
+# Point a strategy's stream_url at ws://127.0.0.1:<port> to use it.
+
+# Synthetic random-walk candle for one topic
+class SyntheticKline:
+    def __init__(self, bar_ms, seed):
+        self.bar_ms = bar_ms
+        self.random = random.Random(seed)
+        self.price = 100.0
+        self.start = None
+
+    def tick(self, now_ms):
+        bar_start = now_ms - now_ms % self.bar_ms
+        messages = []
+        if self.start is not None and bar_start != self.start:
+            messages.append(self.kline(confirm=True))  # Close the previous bar before opening a new one
+        if self.start != bar_start:
+            self.start = bar_start
+            self.open = self.high = self.low = self.price
+            self.volume = 0.0
+        self.price *= 1 + self.random.gauss(0, 0.002)
+        self.high = max(self.high, self.price)
+        self.low = min(self.low, self.price)
+        self.volume += self.random.random()
+        messages.append(self.kline(confirm=False))
+        return messages
+
+    def kline(self, confirm):
+        return {
+            'start': self.start,
+            'end': self.start + self.bar_ms - 1,
+            'open': str(self.open),
+            'close': str(self.price),
+            'high': str(self.high),
+            'low': str(self.low),
+            'volume': str(self.volume),
+            'confirm': confirm,
+            'timestamp': int(time.time() * 1000),
+        }
+
+# Function to serve one client connection
+async def handle_client(ws, bar_ms, tick_interval):
+    klines = {}
+
+    async def feed():
+        while True:
+            now_ms = int(time.time() * 1000)
+            for topic, kline in list(klines.items()):
+                for data in kline.tick(now_ms):
+                    await ws.send(json.dumps({'topic': topic, 'type': 'snapshot', 'ts': now_ms, 'data': [data]}))
+            await asyncio.sleep(tick_interval)
+
+    feed_task = asyncio.create_task(feed())
+    try:
+        async for raw in ws:
+            request = json.loads(raw)
+            op = request.get('op')
+            if op == 'ping':
+                await ws.send(json.dumps({'op': 'pong', 'success': True}))
+            elif op in ('subscribe', 'unsubscribe'):
+                for topic in request.get('args', []):
+                    if op == 'subscribe':
+                        klines.setdefault(topic, SyntheticKline(bar_ms, topic))
+                    else:
+                        klines.pop(topic, None)
+                await ws.send(json.dumps({'op': op, 'success': True, 'ret_msg': ''}))
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        feed_task.cancel()
+
+async def serve(host, port, bar_seconds, tick_interval):
+    async def handler(ws, *args):
+        await handle_client(ws, int(bar_seconds * 1000), tick_interval)
+
+    async with websockets.serve(handler, host, port):
+        print(f"Kline stub server listening on ws://{host}:{port} ({bar_seconds}s bars)")
+        await asyncio.Future()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Bybit kline WebSocket stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--bar-seconds', type=float, default=5, help="length of each synthetic bar")
+    parser.add_argument('--tick-interval', type=float, default=0.5, help="seconds between kline updates")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.bar_seconds, args.tick_interval))
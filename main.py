@@ -1,66 +1,86 @@
-import ccxt
-import pandas as pd
 import asyncio
-import requests
+import os
 import config
 from datetime import datetime, timezone
-from telegram import Update
-from telegram.ext import Application, CommandHandler
+from typing import TYPE_CHECKING
+from market_data import MarketDataClient
+from tick_scheduler import TickScheduler
+from metrics import metrics, start_metrics_server
+from webhook_dispatcher import WebhookDispatcher
+from candle_buffer import CandleBufferSet
+from candle_store import CandleStore
+from batch_signals import align_closes, rolling_mean_at, sma_vs_day_open_signals
+from rate_limiter import SymbolPriorities, threshold_distance, crossing_distance
+from htf_cache import HigherTimeframeCache, previous_close, previous_amplitude
+from kline_stream import KlineStream, BYBIT_PUBLIC_LINEAR_URL
+from market_registry import MarketRegistry
+from state_store import state
+
+if TYPE_CHECKING:
+    from telegram import Update  # Handler annotations only, python-telegram-bot is imported when the bot starts
 
 interval = '1s'
+cycle_timeframe = '10s'  # Polling cycles run just after each bar of this timeframe closes
+metrics_port = 9101  # Local Prometheus endpoint at http://127.0.0.1:9101/metrics
+
+# Set to True to stream klines over WebSocket instead of polling REST
+stream_mode = False
+stream_interval = '1m'  # Bybit kline streams start at 1-minute bars
+stream_url = BYBIT_PUBLIC_LINEAR_URL
+
+# Initialize shared async market-data client
+market_data = MarketDataClient(config.API_KEY, config.API_SECRET)
+
+# Wakes the polling loop just after each cycle_timeframe bar closes on the exchange clock
+ticks = TickScheduler(cycle_timeframe, market_data)
 
-# Initialize bybit client
-bybit = ccxt.bybit({
-    'apiKey': config.API_KEY,
-    'secret': config.API_SECRET,
-})
+# Per-symbol candle buffers, warmed from the local candle store and refreshed incrementally
+candle_buffers = CandleBufferSet(market_data, CandleStore())
+
+# Higher-timeframe candles, refetched only after the next bar boundary
+htf_cache = HigherTimeframeCache(market_data)
+
+# Perpetual markets in config.AVAILABLE_SYMBOLS, loaded once and refreshed in the background
+markets = MarketRegistry(market_data.load_markets, market_type='swap', allowed=config.AVAILABLE_SYMBOLS)
+
+# State kept in the state store under this script's name, restored after a restart
+state_scope = os.path.basename(__file__)
 
 # Dictionary to store the last alert messages for each symbol
-last_alert_messages = {}
+last_alert_messages = state.mapping(state_scope, 'last_alert_messages')
+
+# Pooled async 3commas webhook sender, updates last_alert_messages only on HTTP 200
+webhook = WebhookDispatcher(config.THREE_COMMAS_WEBHOOK_URL, last_alert_messages)
 
 # List of selected symbols from Telegram (global variable)
-selected_symbols = []
+selected_symbols = state.value(state_scope, 'selected_symbols', [])
+
+# How close each symbol is to a signal, hot symbols are fetched first and cold ones deferred under load
+priorities = SymbolPriorities()
 
 # Function to get historical candlestick data
-def get_historical_data(symbol, interval, limit=20):
-    ohlcv = bybit.fetch_ohlcv(symbol, interval, limit=limit)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    return df
+async def get_historical_data(symbol, interval, limit=20):
+    buffer = await candle_buffers.refresh(symbol, interval, limit)
+    return buffer.candles()
 
 # Function to get day open price
-def get_day_open_price(symbol):
-    day_ohlcv = bybit.fetch_ohlcv(symbol, '4h', limit=3)
-    df_day = pd.DataFrame(day_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df_day['timestamp'] = pd.to_datetime(df_day['timestamp'], unit='ms')
-    df_day.set_index('timestamp', inplace=True)
-    day_open_price = df_day['close'].iloc[-2]
-    return day_open_price
-
-# Function to calculate SMA
-def calculate_sma(df, period):
-    return df['close'].rolling(window=period).mean()
+async def get_day_open_price(symbol):
+    return await htf_cache.value(symbol, '4h', previous_close)
+
+# Function to calculate the SMA of the closes at bar `at` (rolling(period).mean().iloc[at])
+def calculate_sma(candles, period, at=-2):
+    return rolling_mean_at(candles.close, period, at)
 
 # Function to check SMA crossover against day open price
-def check_sma_crossover_vs_day_open(df, day_open_price, short_period=3):
-    df['sma_short'] = calculate_sma(df, short_period)  # Already returns a Series, so no squeeze needed
-    cross_over = df['sma_short'].iloc[-2] > day_open_price
-    cross_under = df['sma_short'].iloc[-2] < day_open_price
+def check_sma_crossover_vs_day_open(candles, day_open_price, short_period=3):
+    sma_short = calculate_sma(candles, short_period)
+    cross_over = sma_short > day_open_price
+    cross_under = sma_short < day_open_price
     return cross_over, cross_under
 
 # Function to get previous day's amplitude ratio
-def get_previous_day_amplitude(symbol):
-    daily_ohlcv = bybit.fetch_ohlcv(symbol, '4h', limit=5)
-    df_daily = pd.DataFrame(daily_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df_daily['timestamp'] = pd.to_datetime(df_daily['timestamp'], unit='ms')
-    df_daily.set_index('timestamp', inplace=True)
-    
-    prev_day_high = df_daily['high'].iloc[-2]
-    prev_day_low = df_daily['low'].iloc[-2]
-    
-    amplitude_ratio = prev_day_high / prev_day_low
-    return amplitude_ratio
+async def get_previous_day_amplitude(symbol):
+    return await htf_cache.value(symbol, '4h', previous_amplitude)
 
 # Function to send a message to 3commas using a webhook
 def send_3commas_message(symbol, action, close_price, bot_uuid, secret):
@@ -77,32 +97,28 @@ def send_3commas_message(symbol, action, close_price, bot_uuid, secret):
             "bot_uuid": bot_uuid
         }
 
-        try:
-            url = config.THREE_COMMAS_WEBHOOK_URL
-            response = requests.post(url, json=payload)
+        webhook.submit(symbol, action, payload)
 
-            if response.status_code == 200:
-                print(f"Successfully sent alert for {symbol} with action {action} to bot {bot_uuid}")
-                last_alert_messages[symbol] = action
-            else:
-                print(f"Failed to send alert for {symbol} to bot {bot_uuid}: {response.content}")
-
-        except requests.RequestException as e:
-            print(f"Error sending request for {symbol} to bot {bot_uuid}: {e}")
-
-# Updated function to set symbols by matching against config.AVAILABLE_SYMBOLS
-async def set_symbols(update: Update, context) -> None:
+# Updated function to set symbols by matching against the markets in config.AVAILABLE_SYMBOLS
+async def set_symbols(update: 'Update', context) -> None:
     global selected_symbols
     user_symbols = context.args
 
+    await markets.ensure_loaded()
+    if not markets.loaded:
+        await update.message.reply_text("Market list unavailable, try again shortly.")
+        return
+
     if user_symbols:
-        # Convert user input to uppercase and filter only those in config.AVAILABLE_SYMBOLS
-        valid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() in config.AVAILABLE_SYMBOLS]
-        invalid_symbols = [symbol.upper() for symbol in user_symbols if symbol.upper() not in config.AVAILABLE_SYMBOLS]
+        # Accept BTCUSDT or BTC/USDT, selected symbols keep the config form (BTCUSDT)
+        resolved = {symbol.upper(): markets.get(symbol) for symbol in user_symbols}
+        valid_symbols = list(dict.fromkeys(market.key for market in resolved.values() if market is not None))
+        invalid_symbols = [symbol for symbol, market in resolved.items() if market is None]
 
         # Add valid symbols to the selected_symbols list, avoiding duplicates
         new_symbols = [symbol for symbol in valid_symbols if symbol not in selected_symbols]
         selected_symbols.extend(new_symbols)
+        state.save(state_scope, 'selected_symbols', selected_symbols)
 
         # Prepare a response message
         response_message = ""
@@ -119,39 +135,109 @@ async def set_symbols(update: Update, context) -> None:
         await update.message.reply_text("No symbols provided. Usage: /set_symbols BTC/USDT ETH/USDT")
 
 # Command to reset symbols
-async def reset_symbols(update: Update, context) -> None:
+async def reset_symbols(update: 'Update', context) -> None:
     global selected_symbols
     selected_symbols = []
+    state.save(state_scope, 'selected_symbols', selected_symbols)
+    candle_buffers.discard(selected_symbols)
+    htf_cache.discard(selected_symbols)
+    priorities.discard(selected_symbols)
     await update.message.reply_text("Symbols have been reset.")
 
+# Function to evaluate signals for a symbol from its candles and 4h reference values
+def evaluate_symbol(symbol, historical_data, day_open_price, amplitude_ratio):
+    with metrics.timer('indicators', symbol):
+        cross_over, cross_under = check_sma_crossover_vs_day_open(historical_data, day_open_price)
+    close_price = historical_data.close[-1]
+    
+    print(f"Amplitude ratio for {symbol}: {amplitude_ratio}")
+    
+    if amplitude_ratio >= 1.10:
+        if cross_over:
+            send_3commas_message(symbol, "enter_long", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
+        elif cross_under:
+            send_3commas_message(symbol, "enter_short", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
+    else:
+        print(f"Amplitude condition not met for {symbol}, skipping...")
+
+# Function to fetch the candles and 4h reference values for a single symbol
+async def fetch_symbol(symbol):
+    try:
+        historical_data, day_open_price, amplitude_ratio = await asyncio.gather(
+            get_historical_data(symbol, interval),
+            get_day_open_price(symbol),
+            get_previous_day_amplitude(symbol),
+        )
+        return symbol, historical_data, day_open_price, amplitude_ratio
+
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+        return None
+
+# Function to evaluate all fetched symbols at once on a (symbols x bars) close matrix
+def evaluate_batch(results, bars=20):
+    results = [result for result in results if result is not None]
+    if not results:
+        return
+
+    symbols = [result[0] for result in results]
+    closes = align_closes([result[1].close for result in results], bars)
+    day_open = [result[2] for result in results]
+    amplitude = [result[3] for result in results]
+    rows = {symbol: row for row, symbol in enumerate(symbols)}
+
+    signals = sma_vs_day_open_signals(symbols, closes, day_open, amplitude)
+    for symbol, action in signals:
+        close_price = closes[rows[symbol], -1]
+        send_3commas_message(symbol, action, close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
+
+    # A symbol signals once its amplitude passes 1.10 and its SMA is on the other side of the day open
+    sma = rolling_mean_at(closes, 3, at=-1)
+    for symbol, sma_value, open_price, amplitude_ratio in zip(symbols, sma, day_open, amplitude):
+        priorities.set(symbol, max(threshold_distance(amplitude_ratio, 1.10), crossing_distance(sma_value, open_price)))
+
+    print(f"Evaluated {len(symbols)} symbols, {len(signals)} signals")
+
+# Function to evaluate signals when a streamed bar closes
+async def on_bar_close(symbol, historical_data):
+    try:
+        day_open_price, amplitude_ratio = await asyncio.gather(
+            get_day_open_price(symbol),
+            get_previous_day_amplitude(symbol),
+        )
+        with metrics.timer('evaluate', symbol):
+            evaluate_symbol(symbol, historical_data, day_open_price, amplitude_ratio)
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+
+# Function to run one polling cycle: fetch all selected symbols concurrently, then evaluate them together
+async def run_cycle():
+    results = await market_data.run_for_symbols(list(selected_symbols), fetch_symbol, priorities)
+    with metrics.timer('evaluate'):
+        evaluate_batch(results)
+
 # Main trading function
 async def main_trading():
     while True:
-        for symbol in selected_symbols:
-            try:
-                historical_data = get_historical_data(symbol, interval)
-                day_open_price = get_day_open_price(symbol)
-                cross_over, cross_under = check_sma_crossover_vs_day_open(historical_data, day_open_price)
-                close_price = historical_data['close'].iloc[-1]
-                amplitude_ratio = get_previous_day_amplitude(symbol)
-                
-                print(f"Amplitude ratio for {symbol}: {amplitude_ratio}")
-                
-                if amplitude_ratio >= 1.10:
-                    if cross_over:
-                        send_3commas_message(symbol, "enter_long", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
-                    elif cross_under:
-                        send_3commas_message(symbol, "enter_short", close_price, "00830f96-c475-4c3e-9e38-9a4495e3b78c", config.SECRET_1)
-                else:
-                    print(f"Amplitude condition not met for {symbol}, skipping...")
-
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-
-        await asyncio.sleep(10)
+        with metrics.timer('cycle'):
+            await run_cycle()
+        print(market_data.scheduler.report())
+        await ticks.wait()
+
+# Streaming trading function, evaluates each symbol on every confirmed bar close
+async def main_streaming():
+    stream = KlineStream(stream_interval, on_bar_close, market_data, url=stream_url, history=20)
+    await stream.run(lambda: selected_symbols)
+
+# Command to show per-stage latencies and event counts
+async def stats(update: 'Update', context) -> None:
+    await update.message.reply_text(metrics.summary())
 
 # Start Telegram bot
 async def start_telegram_bot():
+    # Imported here rather than at load time, so the first trading cycle does not wait for it
+    from telegram.ext import Application, CommandHandler
+
     application = Application.builder().token(config.TELEGRAM_TOKEN).build()
     
     # Initialize the application (fixes the error)
@@ -159,15 +245,17 @@ async def start_telegram_bot():
 
     application.add_handler(CommandHandler('set_symbols', set_symbols))
     application.add_handler(CommandHandler('reset_symbols', reset_symbols))
+    application.add_handler(CommandHandler('stats', stats))
 
     await application.start()
     await application.updater.start_polling()
 
 # Main function to run both bot and trading
 async def main():
+    await start_metrics_server(metrics_port)
     await asyncio.gather(
-        start_telegram_bot(),
-        main_trading()
+        main_streaming() if stream_mode else main_trading(),
+        start_telegram_bot()
     )
 
 # Run the main function
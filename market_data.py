@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+import time
+import ccxt.async_support as ccxt_async
+from rate_limiter import RequestScheduler, HOT_PRIORITY
+from metrics import metrics
+
+# Default number of REST requests allowed in flight at the same time
+MAX_CONCURRENT_REQUESTS = 20
+
+# Seconds between measurements of the offset between the local and the exchange clock
+CLOCK_SYNC_INTERVAL = 3600
+
+# Priority of the symbol whose task is making the request, set per task by run_for_symbols
+request_priority = contextvars.ContextVar('request_priority', default=HOT_PRIORITY)
+
+# Shared async market-data client used by the strategy loops
+class MarketDataClient:
+    def __init__(self, api_key=None, secret=None, max_concurrency=MAX_CONCURRENT_REQUESTS, scheduler=None,
+                 clock=time.time):
+        self.api_key = api_key
+        self.secret = secret
+        self.max_concurrency = max_concurrency
+        self.scheduler = scheduler or RequestScheduler()
+        self.exchange = None
+        self.semaphore = None
+        self.clock = clock  # Seconds since the epoch, replaced by the replay's virtual clock
+        self.clock_offset_ms = 0.0
+        self.clock_synced = None
+
+    # The ccxt async client and the semaphore must be created inside the running event loop.
+    # An exchange assigned beforehand (e.g. fake_exchange.FakeExchange) is used as is.
+    def _ensure_exchange(self):
+        if self.exchange is None:
+            self.exchange = ccxt_async.bybit({
+                'apiKey': self.api_key,
+                'secret': self.secret,
+                'enableRateLimit': False,  # The request scheduler does the throttling
+            })
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.exchange
+
+    # Function to send one request through the scheduler's token buckets and the concurrency limit,
+    # timed from queueing to response as the given metrics stage
+    async def _request(self, endpoint, call, symbol='', stage='fetch'):
+        async def send():
+            async with self.semaphore:
+                return await call()
+        try:
+            with metrics.timer(stage, symbol):
+                return await self.scheduler.call(endpoint, send, request_priority.get())
+        except Exception:
+            metrics.increment(endpoint + '_errors', symbol)
+            raise
+
+    # Function to fetch candlestick data without blocking the event loop
+    async def fetch_ohlcv(self, symbol, timeframe, limit=None, since=None):
+        exchange = self._ensure_exchange()
+        return await self._request('fetch_ohlcv', lambda: exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit),
+                                   symbol)
+
+    # Function to fetch 24h ticker snapshots for every perpetual in a single request
+    async def fetch_tickers(self):
+        exchange = self._ensure_exchange()
+        return await self._request('fetch_tickers', lambda: exchange.fetch_tickers(params={'type': 'swap'}))
+
+    # Function to load the exchange's markets afresh (market_registry.MarketRegistry caches them)
+    async def load_markets(self):
+        exchange = self._ensure_exchange()
+        return await self._request('load_markets', lambda: exchange.load_markets(True))
+
+    # Function to place an order, timed from queueing to the exchange's acknowledgement as the order stage
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        params = params or {}
+        exchange = self._ensure_exchange()
+        return await self._request('create_order', lambda: exchange.create_order(symbol, type, side, amount, price, params),
+                                   symbol, 'order')
+
+    # Function to cancel an open order
+    async def cancel_order(self, order_id, symbol):
+        exchange = self._ensure_exchange()
+        return await self._request('cancel_order', lambda: exchange.cancel_order(order_id, symbol), symbol, 'order')
+
+    # Function to find an order by its client order id (Bybit orderLinkId), None if the exchange has no such order
+    async def fetch_order_by_client_id(self, symbol, client_order_id):
+        exchange = self._ensure_exchange()
+        params = {'orderLinkId': client_order_id}
+        for fetch in (exchange.fetch_open_orders, exchange.fetch_closed_orders):
+            orders = await self._request('fetch_order', lambda: fetch(symbol, params=params), symbol)
+            if orders:
+                return orders[0]
+        return None
+
+    # Function to measure the exchange clock offset, half the round trip is credited to each leg
+    async def sync_clock(self):
+        exchange = self._ensure_exchange()
+        self.clock_synced = time.monotonic()
+        try:
+            sent = self.clock()
+            server_ms = await self._request('fetch_time', exchange.fetch_time)
+            self.clock_offset_ms = server_ms - (sent + self.clock()) * 500
+        except Exception as e:
+            print(f"Error syncing exchange clock: {e}")
+
+    # Function to get the local time in ms
+    def now_ms(self):
+        return self.clock() * 1000
+
+    # Function to get the exchange's current time in ms from the last measured offset, without a request
+    def server_now_ms(self):
+        return self.now_ms() + self.clock_offset_ms
+
+    # Function to get the exchange's current time in ms
+    async def server_time_ms(self):
+        if self.clock_synced is None or time.monotonic() - self.clock_synced >= CLOCK_SYNC_INTERVAL:
+            await self.sync_clock()
+        return self.server_now_ms()
+
+    # Function to run a per-symbol coroutine for all symbols concurrently. With a SymbolPriorities,
+    # each symbol's requests are queued by its priority and cold symbols are skipped (None result)
+    # while the request budget is saturated.
+    async def run_for_symbols(self, symbols, handler, priorities=None):
+        if priorities is None:
+            return await asyncio.gather(*(handler(symbol) for symbol in symbols))
+
+        due = priorities.due(symbols, self.scheduler.saturation())
+        if len(due) < len(symbols):
+            print(f"Request budget saturated, deferred {len(symbols) - len(due)} cold symbols")
+
+        async def run_symbol(symbol):
+            request_priority.set(priorities.get(symbol))  # Each gathered coroutine runs in its own task context
+            return await handler(symbol)
+
+        results = dict(zip(due, await asyncio.gather(*(run_symbol(symbol) for symbol in due))))
+        return [results.get(symbol) for symbol in symbols]
+
+    # Function to release the underlying HTTP session
+    async def close(self):
+        if self.exchange is not None:
+            await self.exchange.close()
+            self.exchange = None
+        self.semaphore = None
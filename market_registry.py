@@ -0,0 +1,98 @@
+import asyncio
+import math
+import time
+from prescan import symbol_key
+
+MARKETS_TTL = 3600  # Seconds before the market list is reloaded in the background
+
+# Order constraints of one market, precomputed from the ccxt market structure.
+# Bybit reports precision as tick sizes (ccxt TICK_SIZE mode), e.g. an amount step of 0.001.
+class MarketInfo:
+    __slots__ = ('symbol', 'id', 'key', 'amount_step', 'amount_decimals', 'price_step', 'min_amount', 'min_cost')
+
+    def __init__(self, market):
+        precision = market.get('precision') or {}
+        limits = market.get('limits') or {}
+        self.symbol = market['symbol']
+        self.id = market.get('id') or symbol_key(market['symbol'])
+        self.key = symbol_key(market['symbol'])  # BTCUSDT form, as in config.AVAILABLE_SYMBOLS
+        self.amount_step = precision.get('amount')
+        self.amount_decimals = max(0, -math.floor(math.log10(self.amount_step))) if self.amount_step else None
+        self.price_step = precision.get('price')
+        self.min_amount = (limits.get('amount') or {}).get('min')
+        self.min_cost = (limits.get('cost') or {}).get('min')
+
+    # Function to get the order quantity for `notional` quote currency at `price`, rounded down to the
+    # amount step, or None if it is below the market's minimum amount or cost
+    def amount_for(self, notional, price):
+        amount = notional / price
+        if self.amount_step:
+            amount = round(math.floor(amount / self.amount_step + 1e-9) * self.amount_step, self.amount_decimals)
+        if not amount or (self.min_amount and amount < self.min_amount) or (self.min_cost and amount * price < self.min_cost):
+            return None
+        return amount
+
+# Exchange markets loaded once and refreshed in the background every `ttl` seconds. Each market is
+# indexed under its ccxt symbol (BTC/USDT or BTC/USDT:USDT), its exchange id and its BTCUSDT form,
+# so either spelling resolves with one dict lookup. `load` is an async callable returning ccxt
+# markets; `market_type` keeps one type ('spot', 'swap') so BTCUSDT is unambiguous, and `allowed`
+# optionally restricts the index to a symbol list such as config.AVAILABLE_SYMBOLS.
+class MarketRegistry:
+    def __init__(self, load, market_type=None, allowed=None, ttl=MARKETS_TTL):
+        self.load = load
+        self.market_type = market_type
+        self.allowed = None if allowed is None else {symbol_key(symbol) for symbol in allowed}
+        self.ttl = ttl
+        self.index = {}
+        self.loaded_at = None
+        self.task = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def _build_index(self, markets):
+        index = {}
+        for market in markets.values():
+            if self.market_type is not None and market.get('type') != self.market_type:
+                continue
+            if market.get('active') is False:
+                continue
+            info = MarketInfo(market)
+            if self.allowed is not None and info.key not in self.allowed:
+                continue
+            for name in (info.symbol, info.id, info.key):
+                index.setdefault(name, info)
+        return index
+
+    async def _refresh(self):
+        try:
+            self.index = self._build_index(await self.load())
+            self.loaded_at = time.monotonic()
+        except Exception as e:
+            print(f"Error loading markets: {e}")
+        finally:
+            self.task = None
+
+    # Function to reload the markets, concurrent callers share one request
+    async def refresh(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self.task)
+
+    # Function to wait for the first load, later calls return at once and reload in the background once stale
+    async def ensure_loaded(self):
+        if self.loaded_at is None:
+            await self.refresh()
+        elif self.task is None and time.monotonic() - self.loaded_at >= self.ttl:
+            self.task = asyncio.ensure_future(self._refresh())
+
+    # Function to look up a market by any of its spellings, None if unknown (or not loaded yet)
+    def get(self, symbol):
+        return self.index.get(symbol) or self.index.get(symbol_key(symbol))
+
+    def __contains__(self, symbol):
+        return self.get(symbol) is not None
+
+    def __len__(self):
+        return len({info.symbol for info in self.index.values()})
@@ -0,0 +1,157 @@
+import bisect
+import contextvars
+import os
+import sys
+import time
+from contextlib import contextmanager
+from aiohttp import web
+
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9100
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Strategy label for everything measured in the current task. Standalone scripts are labelled
+# with their file name, the strategy runner sets it per plugin.
+current_strategy = contextvars.ContextVar('current_strategy', default=os.path.basename(sys.argv[0]) or 'python')
+
+# Latency histogram with fixed buckets, the last slot counts values above LATENCY_BUCKETS[-1]
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    # Function to estimate a quantile by interpolating inside the bucket it falls in
+    def quantile(self, q):
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                upper = LATENCY_BUCKETS[min(i, len(LATENCY_BUCKETS) - 1)]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return 0.0
+
+# Function to quote a Prometheus label value
+def label_value(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+# Process-wide stage latencies and event counters, labelled by strategy and symbol.
+# Stages: fetch, indicators, evaluate, render, dispatch, order and cycle. Symbol '' means the whole batch.
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = {}  # (stage, strategy, symbol) -> Histogram
+        self.counters = {}  # (event, strategy, symbol) -> count
+        self.started = time.time()
+
+    def observe(self, stage, seconds, symbol=''):
+        key = (stage, current_strategy.get(), symbol)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def increment(self, event, symbol='', value=1):
+        key = (event, current_strategy.get(), symbol)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    # Function to time a block as one observation of `stage`
+    @contextmanager
+    def timer(self, stage, symbol=''):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, symbol)
+
+    # Function to render every metric in the Prometheus text exposition format
+    def render(self):
+        lines = ['# HELP trading_stage_seconds Latency of each pipeline stage',
+                 '# TYPE trading_stage_seconds histogram']
+        for (stage, strategy, symbol), histogram in sorted(self.histograms.items()):
+            labels = f"stage={label_value(stage)},strategy={label_value(strategy)},symbol={label_value(symbol)}"
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'trading_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'trading_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'trading_stage_seconds_sum{{{labels}}} {histogram.total}')
+            lines.append(f'trading_stage_seconds_count{{{labels}}} {histogram.count}')
+
+        lines += ['# HELP trading_events_total Pipeline events such as signals, errors and failed deliveries',
+                  '# TYPE trading_events_total counter']
+        for (event, strategy, symbol), count in sorted(self.counters.items()):
+            lines.append(f"trading_events_total{{event={label_value(event)},strategy={label_value(strategy)},"
+                         f"symbol={label_value(symbol)}}} {count}")
+
+        lines += ['# HELP trading_uptime_seconds Seconds since the process started',
+                  '# TYPE trading_uptime_seconds gauge',
+                  f'trading_uptime_seconds {time.time() - self.started}']
+        return '\n'.join(lines) + '\n'
+
+    # Function to summarise latencies per strategy and stage for the /stats command,
+    # cut to max_length so it fits in one Telegram message
+    def summary(self, slowest=3, max_length=4096):
+        stages = {}
+        by_symbol = {}
+        for (stage, strategy, symbol), histogram in self.histograms.items():
+            stages.setdefault((strategy, stage), Histogram()).merge(histogram)
+            if symbol:
+                by_symbol.setdefault((strategy, stage), []).append((histogram.total / histogram.count, symbol))
+        events = {}
+        for (event, strategy, _), count in self.counters.items():
+            events[(strategy, event)] = events.get((strategy, event), 0) + count
+
+        if not stages and not events:
+            return "No metrics recorded yet."
+        lines = []
+        for (strategy, stage), histogram in sorted(stages.items()):
+            line = (f"{strategy} {stage}: {histogram.count} calls, avg {histogram.total / histogram.count:.3f}s, "
+                    f"p50 {histogram.quantile(0.5):.3f}s, p99 {histogram.quantile(0.99):.3f}s")
+            symbols = sorted(by_symbol.get((strategy, stage), []), reverse=True)[:slowest]
+            if len(symbols) > 1:
+                line += " - slowest " + ", ".join(f"{symbol} {seconds:.3f}s" for seconds, symbol in symbols)
+            lines.append(line)
+        for (strategy, event), count in sorted(events.items()):
+            lines.append(f"{strategy} {event}: {count}")
+
+        text = '\n'.join(lines)
+        if len(text) > max_length:
+            text = text[:text.rfind('\n', 0, max_length - 4)] + '\n...'
+        return text
+
+# Shared registry for everything running in this process
+metrics = MetricsRegistry()
+
+# Function to serve the registry at http://host:port/metrics, returns the aiohttp runner
+async def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    async def handle_metrics(request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
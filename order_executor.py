@@ -0,0 +1,218 @@
+import asyncio
+import ccxt
+from metrics import metrics
+from prescan import symbol_key
+
+SUBMIT_ATTEMPTS = 3  # Submissions of the same client order id before giving up
+RETRY_DELAY = 1.0  # Seconds between submissions after a network error
+POLL_INTERVAL = 0.5  # Seconds between order status checks
+FILL_TIMEOUT = 30  # Seconds to wait for a market order to fill before reporting it unfilled
+
+# Function to tell whether the exchange rejected an order because its client order id was already used
+def is_duplicate(error):
+    return isinstance(error, ccxt.DuplicateOrderId) or 'duplicate' in str(error).lower()
+
+# Order statuses that still block a new order for the same symbol and side
+ACTIVE_STATUSES = ('pending', 'open', 'canceling', 'unknown')
+
+# One order from signal to fill. Times are in ms on the market data clock.
+class OrderRecord:
+    __slots__ = ('client_id', 'symbol', 'side', 'amount', 'price', 'status', 'order_id', 'filled', 'average',
+                 'created_ms', 'acked_ms', 'filled_ms', 'error', 'on_filled')
+
+    def __init__(self, client_id, symbol, side, amount, price, created_ms, on_filled=None):
+        self.client_id = client_id
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.price = price
+        # pending -> open -> filled, or failed, or canceling (not filled in time) -> filled / unfilled / unknown
+        self.status = 'pending'
+        self.order_id = None
+        self.filled = 0.0
+        self.average = None
+        self.created_ms = created_ms
+        self.acked_ms = None
+        self.filled_ms = None
+        self.error = None
+        self.on_filled = on_filled
+
+# Places market orders without blocking the trading loop. Every order gets a client order id
+# (Bybit orderLinkId) derived from the strategy, symbol, side and signal, so the same signal never
+# trades twice: a repeat submit() returns the existing order, and a resubmission after a timeout
+# is rejected by the exchange as a duplicate instead of filling again. A timeout or a duplicate
+# rejection is resolved by looking the order up by its client id. Signals change every bar, so
+# while a symbol has an order on one side that is not settled, a new order on that side is
+# refused: an order not filled in time is canceled, and if the cancel cannot be confirmed it stays
+# unknown and is looked up again on the next submit. Fills are tracked by polling the order
+# status; submit-to-ack latency is recorded as the metrics `order` stage.
+class OrderExecutor:
+    def __init__(self, market_data, markets, prefix, poll_interval=POLL_INTERVAL, fill_timeout=FILL_TIMEOUT):
+        self.market_data = market_data
+        self.markets = markets
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+        self.fill_timeout = fill_timeout
+        self.orders = {}  # client id -> OrderRecord
+        self.active = {}  # (symbol, side) -> OrderRecord not settled yet
+        self.tasks = set()
+        self.stats = {'submitted': 0, 'filled': 0, 'failed': 0, 'unfilled': 0, 'duplicates': 0, 'skipped': 0,
+                      'in_flight': 0}
+
+    # Function to build the client order id, shortening the symbol to keep it within Bybit's 36 characters
+    def client_order_id(self, symbol, side, signal_id):
+        suffix = f"-{side}-{signal_id}"
+        return f"{self.prefix}-{symbol_key(symbol)[:35 - len(self.prefix) - len(suffix)]}{suffix}"
+
+    # Function to queue a market order for `notional` quote currency at about `price`, returns its record
+    # (the existing one if this signal was already submitted), or None if the order is too small or
+    # the symbol already has an unsettled order on this side. on_filled is called once the order fills,
+    # not if it is skipped, fails or stays unfilled.
+    def submit(self, symbol, side, notional, price, signal_id, on_filled=None):
+        client_id = self.client_order_id(symbol, side, signal_id)
+        if client_id in self.orders:
+            self.stats['duplicates'] += 1
+            return self.orders[client_id]
+
+        market = self.markets.get(symbol)
+        if market is None:
+            print(f"Unknown market {symbol}, skipping {side} order")
+            self.stats['skipped'] += 1
+            return None
+        amount = market.amount_for(notional, price)
+        if amount is None:
+            print(f"{notional} USDT is below the minimum order size for {symbol}, skipping {side} order")
+            self.stats['skipped'] += 1
+            return None
+
+        active = self.active.get((market.symbol, side))
+        if active is not None:
+            self.stats['in_flight'] += 1
+            if active.status == 'unknown':
+                self._start(active, self._settle(active))
+            print(f"{side} order {active.client_id} for {market.symbol} is still {active.status}, skipping {side} order")
+            return None
+
+        record = self.orders[client_id] = OrderRecord(client_id, market.symbol, side, amount, price,
+                                                      self.market_data.now_ms(), on_filled)
+        self.active[(record.symbol, side)] = record
+        self._start(record, self._execute(record))
+        self.stats['submitted'] += 1
+        return record
+
+    # Function to run an order's task, releasing its symbol and side once the order is settled
+    def _start(self, record, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        task.add_done_callback(lambda _: self._release(record))
+
+    def _release(self, record):
+        key = (record.symbol, record.side)
+        if record.status not in ACTIVE_STATUSES and self.active.get(key) is record:
+            del self.active[key]
+
+    # Function to find an order by client id, None if the exchange never received it
+    async def _lookup(self, record):
+        return await self.market_data.fetch_order_by_client_id(record.symbol, record.client_id)
+
+    async def _place(self, record):
+        params = {'clientOrderId': record.client_id}
+        for attempt in range(1, SUBMIT_ATTEMPTS + 1):
+            try:
+                return await self.market_data.create_order(record.symbol, 'market', record.side, record.amount,
+                                                           record.price, params)
+            except ccxt.InvalidOrder as e:
+                if not is_duplicate(e):
+                    raise
+                order = await self._lookup(record)  # An earlier attempt (or run) already placed it
+                if order is not None:
+                    return order
+                raise
+            except ccxt.NetworkError as e:
+                # The order may or may not have reached the exchange, ask before sending it again
+                print(f"Error placing {record.side} order {record.client_id} for {record.symbol}: {e}")
+                try:
+                    order = await self._lookup(record)
+                except ccxt.NetworkError:
+                    order = None
+                if order is not None:
+                    return order
+                if attempt == SUBMIT_ATTEMPTS:
+                    raise
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def _execute(self, record):
+        try:
+            order = await self._place(record)
+            record.status = 'open'
+            record.order_id = order.get('id')
+            record.acked_ms = self.market_data.now_ms()
+
+            deadline = record.acked_ms + self.fill_timeout * 1000
+            while order is None or order.get('status') != 'closed':
+                if order is not None and order.get('status') in ('canceled', 'rejected', 'expired'):
+                    raise ccxt.InvalidOrder(f"order {order.get('status')}")
+                if self.market_data.now_ms() >= deadline:
+                    await self._settle(record)
+                    return
+                await asyncio.sleep(self.poll_interval)
+                order = await self._lookup(record)
+            self._filled(record, order)
+        except Exception as e:
+            record.status = 'failed'
+            record.error = str(e)
+            self.stats['failed'] += 1
+            metrics.increment('order_failed', record.symbol)
+            print(f"Error executing {record.side} order for {record.symbol}: {e}")
+
+    def _filled(self, record, order):
+        record.status = 'filled'
+        record.filled = order.get('filled') or record.amount
+        record.average = order.get('average') or order.get('price')
+        record.filled_ms = order.get('lastTradeTimestamp') or self.market_data.now_ms()
+        self.stats['filled'] += 1
+        print(f"Successfully executed {record.side} order for {record.symbol}: "
+              f"{record.filled} @ {record.average} ({record.client_id})")
+        if record.on_filled is not None:
+            record.on_filled()
+
+    # Function to settle an order not filled by its deadline: cancel it and look it up again. It is
+    # filled if it filled before the cancel, unfilled once the exchange reports it canceled, and
+    # unknown (still blocking its symbol and side) if neither could be confirmed.
+    async def _settle(self, record):
+        record.status = 'canceling'
+        try:
+            await self.market_data.cancel_order(record.order_id, record.symbol)
+        except ccxt.OrderNotFound:
+            pass  # Filled or canceled already, the lookup tells which
+        except Exception as e:
+            print(f"Error canceling {record.side} order {record.client_id} for {record.symbol}: {e}")
+        try:
+            order = await self._lookup(record)
+        except Exception as e:
+            print(f"Error looking up {record.side} order {record.client_id} for {record.symbol}: {e}")
+            order = None
+
+        status = order.get('status') if order is not None else None
+        if status == 'closed':
+            self._filled(record, order)
+        elif status in ('canceled', 'rejected', 'expired'):
+            record.status = 'unfilled'
+            self.stats['unfilled'] += 1
+            print(f"{record.side} order {record.client_id} for {record.symbol} not filled after {self.fill_timeout}s, canceled")
+        else:
+            record.status = 'unknown'
+            print(f"{record.side} order {record.client_id} for {record.symbol} not filled after {self.fill_timeout}s "
+                  f"and not confirmed canceled, checking again before the next {record.side} order")
+
+    # Function to wait until every submitted order is filled or given up on
+    async def join(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def summary(self):
+        acked = [record.acked_ms - record.created_ms for record in self.orders.values() if record.acked_ms is not None]
+        latency = f", avg submit-to-ack {sum(acked) / len(acked):.0f} ms" if acked else ''
+        return (f"Orders: {self.stats['submitted']} submitted, {self.stats['filled']} filled, "
+                f"{self.stats['failed']} failed, {self.stats['unfilled']} unfilled, {len(self.active)} unsettled{latency}")
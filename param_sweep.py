@@ -0,0 +1,146 @@
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import ccxt
+from backtest import FEE_RATE, history_from_store, run_backtest, synthetic_bars
+from candle_store import CandleStore
+
+# Parameter sweeps over the backtest strategies. Workers map the candle store files themselves,
+# so every process reads the same page-cache pages instead of receiving a pickled copy.
+
+# Values tried for each hard-coded threshold in the live scripts
+SEARCH_SPACES = {
+    'sma_day_open': {
+        'short_period': [2, 3, 5, 8],
+        'amplitude_threshold': [1.05, 1.10, 1.15, 1.20],
+        'exit_amplitude_threshold': [1.01, 1.03, 1.05],
+    },
+    'sma_day_close': {
+        'short_period': [2, 3, 5],
+        'amplitude_threshold': [1.05, 1.10, 1.15],
+        'exit_upper': [1.05, 1.1, 1.15, 1.2],
+        'exit_lower': [0.8, 0.85, 0.9, 0.95],
+    },
+    'ema_crossover': {
+        'short_period': [5, 10, 20],
+        'long_period': [50, 100, 200],
+        'exit_short_period': [3, 5, 10],
+        'exit_long_period': [20, 50],
+        'amplitude_threshold': [1.10, 1.20, 1.30],
+    },
+    'ema_conditions': {
+        'short_period': [2, 3, 5, 8],
+        'long_period': [10, 20, 50, 100],
+    },
+    'macd_cross': {
+        'window_fast': [8, 12, 16],
+        'window_slow': [21, 26, 34],
+        'window_sign': [5, 9, 12],
+    },
+}
+
+# Function to list every combination of a search space
+def grid(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+# Function to draw `count` distinct random combinations of a search space
+def random_samples(space, count, seed=0):
+    combos = grid(space)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(combos), size=min(count, len(combos)), replace=False)
+    return [combos[i] for i in picks]
+
+# Per-worker history, mapped once from the store by the pool initializer
+_history = None
+
+def _load_worker_history(store_root, symbols, timeframe, since):
+    global _history
+    _history = history_from_store(CandleStore(store_root), symbols, timeframe, since)
+
+# Function to backtest one parameter combination across all symbols and aggregate the result
+def evaluate(strategy, params, fee_rate=FEE_RATE):
+    _, table = run_backtest(_history, strategy, fee_rate, **params)
+    trades = int(table['trades'].sum())
+    return {
+        **params,
+        'trades': trades,
+        'win_rate': float(table['wins'].sum() / trades) if trades else 0.0,
+        'pnl': float(table['pnl'].sum()),
+        'pnl_per_trade': float(table['pnl'].sum() / trades) if trades else 0.0,
+        'profitable_symbols': int((table['pnl'] > 0).sum()),
+    }
+
+def _evaluate_task(task):
+    return evaluate(*task)
+
+# Function to evaluate parameter combinations in a process pool and return them ranked
+def run_sweep(store_root, symbols, timeframe, since, strategy, combos, workers=None, fee_rate=FEE_RATE,
+              rank_by='pnl'):
+    workers = workers or os.cpu_count()
+    tasks = [(strategy, params, fee_rate) for params in combos]
+    init_args = (store_root, symbols, timeframe, since)
+    if workers == 1:
+        _load_worker_history(*init_args)
+        rows = [_evaluate_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_history, initargs=init_args) as pool:
+            rows = list(pool.map(_evaluate_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    return pd.DataFrame(rows).sort_values(rank_by, ascending=False, ignore_index=True)
+
+# Function to fill a throwaway store with random-walk symbols for benchmarking
+def synthetic_store(root, count, days, timeframe):
+    bars_per_symbol = days * 86_400_000 // (ccxt.Exchange.parse_timeframe(timeframe) * 1000)
+    store = CandleStore(root)
+    symbols = []
+    for i in range(count):
+        symbol = f"SYN{i}/USDT"
+        bars = synthetic_bars(bars_per_symbol, timeframe, seed=i)
+        rows = np.column_stack([bars['timestamp'], bars['open'], bars['high'], bars['low'], bars['close'],
+                                np.zeros(bars_per_symbol)])
+        store.append(symbol, timeframe, rows)
+        symbols.append(symbol)
+    return symbols
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep strategy thresholds over stored candles")
+    parser.add_argument('--strategy', choices=list(SEARCH_SPACES), default='sma_day_open')
+    parser.add_argument('--symbols', nargs='+', default=['BTC/USDT', 'ETH/USDT'])
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--samples', type=int, default=0, help="Random combinations to try (0 for the full grid)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--rank-by', default='pnl')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--synthetic', type=int, default=0, help="Sweep N random-walk symbols in a temporary store")
+    args = parser.parse_args()
+
+    space = SEARCH_SPACES[args.strategy]
+    combos = random_samples(space, args.samples) if args.samples else grid(space)
+    since = int(time.time() * 1000) - args.days * 86_400_000
+
+    store_root = CandleStore().root
+    if args.synthetic:
+        store_root = tempfile.mkdtemp(prefix='sweep_store_')
+        args.symbols = synthetic_store(store_root, args.synthetic, args.days, args.timeframe)
+        since = None
+
+    try:
+        start = time.perf_counter()
+        table = run_sweep(store_root, args.symbols, args.timeframe, since, args.strategy, combos, args.workers,
+                          rank_by=args.rank_by)
+        elapsed = time.perf_counter() - start
+    finally:
+        if args.synthetic:
+            shutil.rmtree(store_root, ignore_errors=True)
+
+    pd.set_option('display.width', 200)
+    print(table.head(args.top).to_string())
+    print(f"\n{len(combos)} combinations x {len(args.symbols)} symbols in {elapsed:.2f}s "
+          f"with {args.workers or os.cpu_count()} workers ({len(combos) / elapsed:.2f} combinations/s)")
@@ -0,0 +1,36 @@
+import heapq
+
+# Function to convert a ccxt symbol (BTC/USDT:USDT) or config symbol (BTCUSDT) to a common key
+def symbol_key(symbol):
+    return symbol.split(':')[0].replace('/', '').strip().upper()
+
+# Function to get each ticker's 24h high/low amplitude keyed by symbol_key
+def ticker_amplitudes(tickers):
+    amplitudes = {}
+    for symbol, ticker in tickers.items():
+        high, low = ticker.get('high'), ticker.get('low')
+        if high and low:
+            amplitudes[symbol_key(symbol)] = high / low
+    return amplitudes
+
+# Function to pick the symbols worth a per-symbol candle fetch, from one all-tickers request.
+# The latest 4h candle lies inside the rolling 24h window, so its high/low ratio can never exceed
+# the 24h one: dropping symbols whose 24h amplitude is below the threshold loses no alerts.
+# Symbols missing from the snapshot are kept so they are still checked the slow way.
+async def prescan_amplitude(market_data, symbols, threshold, top_n=None):
+    amplitudes = ticker_amplitudes(await market_data.fetch_tickers())
+
+    ranked = []
+    unknown = []
+    for symbol in symbols:
+        amplitude = amplitudes.get(symbol_key(symbol))
+        if amplitude is None:
+            unknown.append(symbol)
+        elif amplitude >= threshold:
+            ranked.append((amplitude, symbol))
+
+    if top_n is not None:
+        ranked = heapq.nlargest(top_n, ranked)
+    else:
+        ranked.sort(reverse=True)
+    return [symbol for _, symbol in ranked] + unknown
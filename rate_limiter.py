@@ -0,0 +1,212 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import math
+import random
+import time
+import ccxt
+
+# Bybit v5 allows 600 HTTP requests per 5 seconds per IP; keep some headroom for other tools
+BUCKETS = {
+    'public': (100, 200),  # (tokens per second, burst capacity): klines, tickers
+    'private': (10, 10),  # account and order endpoints
+}
+
+# Endpoint -> (bucket, weight)
+ENDPOINTS = {
+    'fetch_ohlcv': ('public', 1),
+    'fetch_tickers': ('public', 2),
+    'load_markets': ('public', 5),
+    'fetch_time': ('public', 1),
+    'create_order': ('private', 1),
+    'cancel_order': ('private', 1),
+    'fetch_order': ('private', 1),
+    'fetch_balance': ('private', 1),
+}
+
+MAX_RETRIES = 3
+RATE_LIMIT_COOLDOWN = 1.0  # Seconds a bucket is paused after the exchange reports a rate-limit error
+
+# Priorities are a distance to the nearest trigger: 0 is about to fire, larger is further away.
+# Symbols never evaluated get HOT_PRIORITY so they are checked promptly.
+HOT_PRIORITY = 0.0
+COLD_PRIORITY = 0.05
+MAX_DEFERRED_CYCLES = 5  # A cold symbol is still checked at least every this many cycles
+DEFER_SATURATION = 0.8  # Cold symbols are only deferred once the budget is this busy
+SATURATION_WINDOW = 60.0  # Seconds of recent usage that saturation is measured over, longer than a cycle
+
+# Function to get how far a value is from reaching a threshold, as a fraction (0 once reached)
+def threshold_distance(value, threshold):
+    if math.isnan(value):
+        return HOT_PRIORITY
+    return max(0.0, (threshold - value) / threshold)
+
+# Function to get the relative gap between two lines that trigger when they cross (hot if unknown)
+def crossing_distance(a, b):
+    if not b or math.isnan(a) or math.isnan(b):
+        return HOT_PRIORITY
+    return abs(a / b - 1)
+
+# Weighted token bucket that serves waiters in priority order
+class TokenBucket:
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters = []  # heap of (priority, sequence, cost, future)
+        self.sequence = itertools.count()
+        self.timer = None
+        self.recent = collections.deque()  # (time, cost) of grants within SATURATION_WINDOW
+        self.recent_tokens = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'granted': 0, 'waited': 0, 'wait_time': 0.0, 'max_queue': 0, 'rate_limited': 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _expire_recent(self, now):
+        while self.recent and self.recent[0][0] < now - SATURATION_WINDOW:
+            self.recent_tokens -= self.recent.popleft()[1]
+
+    def _grant(self, cost):
+        now = time.monotonic()
+        self._expire_recent(now)
+        self.recent.append((now, cost))
+        self.recent_tokens += cost
+        self.tokens -= cost
+        self.stats['granted'] += 1
+
+    async def acquire(self, cost=1, priority=HOT_PRIORITY):
+        self._refill()
+        if not self.waiters and self.tokens >= cost and time.monotonic() >= self.paused_until:
+            self._grant(cost)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), cost, future))
+        self.stats['max_queue'] = max(self.stats['max_queue'], len(self.waiters))
+        started = time.monotonic()
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                self.tokens += cost  # Granted just as we were cancelled, hand the tokens back
+            raise
+        self.stats['waited'] += 1
+        self.stats['wait_time'] += time.monotonic() - started
+
+    def _schedule(self):
+        if self.timer is not None or not self.waiters:
+            return
+        cost = self.waiters[0][2]
+        delay = max((cost - self.tokens) / self.rate, self.paused_until - time.monotonic(), 0.0)
+        self.timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self):
+        self.timer = None
+        self._refill()
+        while self.waiters and time.monotonic() >= self.paused_until:
+            priority, _, cost, future = self.waiters[0]
+            if future.cancelled():
+                heapq.heappop(self.waiters)
+                continue
+            if self.tokens < cost:
+                break
+            heapq.heappop(self.waiters)
+            self._grant(cost)
+            future.set_result(None)
+        self._schedule()
+
+    # Function to empty the bucket and hold it for `seconds` after the exchange pushed back
+    def pause(self, seconds):
+        self.stats['rate_limited'] += 1
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    # Function to get the share of the bucket's rate used over the last SATURATION_WINDOW seconds
+    def saturation(self):
+        self._expire_recent(time.monotonic())
+        return self.recent_tokens / (self.rate * SATURATION_WINDOW)
+
+    def queue_depth(self):
+        return sum(1 for waiter in self.waiters if not waiter[3].done())
+
+# Central scheduler for exchange requests: every call takes its endpoint's weight from a token bucket,
+# hotter symbols are served first, and rate-limit errors pause the bucket before retrying
+class RequestScheduler:
+    def __init__(self, buckets=BUCKETS, endpoints=ENDPOINTS):
+        self.buckets = {name: TokenBucket(name, rate, capacity) for name, (rate, capacity) in buckets.items()}
+        self.endpoints = endpoints
+
+    async def call(self, endpoint, request, priority=HOT_PRIORITY):
+        bucket_name, weight = self.endpoints.get(endpoint, ('public', 1))
+        bucket = self.buckets[bucket_name]
+        for attempt in range(MAX_RETRIES + 1):
+            await bucket.acquire(weight, priority)
+            try:
+                return await request()
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+                if attempt == MAX_RETRIES:
+                    raise
+                bucket.pause(RATE_LIMIT_COOLDOWN * 2 ** attempt * random.uniform(1, 1.5))
+
+    def saturation(self, bucket='public'):
+        return self.buckets[bucket].saturation()
+
+    # Function to summarise and reset per-bucket usage since the last report
+    def report(self):
+        lines = []
+        for bucket in self.buckets.values():
+            stats = bucket.stats
+            if not stats['granted'] and not stats['rate_limited']:
+                continue
+            average_wait = stats['wait_time'] / stats['waited'] if stats['waited'] else 0.0
+            lines.append(f"{bucket.name}: {bucket.saturation():.0%} saturated at {bucket.rate}/s, "
+                         f"{stats['granted']} requests, {stats['waited']} queued (avg wait {average_wait:.2f}s, "
+                         f"max queue {stats['max_queue']}), {stats['rate_limited']} rate-limit errors")
+            bucket.reset_stats()
+        return "Request budget: " + ("; ".join(lines) if lines else "idle")
+
+# Per-strategy symbol priorities, plus how many cycles each cold symbol has been deferred
+class SymbolPriorities:
+    def __init__(self):
+        self.values = {}
+        self.deferred = {}
+
+    def get(self, symbol):
+        return self.values.get(symbol, HOT_PRIORITY)
+
+    def set(self, symbol, value):
+        self.values[symbol] = value
+
+    # Function to pick the symbols to check this cycle: all of them while the budget has room,
+    # otherwise only the hot ones and the cold ones that have waited MAX_DEFERRED_CYCLES
+    def due(self, symbols, saturation):
+        if saturation < DEFER_SATURATION:
+            self.deferred.clear()
+            return list(symbols)
+        due = []
+        for symbol in symbols:
+            skipped = self.deferred.get(symbol, 0)
+            if self.get(symbol) < COLD_PRIORITY or skipped >= MAX_DEFERRED_CYCLES:
+                self.deferred.pop(symbol, None)
+                due.append(symbol)
+            else:
+                self.deferred[symbol] = skipped + 1
+        return due
+
+    # Function to forget every symbol not in `symbols`
+    def discard(self, symbols):
+        keep = set(symbols)
+        for table in (self.values, self.deferred):
+            for symbol in [symbol for symbol in table if symbol not in keep]:
+                del table[symbol]
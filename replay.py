@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import selectors
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+import ccxt
+from fake_exchange import FakeExchange
+from market_data import MarketDataClient
+from rate_limiter import BUCKETS, RequestScheduler
+from candle_buffer import CandleBufferSet
+from candle_store import CandleStore, STORE_DIR
+from htf_cache import HigherTimeframeCache
+from metrics import current_strategy
+from state_store import state
+from runner import StrategyPlugin, load_plugin
+from webhook_dispatcher import WebhookDispatcher
+
+# Paper-trading replay: runs the scripts' real main_trading() loops against recorded candles
+# on a virtual clock. The event loop's clock only moves while every task is waiting, jumping
+# to the next timer, so CPU work takes no simulated time and a 10s tick sleep takes
+# 10s / speed of wall time. day.spot's market orders go through its order executor to the
+# exchange stand-in, and 3commas webhook signals to a paper broker; both fill at the recorded
+# price after the stand-in's fill delay.
+
+DEFAULT_STRATEGIES = ['main.py', 'day.spot']
+DEFAULT_SPEED = 100.0  # Simulated seconds per wall-clock second, 0 runs as fast as possible
+FILL_DELAY = 0.2  # Seconds from an order reaching the exchange to its fill
+WEBHOOK_LATENCY = 0.3  # Seconds for a signal to reach 3commas and become an order
+SLIPPAGE_BPS = 5.0  # Market orders pay this much over the recorded price
+WEBHOOK_NOTIONAL = 10  # USDT per 3commas signal, the same size day.spot trades
+WARMUP_HOURS = 24  # Recorded history left before the default start for the 4h reference bars
+
+# Selector that advances a virtual clock instead of blocking. When the event loop has nothing
+# ready it asks to wait `timeout` seconds for the next timer; the clock then moves forward by
+# that much after `timeout / speed` seconds of real waiting for I/O.
+class VirtualClock(selectors.BaseSelector):
+    def __init__(self, start, speed=DEFAULT_SPEED):
+        self.selector = selectors.DefaultSelector()
+        self.start = start  # Seconds since the epoch
+        self.elapsed = 0.0  # Kept apart from start so loop times keep sub-microsecond precision
+        self.speed = speed
+
+    # Function to get the virtual time in seconds since the epoch
+    def time(self):
+        return self.start + self.elapsed
+
+    def register(self, fileobj, events, data=None):
+        return self.selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self.selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self.selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self.selector.get_map()
+
+    def close(self):
+        self.selector.close()
+
+    def select(self, timeout=None):
+        if timeout is None or timeout <= 0:
+            return self.selector.select(timeout)  # Nothing scheduled (only I/O can wake us), or work ready
+        started = time.perf_counter()
+        events = self.selector.select(timeout / self.speed if self.speed else 0)
+        self.elapsed += min(timeout, (time.perf_counter() - started) * self.speed) if events else timeout
+        return events
+
+# Event loop whose time() is the virtual clock, so asyncio.sleep and timeouts run in simulated time
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock):
+        super().__init__(clock)
+        self.clock = clock
+
+    def time(self):
+        return self.clock.elapsed
+
+# Exchange stand-in serving candles recorded by candle_store.py. Bars of any multiple of the
+# recorded timeframe are aggregated from the recorded ones; the forming bar only includes the
+# open of the recorded bar in progress, so nothing after the virtual now leaks into a fetch.
+class RecordedExchange(FakeExchange):
+    def __init__(self, store, timeframe='1m', latency=0.02, clock=time.time, symbols=(), fill_delay=FILL_DELAY,
+                 slippage_bps=SLIPPAGE_BPS):
+        super().__init__(latency=latency, clock=clock, symbols=symbols, fill_delay=fill_delay, slippage_bps=slippage_bps)
+        self.store = store
+        self.timeframe = timeframe
+        self.timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.recorded = {}
+
+    def _recorded(self, symbol):
+        stored = self.recorded.get(symbol)
+        if stored is None:
+            stored = self.store.load(symbol, self.timeframe)
+            if stored is None:
+                raise ccxt.BadSymbol(f"No recorded {self.timeframe} candles for {symbol}")
+            self.recorded[symbol] = stored
+        return stored
+
+    # Function to get the (first, last) recorded bar open times of a symbol
+    def span(self, symbol):
+        stored = self._recorded(symbol)
+        return int(stored.timestamps[0]), int(stored.timestamps[-1])
+
+    # Function to get the price at one time in ms: the open of the recorded bar in progress
+    def price(self, symbol, time_ms):
+        stored = self._recorded(symbol)
+        i = int(np.searchsorted(stored.timestamps, time_ms, side='right')) - 1
+        if i < 0:
+            raise ccxt.BadRequest(f"No recorded price for {symbol} at {time_ms}")
+        if stored.timestamps[i] + self.timeframe_ms <= time_ms:
+            return float(stored.values[3, i])  # In a gap or past the recording, the last close
+        return float(stored.values[0, i])
+
+    def candles(self, symbol, timeframe_ms, starts, now_ms):
+        if timeframe_ms % self.timeframe_ms:
+            raise ccxt.BadRequest(f"Recorded {self.timeframe} candles cannot serve {timeframe_ms // 1000}s bars")
+        stored = self._recorded(symbol)
+        timestamps = stored.timestamps
+        opens, highs, lows, closes, volumes = stored.values
+        firsts = np.searchsorted(timestamps, starts)
+        lasts = np.searchsorted(timestamps, np.minimum(starts + timeframe_ms - 1, now_ms), side='right')
+        rows = []
+        for start, first, last in zip(starts.tolist(), firsts.tolist(), lasts.tolist()):
+            if first >= last:
+                continue
+            forming = timestamps[last - 1] + self.timeframe_ms > now_ms
+            closed = last - 1 if forming else last
+            high, low, close, volume = -math.inf, math.inf, None, 0.0
+            if closed > first:
+                high = float(highs[first:closed].max())
+                low = float(lows[first:closed].min())
+                close = float(closes[closed - 1])
+                volume = float(volumes[first:closed].sum())
+            if forming:
+                close = float(opens[last - 1])
+                high, low = max(high, close), min(low, close)
+            rows.append([int(start), float(opens[first]), high, low, close, volume])
+        return rows
+
+# Fills the market orders 3commas would place for webhook signals, at the exchange stand-in's price
+# after its fill delay and slippage, and records every fill with the time of the signal behind it
+class PaperBroker:
+    def __init__(self, exchange, clock):
+        self.exchange = exchange
+        self.clock = clock
+        self.fill_delay = exchange.fill_delay
+        self.slippage = exchange.slippage
+        self.signals = 0
+        self.fills = []
+
+    def fill(self, symbol, side, amount, signal_ms, source, notional=None):
+        fill_ms = int(self.clock.time() * 1000 + self.fill_delay * 1000)
+        price = self.exchange.price(symbol, fill_ms) * (1 + self.slippage if side == 'buy' else 1 - self.slippage)
+        if amount is None:
+            amount = notional / price
+        order = {
+            'id': str(len(self.fills) + 1),
+            'symbol': symbol,
+            'type': 'market',
+            'side': side,
+            'amount': amount,
+            'filled': amount,
+            'price': price,
+            'average': price,
+            'cost': amount * price,
+            'status': 'closed',
+            'timestamp': fill_ms,
+        }
+        self.fills.append({'source': source, 'signal_ms': signal_ms, 'fill_ms': fill_ms, **order})
+        return order
+
+# Stand-in for the exchange's spot markets, which day.spot's order executor sizes its orders with
+class PaperSpotMarkets:
+    def __init__(self, symbols):
+        self.symbols = list(symbols)
+
+    async def load(self):
+        return {symbol: {'symbol': symbol, 'id': symbol.replace('/', ''), 'type': 'spot', 'spot': True}
+                for symbol in self.symbols}
+
+class PaperResponse:
+    status = 200
+
+    async def read(self):
+        return b'ok'
+
+# Stand-in for the dispatcher's aiohttp session: each POST takes `latency` seconds to reach
+# 3commas, which then sends a market order of `notional` USDT to the paper broker
+class PaperWebhookSession:
+    def __init__(self, broker, signal_times, symbols, latency=WEBHOOK_LATENCY, notional=WEBHOOK_NOTIONAL):
+        self.broker = broker
+        self.signal_times = signal_times
+        self.instruments = {symbol.replace('/', '') + '.P': symbol for symbol in symbols}  # As send_3commas_message
+        self.latency = latency
+        self.notional = notional
+
+    @contextlib.asynccontextmanager
+    async def post(self, url, json=None):
+        await asyncio.sleep(self.latency)
+        symbol = self.instruments[json['tv_instrument']]
+        action = json['action']
+        side = 'buy' if action in ('enter_long', 'exit_short') else 'sell'
+        signal_ms = self.signal_times.pop((symbol, action), int(self.broker.clock.time() * 1000))
+        self.broker.fill(symbol, side, None, signal_ms, 'webhook', self.notional)
+        yield PaperResponse()
+
+    async def close(self):
+        pass
+
+# The real webhook dispatcher posting to PaperWebhookSession, noting when each signal was raised
+class PaperWebhookDispatcher(WebhookDispatcher):
+    def __init__(self, dispatcher, broker, symbols, latency=WEBHOOK_LATENCY):
+        super().__init__(dispatcher.url, dispatcher.last_alert_messages)
+        self.signal_times = {}
+        self.session = PaperWebhookSession(broker, self.signal_times, symbols, latency)
+        self.broker = broker
+
+    def submit(self, symbol, action, payload, on_delivered=None):
+        queued = super().submit(symbol, action, payload, on_delivered)
+        if queued:
+            self.broker.signals += 1
+            self.signal_times[(symbol, action)] = int(self.broker.clock.time() * 1000)
+        return queued
+
+# Function to load a strategy script onto the replay's exchange, clock and paper broker.
+# Recorded bars can only be aggregated upwards, so a script polling a finer timeframe than
+# the recording (`recorded`, None for synthetic candles) is run on the recorded one.
+def load_replay_plugin(path, market_data, broker, symbols, recorded, webhook_latency):
+    module = load_plugin(path, market_data, CandleBufferSet(market_data), HigherTimeframeCache(market_data)).module
+    module.selected_symbols = list(symbols)
+    for name in ('interval', 'cycle_timeframe'):
+        value = getattr(module, name, None)
+        if recorded and value and ccxt.Exchange.parse_timeframe(value) < ccxt.Exchange.parse_timeframe(recorded):
+            print(f"{os.path.basename(path)}: {name} {value} is finer than the recorded candles, using {recorded}", file=sys.stderr)
+            setattr(module, name, recorded)
+    plugin = StrategyPlugin(path, module, market_data)
+    module.ticks = plugin.ticks
+    if hasattr(module, 'executor'):
+        module.markets.load = PaperSpotMarkets(symbols).load
+    if hasattr(module, 'webhook'):
+        module.webhook = PaperWebhookDispatcher(module.webhook, broker, symbols, webhook_latency)
+    return plugin
+
+async def replay(paths, symbols, clock, end, exchange, recorded, webhook_latency):
+    state.open(None)  # Start from empty alerts and positions, and leave the live scripts' saved state alone
+    market_data = MarketDataClient(scheduler=RequestScheduler({name: (1e9, 1e9) for name in BUCKETS}),
+                                   clock=clock.time)
+    market_data.exchange = exchange
+    broker = PaperBroker(exchange, clock)
+    plugins = [load_replay_plugin(path, market_data, broker, symbols, recorded, webhook_latency) for path in paths]
+
+    start = clock.time()
+    started = time.perf_counter()
+    tasks = []
+    for plugin in plugins:
+        current_strategy.set(plugin.name)  # Copied into the task's context
+        tasks.append(asyncio.create_task(plugin.module.main_trading()))
+    await asyncio.sleep(end - start)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Signals raised before the end still get their fills
+    signals, fills = broker.signals, list(broker.fills)
+    for plugin in plugins:
+        if hasattr(plugin.module, 'webhook'):
+            await plugin.module.webhook.close()
+        if hasattr(plugin.module, 'executor'):
+            await plugin.module.executor.join()
+            orders = plugin.module.executor.orders.values()
+            signals += len(orders)
+            fills += [{'source': 'order', 'signal_ms': order.created_ms, 'fill_ms': order.filled_ms, 'symbol': order.symbol,
+                       'side': order.side, 'amount': order.filled, 'price': order.average}
+                      for order in orders if order.status == 'filled']
+    fills.sort(key=lambda fill: fill['fill_ms'])
+
+    return {
+        'simulated': clock.time() - start,
+        'wall': time.perf_counter() - started,
+        'signals': signals,
+        'fills': fills,
+        'coalesced': {plugin.name: plugin.ticks.coalesced for plugin in plugins},
+        'requests': exchange.calls.get('fetch_ohlcv', 0),
+    }
+
+# Function to run a replay from `start` to `end` (seconds since the epoch) on a virtual-time event loop
+def run_replay(paths, symbols, start, end, exchange, recorded=None, speed=DEFAULT_SPEED, webhook_latency=WEBHOOK_LATENCY):
+    clock = VirtualClock(start, speed)
+    exchange.clock = clock.time
+    loop = VirtualTimeLoop(clock)
+    try:
+        return loop.run_until_complete(replay(paths, symbols, clock, end, exchange, recorded, webhook_latency))
+    finally:
+        loop.close()
+
+# Function to format a replay report
+def format_report(report, show_fills=False):
+    fills = report['fills']
+    lines = [f"Simulated {report['simulated'] / 3600:.2f}h in {report['wall']:.1f}s: "
+             f"{report['simulated'] / report['wall']:.0f} simulated seconds per wall-clock second, "
+             f"{report['requests']} candle requests"]
+    sources = sorted({fill['source'] for fill in fills})
+    lines.append(f"Signals {report['signals']}, fills {len(fills)}" + ''.join(
+        f", {source} {sum(fill['source'] == source for fill in fills)}" for source in sources))
+    if fills:
+        latencies = np.array([fill['fill_ms'] - fill['signal_ms'] for fill in fills]) / 1000
+        lines.append(f"Signal-to-fill latency: p50 {np.percentile(latencies, 50):.3f}s, "
+                     f"p99 {np.percentile(latencies, 99):.3f}s, max {latencies.max():.3f}s")
+    for name, coalesced in report['coalesced'].items():
+        if coalesced:
+            lines.append(f"{name}: {coalesced} ticks coalesced after overruns")
+    if show_fills:
+        for fill in fills:
+            lines.append(f"  {datetime.fromtimestamp(fill['fill_ms'] / 1000, timezone.utc):%Y-%m-%d %H:%M:%S} "
+                         f"{fill['source']:>7} {fill['side']:>4} {fill['symbol']} {fill['amount']:.6g} @ {fill['price']:.6g}")
+    return '\n'.join(lines)
+
+# Function to parse a UTC time like 2024-05-01T12:00 into seconds since the epoch
+def parse_time(value):
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the strategy loops against recorded candles with paper fills")
+    parser.add_argument('--strategies', nargs='+', default=DEFAULT_STRATEGIES)
+    parser.add_argument('--symbols', nargs='+', required=True)
+    parser.add_argument('--timeframe', default='1m', help="Timeframe of the recorded candles")
+    parser.add_argument('--root', default=STORE_DIR, help="Candle store directory")
+    parser.add_argument('--start', type=parse_time, help="UTC start, defaults to a day into the recording")
+    parser.add_argument('--hours', type=float, help="Simulated hours, defaults to the rest of the recording")
+    parser.add_argument('--synthetic', action='store_true', help="Use fake_exchange's price curves instead of recordings")
+    parser.add_argument('--speed', type=float, default=DEFAULT_SPEED, help="Simulated seconds per wall-clock second, 0 for unlimited")
+    parser.add_argument('--latency', type=float, default=0.02, help="Simulated exchange request latency in seconds")
+    parser.add_argument('--fill-delay', type=float, default=FILL_DELAY)
+    parser.add_argument('--webhook-latency', type=float, default=WEBHOOK_LATENCY)
+    parser.add_argument('--slippage-bps', type=float, default=SLIPPAGE_BPS)
+    parser.add_argument('--fills', action='store_true', help="List every fill")
+    parser.add_argument('--verbose', action='store_true', help="Show the strategies' own output")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        exchange = FakeExchange(latency=args.latency, symbols=args.symbols, fill_delay=args.fill_delay,
+                                slippage_bps=args.slippage_bps)
+        recorded = None
+        start = args.start or time.time() // 60 * 60 - 3600 * (args.hours or 1)
+        end = start + 3600 * (args.hours or 1)
+    else:
+        exchange = RecordedExchange(CandleStore(args.root), args.timeframe, latency=args.latency, symbols=args.symbols,
+                                    fill_delay=args.fill_delay, slippage_bps=args.slippage_bps)
+        recorded = args.timeframe
+        try:
+            spans = [exchange.span(symbol) for symbol in args.symbols]
+        except ccxt.BadSymbol as e:
+            sys.exit(f"{e}, record it with candle_store.py first")
+        start = args.start or min(first for first, _ in spans) / 1000 + WARMUP_HOURS * 3600
+        last = max(last for _, last in spans) / 1000 + exchange.timeframe_ms / 1000
+        end = min(last, start + 3600 * args.hours) if args.hours else last
+        if end <= start:
+            sys.exit(f"Nothing recorded after {datetime.fromtimestamp(start, timezone.utc):%Y-%m-%d %H:%M} UTC")
+
+    print(f"Replaying {', '.join(args.strategies)} on {len(args.symbols)} symbols from "
+          f"{datetime.fromtimestamp(start, timezone.utc):%Y-%m-%d %H:%M} to "
+          f"{datetime.fromtimestamp(end, timezone.utc):%Y-%m-%d %H:%M} UTC")
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        report = run_replay(args.strategies, args.symbols, start, end, exchange, recorded, args.speed,
+                            args.webhook_latency)
+    print(format_report(report, args.fills))
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import importlib.util
+import os
+import re
+import time
+from importlib.machinery import SourceFileLoader
+from types import SimpleNamespace
+import config
+from market_data import MarketDataClient
+from candle_buffer import CandleBufferSet
+from candle_store import CandleStore
+from htf_cache import HigherTimeframeCache
+from market_registry import MarketRegistry
+from tick_scheduler import TickScheduler
+from metrics import metrics, current_strategy, start_metrics_server, METRICS_PORT
+
+# Runs several strategy scripts in one process over one exchange client and one candle feed.
+# Each script is loaded as a plugin module: its market_data, candle_buffers and htf_cache, and the
+# tick scheduler, market registry and order executor it built on its own client, are pointed at the
+# shared instances (see bind_client), while its last_alert_messages, position_status, indicator
+# state and webhook dispatcher stay inside its own module.
+
+# Scripts that load with the config modules in this repository. ema and ema2 read config1 and
+# config2.SELECTED_SYMBOLS and config2.SECRET, which only exist in their own deployments; pass them
+# with --strategies where those are present.
+DEFAULT_STRATEGIES = ['main.py', 'exit.py', 'day', 'emamain.py', 'emaexit.py']
+IDLE_BUFFER_SECONDS = 3600  # Drop candle buffers no strategy has asked for in this long
+
+# Candle buffers shared by all strategies: each (symbol, timeframe) is fetched at most once per
+# cycle, sized to the largest history any strategy asked for
+class SharedCandleBuffers(CandleBufferSet):
+    def __init__(self, market_data, store=None):
+        super().__init__(market_data, store)
+        self.limits = {}
+        self.cycle = {}  # (symbol, timeframe) -> (limit, refresh task) for the current cycle
+        self.last_used = {}
+        self.stats = {'requests': 0, 'fetches': 0}
+
+    def next_cycle(self):
+        self.cycle = {}
+        self.stats = {'requests': 0, 'fetches': 0}
+
+    async def refresh(self, symbol, timeframe, limit):
+        key = (symbol, timeframe)
+        limit = self.limits[key] = max(limit, self.limits.get(key, 0))
+        self.last_used[key] = time.monotonic()
+        self.stats['requests'] += 1
+        entry = self.cycle.get(key)
+        if entry is None or entry[0] < limit:
+            self.stats['fetches'] += 1
+            entry = self.cycle[key] = (limit, asyncio.ensure_future(super().refresh(symbol, timeframe, limit)))
+        return await entry[1]
+
+    # A strategy's /reset_symbols must not drop buffers other strategies still use, see prune()
+    def discard(self, symbols):
+        pass
+
+    # Function to drop buffers idle for longer than max_age seconds, returns the symbols still in use
+    def prune(self, max_age):
+        cutoff = time.monotonic() - max_age
+        for key in [key for key, used in self.last_used.items() if used < cutoff]:
+            self.buffers.pop(key, None)
+            self.limits.pop(key, None)
+            del self.last_used[key]
+        return {symbol for symbol, _ in self.last_used}
+
+# Higher-timeframe cache shared by all strategies, pruned by the runner instead of per strategy
+class SharedHigherTimeframeCache(HigherTimeframeCache):
+    def discard(self, symbols):
+        pass
+
+    def prune(self, symbols):
+        super().discard(symbols)
+
+# One loaded strategy script, due just after each of its cycle_timeframe bars closes
+class StrategyPlugin:
+    def __init__(self, path, module, market_data):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.module = module
+        self.ticks = TickScheduler(module.cycle_timeframe, market_data)
+        self.next_due = 0.0  # Server time in ms, 0 runs the first cycle right away
+
+    async def run_cycle(self):
+        current_strategy.set(self.name)  # Each plugin's cycle runs in its own task
+        try:
+            with metrics.timer('cycle'):
+                await self.module.run_cycle()
+        except Exception as e:
+            metrics.increment('cycle_errors')
+            print(f"Error in strategy {self.name}: {e}")
+
+# Function to load a strategy script (which may have no .py extension) as a module
+def load_module(path):
+    name = 'strategy_' + re.sub(r'\W', '_', os.path.basename(path))
+    loader = SourceFileLoader(name, path)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(name, loader))
+    loader.exec_module(module)
+    return module
+
+# Function to point every global a script built on its own client at import time at `market_data`:
+# the client, its tick scheduler, candle buffers, higher-timeframe cache, market registry and order
+# executor. The script's own client never connects, since clients only connect on first use.
+def bind_client(module, market_data, candle_buffers, htf_cache):
+    module.market_data = market_data
+    if hasattr(module, 'ticks'):
+        module.ticks.market_data = market_data
+    if hasattr(module, 'candle_buffers'):
+        module.candle_buffers = candle_buffers
+    if hasattr(module, 'htf_cache'):
+        module.htf_cache = htf_cache
+    if isinstance(getattr(module, 'markets', None), MarketRegistry):
+        module.markets.load = market_data.load_markets
+    if hasattr(module, 'executor'):
+        module.executor.market_data = market_data
+
+# Function to load a strategy script as a module and point it at the shared feed
+def load_plugin(path, market_data, candle_buffers, htf_cache):
+    module = load_module(path)
+    if not hasattr(module, 'run_cycle'):
+        raise ValueError(f"{path} has no run_cycle()")
+
+    bind_client(module, market_data, candle_buffers, htf_cache)
+    return StrategyPlugin(path, module, market_data)
+
+class StrategyRunner:
+    def __init__(self, paths, market_data=None, store=None):
+        self.market_data = market_data or MarketDataClient(config.API_KEY, config.API_SECRET)
+        self.candle_buffers = SharedCandleBuffers(self.market_data, store)
+        self.htf_cache = SharedHigherTimeframeCache(self.market_data)
+        self.plugins = []
+        for path in paths:
+            try:
+                self.plugins.append(load_plugin(path, self.market_data, self.candle_buffers, self.htf_cache))
+            except Exception as e:
+                print(f"Error loading strategy {path}: {e}")
+
+    # Function to run every strategy that is due, sharing one fetch per candle series
+    async def run_due(self):
+        now_ms = await self.market_data.server_time_ms()
+        due = [plugin for plugin in self.plugins if plugin.next_due <= now_ms]
+        self.candle_buffers.next_cycle()
+        await asyncio.gather(*(plugin.run_cycle() for plugin in due))
+        now_ms = await self.market_data.server_time_ms()
+        for plugin in due:
+            plugin.next_due = plugin.ticks.plan(now_ms)
+
+        stats = self.candle_buffers.stats
+        print(f"Cycle: {', '.join(plugin.name for plugin in due)} - "
+              f"{stats['requests']} candle requests served by {stats['fetches']} fetches")
+        print(self.market_data.scheduler.report())
+        self.htf_cache.prune(self.candle_buffers.prune(IDLE_BUFFER_SECONDS))
+        return due
+
+    async def run(self):
+        if not self.plugins:
+            print("No strategies loaded")
+            return
+        while True:
+            await self.run_due()
+            now_ms = await self.market_data.server_time_ms()
+            await asyncio.sleep(max(0.0, min(plugin.next_due for plugin in self.plugins) - now_ms) / 1000)
+
+    # Function to pass a Telegram command to every strategy that handles it and send one combined reply
+    async def forward_command(self, command, update, context):
+        replies = []
+
+        async def collect(text):
+            replies.append(text)
+
+        proxy = SimpleNamespace(message=SimpleNamespace(reply_text=collect))
+        for plugin in self.plugins:
+            handler = getattr(plugin.module, command, None)
+            if handler is not None:
+                await handler(proxy, context)
+        if replies:
+            await update.message.reply_text('\n'.join(dict.fromkeys(replies)))
+
+    async def start_telegram_bot(self):
+        from telegram.ext import Application, CommandHandler
+        application = Application.builder().token(config.TELEGRAM_TOKEN).build()
+
+        await application.initialize()
+        for command in ('set_symbols', 'reset_symbols'):
+            application.add_handler(CommandHandler(
+                command, lambda update, context, command=command: self.forward_command(command, update, context)))
+        # One registry covers every strategy in this process, so /stats is answered here
+        application.add_handler(CommandHandler('stats', lambda update, context: update.message.reply_text(metrics.summary())))
+
+        await application.start()
+        await application.updater.start_polling()
+
+async def main(args):
+    runner = StrategyRunner(args.strategies, store=CandleStore())
+    print(f"Loaded strategies: {', '.join(plugin.name for plugin in runner.plugins)}")
+    await start_metrics_server(args.metrics_port)
+    if args.no_telegram:
+        await runner.run()
+    else:
+        await asyncio.gather(runner.start_telegram_bot(), runner.run())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several strategy scripts over one shared market-data feed")
+    parser.add_argument('--strategies', nargs='+', default=DEFAULT_STRATEGIES)
+    parser.add_argument('--no-telegram', action='store_true', help="Do not start the /set_symbols bot")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+
+    import nest_asyncio
+    nest_asyncio.apply()
+
+    asyncio.run(main(args))
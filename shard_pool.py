@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from functools import partial
+from metrics import metrics, current_strategy, start_metrics_server
+from prescan import symbol_key
+from rate_limiter import BUCKETS, ENDPOINTS, RequestScheduler
+from runner import load_module
+from state_store import state, STATE_PATH
+
+# Runs one strategy script over several processes. The selected symbols are hash-partitioned
+# across N worker processes; each worker loads its own copy of the script, so it has its own
+# exchange client, candle buffers and indicator state, and runs the script's run_cycle() over its
+# shard only. Workers do not send webhooks: their signals come back over one multiprocessing
+# queue to the coordinator, whose WebhookDispatcher keeps the last_alert_messages dedupe and does
+# the sending. The coordinator also runs the Telegram bot, so /set_symbols and /reset_symbols
+# change its selected_symbols and the shards are reassigned. A symbol's shard depends only on the
+# symbol, so a change only adds or drops the symbols involved and no indicator state moves.
+#
+# A worker's last_alert_messages is an in-memory copy of the coordinator's that only saves forwarding
+# repeats. When the coordinator's entry for a symbol goes away (/reset_symbols), the worker is told
+# to forget the symbol's alert state, so the same signal is forwarded again as it would be unsharded.
+#
+# Messages to a worker (one control queue each): ('assign', symbols), ('delivered', symbol, action),
+# ('forget', symbol) and None to stop. Messages to the coordinator (one shared queue): ('signal', shard, symbol, action,
+# payload) and ('cycle', shard, symbols, seconds).
+
+DEFAULT_WORKERS = 4
+SUPERVISE_INTERVAL = 1.0  # Seconds between checks for changed symbols and exited workers
+PARENT_CHECK_INTERVAL = 1.0  # Seconds a worker waits for a message before checking its coordinator is alive
+STOP_TIMEOUT = 5.0  # Seconds to wait for workers to exit before terminating them
+WORKER_PORT_STEP = 100  # Worker n serves its metrics on the script's metrics_port + (n + 1) * this
+
+# Function to get a symbol's shard, stable across processes and restarts (unlike hash())
+def shard_of(symbol, shards):
+    return zlib.crc32(symbol_key(symbol).encode()) % shards
+
+# Function to split symbols into `shards` lists, keeping their order
+def partition(symbols, shards):
+    parts = [[] for _ in range(shards)]
+    for symbol in symbols:
+        parts[shard_of(symbol, shards)].append(symbol)
+    return parts
+
+# Function to get each worker's share of the exchange request budget, which is per IP.
+# Buckets stay at least as large as the heaviest endpoint so every request can still be granted.
+def shard_buckets(shards, buckets=BUCKETS):
+    heaviest = max(weight for _, weight in ENDPOINTS.values())
+    return {name: (rate / shards, max(capacity / shards, heaviest)) for name, (rate, capacity) in buckets.items()}
+
+# Stands in for a worker's WebhookDispatcher: signals go to the coordinator, which dedupes and sends
+# them. on_delivered callbacks stay in the worker and run when the coordinator reports the delivery.
+class SignalForwarder:
+    def __init__(self, signals, shard):
+        self.signals = signals
+        self.shard = shard
+        self.callbacks = {}  # (symbol, action) -> on_delivered
+
+    def submit(self, symbol, action, payload, on_delivered=None):
+        if on_delivered is not None:
+            self.callbacks[(symbol, action)] = on_delivered
+        self.signals.put(('signal', self.shard, symbol, action, payload))
+        return True
+
+    def delivered(self, symbol, action):
+        callback = self.callbacks.pop((symbol, action), None)
+        if callback is not None:
+            callback()
+
+    async def close(self):
+        pass
+
+# Per-symbol dicts a script keeps: alert dedupe, day's alert thresholds and the EMA indicator state
+SYMBOL_STATE = ('last_alert_messages', 'alert_thresholds', 'ema_states')
+
+# Function to drop the per-symbol state a worker keeps for symbols it no longer owns, as reset_symbols does
+def keep_symbols(module, symbols):
+    for name in ('candle_buffers', 'htf_cache', 'priorities'):
+        if hasattr(module, name):
+            getattr(module, name).discard(symbols)
+    keep = set(symbols)
+    for name in SYMBOL_STATE:
+        mapping = getattr(module, name, {})
+        for symbol in [symbol for symbol in mapping if symbol not in keep]:
+            del mapping[symbol]
+
+# Function to drop a symbol's alert state in a worker after the coordinator forgot its last alert
+def forget_symbol(module, symbol):
+    for name in ('last_alert_messages', 'alert_thresholds'):
+        getattr(module, name, {}).pop(symbol, None)
+
+# Function to wait for the next coordinator message without blocking the event loop,
+# None once the coordinator has gone away
+async def receive(control):
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            return await loop.run_in_executor(None, control.get, True, PARENT_CHECK_INTERVAL)
+        except queue.Empty:
+            if not multiprocessing.parent_process().is_alive():
+                return None
+
+# Function to run the script's cycles over the worker's shard, reporting each cycle's duration
+async def trade(module, shard, signals):
+    while True:
+        started = time.perf_counter()
+        try:
+            with metrics.timer('cycle'):
+                await module.run_cycle()
+        except Exception as e:
+            metrics.increment('cycle_errors')
+            print(f"Error in shard {shard}: {e}")
+        signals.put(('cycle', shard, len(module.selected_symbols), time.perf_counter() - started))
+        await module.ticks.wait()
+
+async def worker_main(path, shard, shards, control, signals, state_path, setup):
+    state.open(state_path)
+    module = load_module(path)
+    if not hasattr(module, 'run_cycle') or not hasattr(module, 'webhook'):
+        raise ValueError(f"{path} has no run_cycle() or webhook to shard")
+
+    module.webhook = forwarder = SignalForwarder(signals, shard)
+    module.last_alert_messages = dict(module.last_alert_messages)  # The coordinator persists the real one
+    module.selected_symbols = []
+    module.market_data.scheduler = RequestScheduler(shard_buckets(shards))
+    if setup is not None:
+        setup(module, shard)
+    current_strategy.set(f"{os.path.basename(path)}#{shard}")
+    if getattr(module, 'metrics_port', None):
+        await start_metrics_server(module.metrics_port + (shard + 1) * WORKER_PORT_STEP)
+
+    trading = None
+    try:
+        while (message := await receive(control)) is not None:
+            if message[0] == 'assign':
+                module.selected_symbols = message[1]
+                keep_symbols(module, message[1])
+                if trading is None:
+                    trading = asyncio.create_task(trade(module, shard, signals))
+            elif message[0] == 'delivered':
+                _, symbol, action = message
+                # The coordinator's dispatcher owns the dedupe, this copy only saves forwarding repeats
+                module.last_alert_messages[symbol] = action
+                forwarder.delivered(symbol, action)
+            elif message[0] == 'forget':
+                forget_symbol(module, message[1])
+    finally:
+        if trading is not None:
+            trading.cancel()
+        await module.candle_buffers.flush()
+        await module.market_data.close()
+
+# Worker process entry point, must stay importable for the spawn start method
+def run_worker(*args):
+    asyncio.run(worker_main(*args))
+
+# Coordinator: loads the script for its Telegram handlers, selected_symbols and webhook dispatcher,
+# keeps one worker process per shard running and passes their signals to the dispatcher.
+# `setup(module, shard)` is called in each worker after loading the script, e.g. to point it at
+# fake_exchange.FakeExchange; it must be picklable. `state_path` is the workers' state store, where
+# scripts such as ema keep position_status.
+class ShardPool:
+    def __init__(self, path, workers=DEFAULT_WORKERS, setup=None, state_path=STATE_PATH):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.shards = workers
+        self.setup = setup
+        self.state_path = state_path
+        self.module = load_module(path)
+        if not hasattr(self.module, 'run_cycle') or not hasattr(self.module, 'webhook'):
+            raise ValueError(f"{path} has no run_cycle() or webhook to shard")
+        self.context = multiprocessing.get_context('spawn')
+        self.signals = self.context.Queue()
+        self.controls = [None] * workers
+        self.processes = [None] * workers
+        self.assigned = [[] for _ in range(workers)]
+        self.told = {}  # symbol -> last delivered action the symbol's worker was told about
+        self.last_cycles = {}  # shard -> (symbols, seconds)
+        self.stats = {'signals': 0, 'rebalances': 0, 'restarts': 0}
+
+    def start_worker(self, shard):
+        self.controls[shard] = self.context.Queue()  # A dead worker may have left its queue half read
+        process = self.context.Process(
+            target=run_worker, name=f"{self.name}#{shard}", daemon=True,
+            args=(self.path, shard, self.shards, self.controls[shard], self.signals, self.state_path, self.setup))
+        process.start()
+        self.processes[shard] = process
+        self.controls[shard].put(('assign', self.assigned[shard]))
+
+    # Function to send each worker whose shard of the selected symbols changed its new list
+    def rebalance(self):
+        parts = partition(dict.fromkeys(self.module.selected_symbols), self.shards)
+        changed = [shard for shard in range(self.shards) if parts[shard] != self.assigned[shard]]
+        for shard in changed:
+            self.assigned[shard] = parts[shard]
+            self.controls[shard].put(('assign', parts[shard]))
+        if changed:
+            self.stats['rebalances'] += 1
+            print(f"Shards: {', '.join(f'#{shard} {len(symbols)}' for shard, symbols in enumerate(self.assigned))} symbols")
+
+    # Function to tell workers to forget the alerts the coordinator no longer has, e.g. after /reset_symbols
+    def forget_cleared(self):
+        cleared = [symbol for symbol, action in self.told.items() if self.module.last_alert_messages.get(symbol) != action]
+        for symbol in cleared:
+            del self.told[symbol]
+            self.controls[shard_of(symbol, self.shards)].put(('forget', symbol))
+
+    # Function to restart workers that exited and follow changes to selected_symbols and alerts
+    async def supervise(self):
+        while True:
+            for shard, process in enumerate(self.processes):
+                if not process.is_alive():
+                    print(f"Shard {shard} worker exited with code {process.exitcode}, restarting")
+                    self.stats['restarts'] += 1
+                    self.start_worker(shard)
+            self.forget_cleared()
+            self.rebalance()
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+
+    # Function to tell the symbol's worker that its signal was delivered
+    def delivered(self, symbol, action):
+        self.told[symbol] = action
+        self.controls[shard_of(symbol, self.shards)].put(('delivered', symbol, action))
+
+    def record_cycle(self, shard, symbols, seconds):
+        self.last_cycles[shard] = (symbols, seconds)
+        token = current_strategy.set(f"{self.name}#{shard}")  # Shows each shard's cycles in /stats
+        metrics.observe('cycle', seconds)
+        current_strategy.reset(token)
+        cadence = self.module.ticks.period_ms / 1000
+        if seconds > cadence:
+            print(f"Shard {shard} cycle took {seconds:.1f}s for {symbols} symbols, longer than the {cadence:g}s cadence")
+
+    # Function to pass worker messages to the dispatcher until stop() sends None
+    async def pump(self):
+        loop = asyncio.get_running_loop()
+        while (message := await loop.run_in_executor(None, self.signals.get)) is not None:
+            if message[0] == 'signal':
+                _, shard, symbol, action, payload = message
+                self.stats['signals'] += 1
+                self.module.webhook.submit(symbol, action, payload, on_delivered=partial(self.delivered, symbol, action))
+            elif message[0] == 'cycle':
+                self.record_cycle(*message[1:])
+
+    async def run(self):
+        self.assigned = partition(dict.fromkeys(self.module.selected_symbols), self.shards)
+        for shard in range(self.shards):
+            self.start_worker(shard)
+        print(f"Started {self.shards} workers for {self.name}")
+        await asyncio.gather(self.pump(), self.supervise())
+
+    # Function to stop the workers and send the signals still queued
+    async def close(self):
+        for control in self.controls:
+            if control is not None:
+                control.put(None)
+        loop = asyncio.get_running_loop()
+        for process in filter(None, self.processes):
+            await loop.run_in_executor(None, process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.signals.put(None)
+        await self.module.webhook.close()
+
+async def main(args):
+    pool = ShardPool(args.strategy, args.workers)
+    if hasattr(pool.module, 'metrics_port'):
+        await start_metrics_server(pool.module.metrics_port)
+    try:
+        if args.no_telegram:
+            await pool.run()
+        else:
+            await asyncio.gather(pool.module.start_telegram_bot(), pool.run())
+    finally:
+        await pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one strategy script over several worker processes, "
+                                                 "each polling a hash partition of the selected symbols")
+    parser.add_argument('strategy', help="Script to run, e.g. main.py")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--no-telegram', action='store_true', help="Do not start the /set_symbols bot")
+    args = parser.parse_args()
+
+    import nest_asyncio
+    nest_asyncio.apply()
+
+    asyncio.run(main(args))
@@ -0,0 +1,175 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state.db')
+BUSY_TIMEOUT = 30  # Seconds to wait for another script's write transaction
+MAX_BATCH = 1000  # Changes written per transaction at most
+
+# Crash-safe store for the state the scripts used to keep only in memory: last_alert_messages,
+# position_status and the Telegram-selected symbols. Values live in one SQLite database in WAL
+# mode, keyed by (scope, name, key) where scope is the script's file name, so several scripts
+# (or the strategy runner) can share it. Changes are queued and written in batches by a
+# background thread, so the event loop never waits on disk; loading is a single indexed SELECT.
+class StateStore:
+    def __init__(self, path=STATE_PATH):
+        self.path = path  # None keeps everything in memory (replay and benchmarks)
+        self.changes = queue.SimpleQueue()
+        self.writer = None
+        self.lock = threading.Lock()
+        self.stats = {'changes': 0, 'batches': 0, 'errors': 0}
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')  # Durable across process crashes, WAL keeps it consistent
+        connection.execute('CREATE TABLE IF NOT EXISTS state (scope TEXT, name TEXT, key TEXT, value TEXT, '
+                           'PRIMARY KEY (scope, name, key)) WITHOUT ROWID')
+        return connection
+
+    # Function to switch to another database (None for memory only), flushing pending changes first
+    def open(self, path):
+        self.close()
+        self.path = path
+
+    # Function to read one (scope, name) as a {key: value} dict
+    def load(self, scope, name):
+        if self.path is None:
+            return {}
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute('SELECT key, value FROM state WHERE scope = ? AND name = ?',
+                                          (scope, name)).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            print(f"Error loading {scope} {name} from the state store: {e}")
+            return {}
+        return {key: json.loads(value) for key, value in rows}
+
+    def _submit(self, change):
+        if self.path is None:
+            return
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write, name='state-store', daemon=True)
+                self.writer.start()
+        self.changes.put(change)
+
+    def put(self, scope, name, key, value):
+        self._submit(('put', scope, name, key, json.dumps(value)))
+
+    def delete(self, scope, name, key):
+        self._submit(('delete', scope, name, key, None))
+
+    def clear(self, scope, name):
+        self._submit(('clear', scope, name, None, None))
+
+    # Function to load a whole value stored under (scope, name), e.g. a list of symbols
+    def value(self, scope, name, default=None):
+        return self.load(scope, name).get('', default)
+
+    def save(self, scope, name, value):
+        self.put(scope, name, '', value)
+
+    # Function to get a dict restored from the store that writes its changes back
+    def mapping(self, scope, name):
+        return PersistentDict(self, scope, name)
+
+    # Writer thread: applies every change queued so far in one transaction, until close() sends None
+    def _write(self):
+        connection = self._connect()
+        running = True
+        while running:
+            batch = [self.changes.get()]
+            while len(batch) < MAX_BATCH and not self.changes.empty():
+                batch.append(self.changes.get())
+            if None in batch:
+                running = False
+                batch = [change for change in batch if change is not None]
+            if not batch:
+                continue
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                for op, scope, name, key, value in batch:
+                    if op == 'put':
+                        connection.execute('INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)', (scope, name, key, value))
+                    elif op == 'delete':
+                        connection.execute('DELETE FROM state WHERE scope = ? AND name = ? AND key = ?', (scope, name, key))
+                    else:
+                        connection.execute('DELETE FROM state WHERE scope = ? AND name = ?', (scope, name))
+                connection.execute('COMMIT')
+                self.stats['changes'] += len(batch)
+                self.stats['batches'] += 1
+            except sqlite3.Error as e:
+                print(f"Error writing {len(batch)} changes to the state store: {e}")
+                self.stats['errors'] += 1
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+        connection.close()
+
+    # Function to write out everything queued and stop the writer thread
+    def close(self):
+        with self.lock:
+            writer, self.writer = self.writer, None
+        if writer is not None:
+            self.changes.put(None)
+            writer.join()
+
+# A dict restored from the state store whose changes are queued back to it. Every mutating dict
+# method is covered; values are stored as JSON when set, so changing a nested value in place is
+# not persisted, and copy() returns a plain dict whose changes are not persisted either.
+class PersistentDict(dict):
+    def __init__(self, store, scope, name):
+        super().__init__(store.load(scope, name))
+        self.store = store
+        self.scope = scope
+        self.name = name
+
+    def __setitem__(self, key, value):
+        if key not in self or self[key] != value:
+            self.store.put(self.scope, self.name, key, value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.store.delete(self.scope, self.name, key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self.store.delete(self.scope, self.name, key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.store.delete(self.scope, self.name, key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self.store.clear(self.scope, self.name)
+
+    def copy(self):
+        return dict(self)
+
+# Process-wide store, shared by every script loaded in the process
+state = StateStore()
+atexit.register(state.close)
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from telegram import InputMediaPhoto
+from telegram.error import RetryAfter, TelegramError
+from metrics import metrics
+
+# Telegram allows about one message per second to the same chat, media groups count per item
+MESSAGES_PER_SECOND = 1.0
+MAX_QUEUE_SIZE = 500
+MAX_ATTEMPTS = 5
+BURST_WINDOW = 1.0  # Seconds to wait for more alerts to group with the first one
+MEDIA_GROUP_SIZE = 10  # Telegram's maximum number of photos per media group
+MAX_TEXT_LENGTH = 4096
+
+# One queued alert
+class OutgoingAlert:
+    __slots__ = ('symbol', 'message', 'photo', 'enqueued_at')
+
+    def __init__(self, symbol, message, photo):
+        self.symbol = symbol
+        self.message = message
+        self.photo = photo
+        self.enqueued_at = time.monotonic()
+
+# Queues Telegram alerts and sends them from a background task within the chat rate limit.
+# A text alert and its chart go out as one captioned photo; bursts are grouped into media
+# groups (charts) or a single combined message (text only). Keeps the last_alert_messages
+# dedupe: an alert is skipped if it matches the symbol's last delivered or queued message,
+# and last_alert_messages is only updated once Telegram accepted it.
+class TelegramOutbox:
+    def __init__(self, bot, chat_id, last_alert_messages, messages_per_second=MESSAGES_PER_SECOND,
+                 max_queue_size=MAX_QUEUE_SIZE, burst_window=BURST_WINDOW):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.last_alert_messages = last_alert_messages
+        self.interval = 1 / messages_per_second
+        self.max_queue_size = max_queue_size
+        self.burst_window = burst_window
+        self.pending = {}  # symbol -> queued message
+        self.queue = None
+        self.task = None
+        self.next_send_at = 0.0
+        self.stats = {'sent': 0, 'failed': 0, 'dropped': 0, 'requests': 0, 'flood_waits': 0,
+                      'last_latency': 0.0, 'max_latency': 0.0, 'total_latency': 0.0}
+
+    def _ensure_started(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self.task = asyncio.create_task(self.run())
+
+    # Function to check whether a message was already sent or queued for this symbol
+    def is_duplicate(self, symbol, message):
+        return self.last_alert_messages.get(symbol) == message or self.pending.get(symbol) == message
+
+    # Function to queue an alert (with an optional chart image), returns False if skipped
+    def submit(self, symbol, message, photo=None):
+        if self.is_duplicate(symbol, message):
+            return False
+        self._ensure_started()
+        if hasattr(photo, 'getvalue'):
+            photo = photo.getvalue()  # Keep raw bytes so retries can resend the image
+        try:
+            self.queue.put_nowait(OutgoingAlert(symbol, message, photo))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            print(f"Telegram outbox full, dropping alert for {symbol}")
+            return False
+        self.pending[symbol] = message
+        return True
+
+    def queue_depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def average_latency(self):
+        return self.stats['total_latency'] / self.stats['sent'] if self.stats['sent'] else 0.0
+
+    # Function to collect the first alert and any others arriving within the burst window
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.burst_window
+        while len(batch) < MEDIA_GROUP_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        while True:
+            batch = await self._next_batch()
+            photos = [alert for alert in batch if alert.photo is not None]
+            texts = [alert for alert in batch if alert.photo is None]
+            groups = [photos] if photos else []
+            # Combine text-only alerts into as few messages as fit
+            chunk = []
+            for alert in texts:
+                if chunk and len('\n'.join(a.message for a in chunk + [alert])) > MAX_TEXT_LENGTH:
+                    groups.append(chunk)
+                    chunk = []
+                chunk.append(alert)
+            if chunk:
+                groups.append(chunk)
+
+            for group in groups:
+                try:
+                    await self._send_group(group)
+                except Exception as e:
+                    print(f"Error in Telegram outbox: {e}")
+            for _ in batch:
+                self.queue.task_done()
+
+    async def _wait_for_slot(self, cost):
+        now = time.monotonic()
+        if self.next_send_at > now:
+            await asyncio.sleep(self.next_send_at - now)
+        self.next_send_at = max(now, self.next_send_at) + self.interval * cost
+
+    async def _send_group(self, group):
+        delivered = False
+        started = time.perf_counter()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            # Merged text alerts go out as one message, photos count one slot each
+            await self._wait_for_slot(1 if group[0].photo is None else len(group))
+            try:
+                self.stats['requests'] += 1
+                if group[0].photo is None:
+                    await self.bot.send_message(chat_id=self.chat_id, text='\n'.join(alert.message for alert in group))
+                elif len(group) == 1:
+                    await self.bot.send_photo(chat_id=self.chat_id, photo=group[0].photo, caption=group[0].message)
+                else:
+                    media = [InputMediaPhoto(media=alert.photo, caption=alert.message) for alert in group]
+                    await self.bot.send_media_group(chat_id=self.chat_id, media=media)
+                delivered = True
+                break
+            except RetryAfter as e:
+                # Flood control: wait as long as Telegram asks, then retry the same group
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                self.stats['flood_waits'] += 1
+                self.next_send_at = time.monotonic() + retry_after
+            except TelegramError as e:
+                print(f"Error sending Telegram alert for {', '.join(alert.symbol for alert in group)}: {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+        metrics.observe('dispatch', time.perf_counter() - started, group[0].symbol if len(group) == 1 else '')
+
+        now = time.monotonic()
+        for alert in group:
+            if self.pending.get(alert.symbol) == alert.message:
+                del self.pending[alert.symbol]
+            if delivered:
+                self.last_alert_messages[alert.symbol] = alert.message
+                latency = now - alert.enqueued_at
+                self.stats['sent'] += 1
+                self.stats['last_latency'] = latency
+                self.stats['total_latency'] += latency
+                self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+            else:
+                self.stats['failed'] += 1
+                metrics.increment('telegram_failed', alert.symbol)
+
+    # Function to wait until every queued alert has been sent or given up on
+    async def join(self):
+        if self.queue is not None:
+            await self.queue.join()
+
+    def summary(self):
+        return (f"Telegram outbox: queue {self.queue_depth()}, sent {self.stats['sent']}, failed {self.stats['failed']}, "
+                f"avg latency {self.average_latency():.2f}s, max {self.stats['max_latency']:.2f}s")
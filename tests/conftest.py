@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The modules are flat scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import state
+
+
+# Scripts loaded by the tests must not read or write the live state.db
+@pytest.fixture(autouse=True)
+def memory_state():
+    state.open(None)
+    yield
+    state.close()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from batch_signals import align_closes, rolling_mean_at, sma_vs_day_open_signals
+
+RNG = np.random.default_rng(11)
+
+
+def random_closes(length):
+    return 100 * np.exp(np.cumsum(RNG.normal(0, 0.01, length)))
+
+
+# Per-symbol evaluation as main.py did it before the batch evaluator, on pandas
+def per_symbol_signals(symbols, histories, day_open, amplitude, short_period=3):
+    signals = []
+    for symbol, closes, open_price, amplitude_ratio in zip(symbols, histories, day_open, amplitude):
+        sma_short = pd.DataFrame({'close': closes})['close'].rolling(window=short_period).mean()
+        cross_over = sma_short.iloc[-2] > open_price
+        cross_under = sma_short.iloc[-2] < open_price
+        if amplitude_ratio >= 1.10:
+            if cross_over:
+                signals.append((symbol, "enter_long"))
+            elif cross_under:
+                signals.append((symbol, "enter_short"))
+    return signals
+
+
+def test_rolling_mean_at_matches_pandas():
+    closes = random_closes(30)
+    rolling = pd.Series(closes).rolling(3).mean()
+    for at in (-1, -2, -5, -28, -29, -30):
+        expected = rolling.iloc[at]
+        result = rolling_mean_at(closes, 3, at)
+        assert (np.isnan(expected) and np.isnan(result)) or np.isclose(result, expected)
+
+
+def test_sma_vs_day_open_signals_match_per_symbol_pandas():
+    for _ in range(5):
+        count = 400
+        symbols = [f"SYN{i:03d}/USDT" for i in range(count)]
+        # Mostly full 20-bar windows, some listings with only a few bars
+        histories = [random_closes(int(RNG.choice([2, 3, 4, 20, 20, 20]))) for _ in range(count)]
+        day_open = [closes[-2] * RNG.uniform(0.98, 1.02) for closes in histories]
+        amplitude = RNG.uniform(1.0, 1.2, count)
+        amplitude[:5] = 1.10  # The threshold itself passes
+
+        closes = align_closes(histories, 20)
+        assert sma_vs_day_open_signals(symbols, closes, day_open, amplitude) == \
+            per_symbol_signals(symbols, histories, day_open, amplitude)
+
+
+def test_align_closes_keeps_the_latest_bars_right_aligned():
+    closes = align_closes([np.arange(5.0), np.arange(30.0)], 20)
+    assert np.isnan(closes[0, :15]).all()
+    np.testing.assert_array_equal(closes[0, 15:], np.arange(5.0))
+    np.testing.assert_array_equal(closes[1], np.arange(10.0, 30.0))
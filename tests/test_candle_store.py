@@ -0,0 +1,63 @@
+import asyncio
+import numpy as np
+from candle_buffer import CandleBufferSet
+from candle_store import CandleStore
+from fake_exchange import FakeExchange
+from market_data import MarketDataClient
+
+MINUTE = 60_000
+NOW = 1_700_000_000_000 // MINUTE * MINUTE
+
+
+def rows(starts, close=1.0):
+    return [[start, close, close, close, close, 1.0] for start in starts]
+
+
+def test_append_drops_bars_not_closed_by_now_ms(tmp_path):
+    store = CandleStore(str(tmp_path))
+    added = store.append('BTC/USDT', '1m', rows([NOW - 2 * MINUTE, NOW - MINUTE, NOW]), now_ms=NOW)
+    assert added == 2
+    assert list(store.load('BTC/USDT', '1m').timestamps) == [NOW - 2 * MINUTE, NOW - MINUTE]
+
+
+def test_append_keeps_last_row_of_a_repeated_timestamp(tmp_path):
+    store = CandleStore(str(tmp_path))
+    batch = rows([NOW - 3 * MINUTE, NOW - 2 * MINUTE], 1.0) + rows([NOW - 2 * MINUTE], 2.0) + rows([NOW - MINUTE], 3.0)
+    store.append('BTC/USDT', '1m', batch, now_ms=NOW)
+    stored = store.load('BTC/USDT', '1m')
+    assert list(stored.timestamps) == [NOW - 3 * MINUTE, NOW - 2 * MINUTE, NOW - MINUTE]
+    assert list(stored.column('close')) == [1.0, 2.0, 3.0]
+
+
+def client(clock, server_offset_ms=0):
+    market_data = MarketDataClient(clock=clock)
+    market_data.exchange = FakeExchange(latency=0, clock=clock, server_offset_ms=server_offset_ms)
+    return market_data
+
+
+def test_refresh_stores_closed_bars_on_the_exchange_clock(tmp_path):
+    async def run():
+        # The exchange is 30s ahead: its forming bar started after the local clock's
+        market_data = client(lambda: (NOW + 40_000) / 1000, server_offset_ms=30_000)
+        await market_data.sync_clock()
+        buffers = CandleBufferSet(market_data, CandleStore(str(tmp_path)))
+        buffer = await buffers.refresh('BTC/USDT', '1m', 50)
+        await buffers.flush()
+        return buffer, buffers.store.load('BTC/USDT', '1m')
+
+    buffer, stored = asyncio.run(run())
+    assert buffer.last_timestamp == NOW + MINUTE
+    assert stored.last_timestamp == NOW
+    np.testing.assert_array_equal(stored.timestamps, buffer.candles().timestamp[:-1])
+
+
+def test_refresh_keeps_sub_minute_series_in_memory(tmp_path):
+    async def run():
+        buffers = CandleBufferSet(client(lambda: NOW / 1000), CandleStore(str(tmp_path)))
+        buffer = await buffers.refresh('BTC/USDT', '1s', 50)
+        await buffers.flush()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert len(buffer.candles().timestamp) == 50
+    assert not (tmp_path / '1s').exists()
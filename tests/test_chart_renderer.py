@@ -0,0 +1,12 @@
+from candle_buffer import Candles
+from chart_renderer import chart_key, plot_candles
+
+
+def candles(last_close):
+    return Candles.from_ohlcv([[0, 1.0, 2.0, 0.5, 1.5, 10.0], [60_000, 1.5, 2.5, 1.0, last_close, 20.0]])
+
+
+def test_chart_key_changes_while_the_last_bar_forms():
+    first = chart_key(plot_candles, candles(2.0), 'BTC/USDT', 'Alert')
+    assert first == chart_key(plot_candles, candles(2.0), 'BTC/USDT', 'Alert')
+    assert first != chart_key(plot_candles, candles(2.2), 'BTC/USDT', 'Alert')
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+from indicators import EMA, SMA, MACD, IndicatorSeries
+
+# Function to get a random-walk close series
+def random_closes(count, seed):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+
+# Function to feed every close to an indicator, None where it has no value yet
+def run(indicator, closes):
+    return [indicator.update(float(close)) for close in closes]
+
+# Function to compare indicator outputs with a pandas/ta series, None must line up with NaN
+def assert_matches(values, expected):
+    expected = expected.to_numpy()
+    assert [value is None for value in values] == list(np.isnan(expected))
+    valid = ~np.isnan(expected)
+    np.testing.assert_allclose(np.array(values, dtype=float)[valid], expected[valid], rtol=1e-9)
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('period', [2, 10, 50])
+def test_ema_matches_pandas_ewm(seed, period):
+    closes = random_closes(300, seed)
+    expected = pd.Series(closes).ewm(span=period, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(run(EMA(period), closes), expected, rtol=1e-9)
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('period', [1, 3, 20])
+def test_sma_matches_pandas_rolling(seed, period):
+    closes = random_closes(300, seed)
+    assert_matches(run(SMA(period), closes), pd.Series(closes).rolling(window=period).mean())
+
+def test_peek_does_not_commit():
+    closes = random_closes(30, 0)
+    ema, sma = EMA(5), SMA(5)
+    run(ema, closes[:-1])
+    run(sma, closes[:-1])
+    assert ema.peek(closes[-1]) == ema.update(closes[-1])
+    assert sma.peek(closes[-1]) == sma.update(closes[-1])
+
+@pytest.mark.parametrize('seed', range(3))
+def test_macd_matches_ta_including_warm_up(seed):
+    closes = random_closes(300, seed)
+    values = run(MACD(), closes)
+    # ta gives NaN until the signal line is ready: bar window_slow + window_sign - 2
+    assert values[33] is not None and all(value is None for value in values[:33])
+    assert_matches(values, ta.trend.MACD(pd.Series(closes)).macd_diff())
+
+@pytest.mark.parametrize('indicator', [lambda: EMA(2), lambda: EMA(200), lambda: SMA(3), lambda: SMA(30), MACD])
+def test_seed_matches_updating_bar_by_bar(indicator):
+    closes = random_closes(501, 4)
+    for count in (1, 2, 40, 500):
+        seeded, updated = indicator(), indicator()
+        expected = run(updated, closes[:count])[-3:]
+        values = seeded.seed(closes[:count], keep=3)
+        assert [value is None for value in values] == [value is None for value in expected]
+        assert [value for value in values if value is not None] == pytest.approx(
+            [value for value in expected if value is not None], rel=1e-12)
+        assert seeded.update(closes[count]) == pytest.approx(updated.update(closes[count]), rel=1e-12)
+
+# Function to slide a fetch window of `limit` bars over the closes, one new bar per cycle,
+# with repeated cycles in between where no bar closed. Also yields every close up to the window's end.
+def windows(closes, limit):
+    timestamps = np.arange(len(closes), dtype=np.int64) * 60_000
+    for end in range(limit, len(closes) + 1):
+        for _ in range(2):
+            yield timestamps[end - limit:end], closes[end - limit:end], closes[:end]
+
+@pytest.mark.parametrize('limit', [30, 50])
+def test_series_matches_pandas_since_the_first_seed(limit):
+    closes = random_closes(200, 1)
+    series = IndicatorSeries({'ema_short': lambda: EMA(2), 'ema_long': lambda: EMA(50)})
+    for timestamps, window, since_seed in windows(closes, limit):
+        series.sync(timestamps, window, peek_forming=True)
+        for name, period in (('ema_short', 2), ('ema_long', 50)):
+            expected = pd.Series(since_seed).ewm(span=period, adjust=False).mean()
+            assert series.forming[name] == pytest.approx(expected.iloc[-1], rel=1e-12)
+            assert series.get(name, 1) == pytest.approx(expected.iloc[-2], rel=1e-12)
+            assert series.get(name, 2) == pytest.approx(expected.iloc[-3], rel=1e-12)
+
+def test_series_macd_matches_ta_since_the_first_seed():
+    closes = random_closes(200, 2)
+    series = IndicatorSeries({'histogram': MACD})
+    for timestamps, window, since_seed in windows(closes, 50):
+        series.sync(timestamps, window)
+        expected = ta.trend.MACD(pd.Series(since_seed)).macd_diff()
+        assert series.get('histogram', 1) == pytest.approx(expected.iloc[-2], rel=1e-9)
+        assert series.get('histogram', 2) == pytest.approx(expected.iloc[-3], rel=1e-9)
+
+def test_series_keeps_its_state_while_the_window_slides():
+    closes = random_closes(100, 4)
+    series = IndicatorSeries({'ema': lambda: EMA(10)})
+    windows_seen = list(windows(closes, 50))
+    series.sync(*windows_seen[0][:2])
+    seeded = series.indicators['ema']
+    for timestamps, window, _ in windows_seen[1:]:
+        series.sync(timestamps, window)
+    assert series.indicators['ema'] is seeded
+
+def test_series_reseeds_from_the_window_after_a_gap():
+    closes = random_closes(200, 5)
+    timestamps = np.arange(200, dtype=np.int64) * 60_000
+    series = IndicatorSeries({'ema': lambda: EMA(20)})
+    series.sync(timestamps[:50], closes[:50])
+    series.sync(timestamps[120:170], closes[120:170])  # Bars 49..119 were never seen
+    expected = pd.Series(closes[120:170]).ewm(span=20, adjust=False).mean()
+    assert series.get('ema', 1) == pytest.approx(expected.iloc[-2], rel=1e-12)
+
+# Against the fetched window itself (what the per-symbol pandas code computed each cycle), the
+# incremental values differ by the weight the seed still carries, (1 - alpha) ** bars since the seed
+@pytest.mark.parametrize('limit, period', [(500, 200), (50, 10)])
+def test_series_stays_close_to_the_windowed_pandas_values(limit, period):
+    closes = random_closes(limit + 200, 6)
+    series = IndicatorSeries({'ema': lambda: EMA(period)})
+    for timestamps, window, _ in windows(closes, limit):
+        series.sync(timestamps, window)
+    expected = pd.Series(window).ewm(span=period, adjust=False).mean().iloc[-2]
+    assert series.get('ema', 1) == pytest.approx(expected, rel=1e-3)
+
+def test_series_feeds_only_new_bars_while_the_window_grows():
+    closes = random_closes(40, 3)
+    timestamps = np.arange(40, dtype=np.int64) * 60_000
+    series = IndicatorSeries({'sma': lambda: SMA(3)})
+    series.sync(timestamps[:10], closes[:10])
+    seeded = series.indicators['sma']
+    series.sync(timestamps[:20], closes[:20])
+    assert series.indicators['sma'] is seeded
+    assert series.get('sma') == pytest.approx(closes[16:19].mean())
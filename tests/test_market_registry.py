@@ -0,0 +1,76 @@
+import asyncio
+from market_registry import MarketInfo, MarketRegistry
+from prescan import symbol_key
+
+
+def market(symbol, market_type='swap', amount_step=0.001, min_amount=None, min_cost=None, active=True):
+    return {'symbol': symbol, 'id': symbol_key(symbol), 'type': market_type, 'active': active,
+            'precision': {'amount': amount_step, 'price': 0.1},
+            'limits': {'amount': {'min': min_amount}, 'cost': {'min': min_cost}}}
+
+
+def test_symbol_key_normalises_every_spelling():
+    assert symbol_key('BTC/USDT') == 'BTCUSDT'
+    assert symbol_key('BTC/USDT:USDT') == 'BTCUSDT'
+    assert symbol_key(' btcusdt ') == 'BTCUSDT'
+
+
+def test_amount_for_rounds_down_to_the_amount_step():
+    info = MarketInfo(market('BTC/USDT:USDT', amount_step=0.001))
+    assert info.amount_decimals == 3
+    assert info.amount_for(100, 30_000) == 0.003  # 0.00333... rounded down
+    assert info.amount_for(0.3, 0.1) == 3.0  # Not 2.999 from float division
+    assert MarketInfo(market('DOGE/USDT:USDT', amount_step=1)).amount_for(100, 0.3) == 333
+
+
+def test_amount_for_is_none_below_the_market_minimums():
+    info = MarketInfo(market('BTC/USDT:USDT', amount_step=0.001, min_amount=0.002, min_cost=5))
+    assert info.amount_for(10, 30_000) is None  # Rounds down to 0
+    assert info.amount_for(40, 30_000) is None  # 0.001 is below the minimum amount
+    assert info.amount_for(70, 30_000) == 0.002
+    cheap = MarketInfo(market('PEPE/USDT', amount_step=1, min_cost=5))
+    assert cheap.amount_for(4, 0.001) is None  # 4000 tokens but only 4 USDT
+    assert cheap.amount_for(6, 0.001) == 6000
+
+
+def test_registry_resolves_every_spelling_of_the_selected_type():
+    async def load():
+        return {
+            'BTC/USDT:USDT': market('BTC/USDT:USDT'),
+            'BTC/USDT': market('BTC/USDT', market_type='spot'),
+            'ETH/USDT:USDT': market('ETH/USDT:USDT'),
+            'LUNA/USDT:USDT': market('LUNA/USDT:USDT', active=False),
+            'SOL/USDT:USDT': market('SOL/USDT:USDT'),
+        }
+
+    async def run():
+        markets = MarketRegistry(load, market_type='swap', allowed=['BTCUSDT', 'ETHUSDT', 'LUNAUSDT'])
+        await markets.ensure_loaded()
+        return markets
+
+    markets = asyncio.run(run())
+    assert len(markets) == 2
+    assert markets.get('BTCUSDT') is markets.get('BTC/USDT:USDT') is markets.get('BTC/USDT')
+    assert markets.get('BTC/USDT').symbol == 'BTC/USDT:USDT'  # The spot market is not indexed
+    assert 'ETH/USDT' in markets
+    assert 'LUNAUSDT' not in markets  # Inactive
+    assert 'SOLUSDT' not in markets  # Not allowed
+
+
+def test_failed_load_keeps_the_previous_index():
+    results = [{'BTC/USDT:USDT': market('BTC/USDT:USDT')}, None]
+
+    async def load():
+        result = results.pop(0)
+        if result is None:
+            raise ConnectionError('bybit unreachable')
+        return result
+
+    async def run():
+        markets = MarketRegistry(load)
+        await markets.ensure_loaded()
+        await markets.refresh()
+        return markets
+
+    markets = asyncio.run(run())
+    assert 'BTCUSDT' in markets
@@ -0,0 +1,226 @@
+import asyncio
+import ccxt
+from candle_buffer import Candles
+from fake_exchange import FakeExchange
+from market_data import MarketDataClient
+from market_registry import MarketRegistry
+from order_executor import OrderExecutor
+from runner import load_module
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+
+
+async def spot_markets():
+    return {symbol: {'symbol': symbol, 'id': symbol.replace('/', ''), 'type': 'spot',
+                     'precision': {'amount': 0.0001}, 'limits': {'cost': {'min': 5}}}
+            for symbol in SYMBOLS}
+
+
+async def loaded_markets():
+    markets = MarketRegistry(spot_markets, market_type='spot')
+    await markets.ensure_loaded()
+    return markets
+
+
+def client(**kwargs):
+    market_data = MarketDataClient()
+    market_data.exchange = FakeExchange(latency=0, fill_delay=0, **kwargs)
+    return market_data
+
+
+def test_same_signal_places_one_order():
+    async def run():
+        market_data = client()
+        executor = OrderExecutor(market_data, await loaded_markets(), prefix='t', poll_interval=0.01)
+        first = executor.submit('BTC/USDT', 'buy', 10, 100.0, 1)
+        repeat = executor.submit('BTCUSDT', 'buy', 10, 100.0, 1)
+        await executor.join()
+        other = executor.submit('BTC/USDT', 'buy', 10, 100.0, 2)
+        await executor.join()
+        return executor, market_data.exchange, first, repeat, other
+
+    executor, exchange, first, repeat, other = asyncio.run(run())
+    assert repeat is first
+    assert other.client_id != first.client_id
+    assert sorted(exchange.orders) == sorted([first.client_id, other.client_id])
+    assert executor.stats['duplicates'] == 1
+    assert first.status == other.status == 'filled'
+
+
+def test_client_order_id_fits_bybit_limit():
+    executor = OrderExecutor(None, None, prefix='ds')
+    client_id = executor.client_order_id('1000000BABYDOGE/USDT', 'sell', 1_700_000_000)
+    assert len(client_id) <= 36
+    assert client_id.endswith('-sell-1700000000')
+
+
+def test_lost_ack_is_recovered_without_a_second_order():
+    async def run():
+        # Every create_order reaches the exchange but times out before the acknowledgement
+        market_data = client(lost_ack_rate=1.0)
+        executor = OrderExecutor(market_data, await loaded_markets(), prefix='t', poll_interval=0.01)
+        record = executor.submit('ETH/USDT', 'sell', 10, 50.0, 1)
+        await executor.join()
+        return market_data.exchange, record
+
+    exchange, record = asyncio.run(run())
+    assert record.status == 'filled'
+    assert list(exchange.orders) == [record.client_id]
+    assert exchange.calls['create_order'] == 1
+
+
+def test_order_placed_by_an_earlier_run_is_not_placed_again():
+    async def run():
+        market_data = client()
+        restarted = OrderExecutor(market_data, await loaded_markets(), prefix='t', poll_interval=0.01)
+        client_id = restarted.client_order_id('BTC/USDT', 'buy', 1)
+        await market_data.create_order('BTC/USDT', 'market', 'buy', 0.1, 100.0, {'clientOrderId': client_id})
+        record = restarted.submit('BTC/USDT', 'buy', 10, 100.0, 1)  # Rejected as a duplicate, then looked up
+        await restarted.join()
+        return market_data.exchange, record
+
+    exchange, record = asyncio.run(run())
+    assert record.status == 'filled'
+    assert list(exchange.orders) == [record.client_id]
+
+
+def test_new_signal_waits_while_the_side_has_an_order_pending():
+    async def run():
+        market_data = client()
+        market_data.exchange.fill_delay = 0.1
+        executor = OrderExecutor(market_data, await loaded_markets(), prefix='t', poll_interval=0.01)
+        first = executor.submit('BTC/USDT', 'buy', 10, 100.0, 1)
+        next_bar = executor.submit('BTC/USDT', 'buy', 10, 100.0, 2)
+        other_side = executor.submit('BTC/USDT', 'sell', 10, 100.0, 2)
+        await executor.join()
+        after_fill = executor.submit('BTC/USDT', 'buy', 10, 100.0, 3)
+        await executor.join()
+        return executor, market_data.exchange, first, next_bar, other_side, after_fill
+
+    executor, exchange, first, next_bar, other_side, after_fill = asyncio.run(run())
+    assert next_bar is None
+    assert executor.stats['in_flight'] == 1
+    assert sorted(exchange.orders) == sorted([first.client_id, other_side.client_id, after_fill.client_id])
+    assert first.status == other_side.status == after_fill.status == 'filled'
+    assert executor.active == {}
+
+
+def test_order_not_filled_in_time_is_canceled_before_the_next_one():
+    async def run():
+        market_data = client()
+        market_data.exchange.fill_delay = 10
+        executor = OrderExecutor(market_data, await loaded_markets(), prefix='t', poll_interval=0.01, fill_timeout=0.05)
+        first = executor.submit('ETH/USDT', 'buy', 10, 50.0, 1)
+        await executor.join()
+        retry = executor.submit('ETH/USDT', 'buy', 10, 50.0, 2)
+        return market_data.exchange, first, retry
+
+    exchange, first, retry = asyncio.run(run())
+    assert first.status == 'unfilled'
+    assert exchange.orders[first.client_id]['canceled']
+    assert retry is not None and retry.client_id in exchange.orders
+
+
+def test_order_that_fills_after_a_failed_cancel_is_not_placed_again():
+    filled = []
+
+    async def unreachable(*args, **kwargs):
+        raise ccxt.RequestTimeout('bybit cancel_order timed out')
+
+    async def run():
+        market_data = client()
+        market_data.exchange.fill_delay = 0.15
+        market_data.exchange.cancel_order = unreachable
+        executor = OrderExecutor(market_data, await loaded_markets(), prefix='t', poll_interval=0.01, fill_timeout=0.02)
+        first = executor.submit('ETH/USDT', 'buy', 10, 50.0, 1, on_filled=lambda: filled.append(1))
+        await executor.join()
+        status_after_timeout = first.status
+        assert executor.submit('ETH/USDT', 'buy', 10, 50.0, 2) is None  # Still open on the exchange
+        await executor.join()
+        await asyncio.sleep(0.2)
+        assert executor.submit('ETH/USDT', 'buy', 10, 50.0, 3) is None  # Looks it up again: filled meanwhile
+        await executor.join()
+        return market_data.exchange, executor, first, status_after_timeout
+
+    exchange, executor, first, status_after_timeout = asyncio.run(run())
+    assert status_after_timeout == 'unknown'
+    assert first.status == 'filled'
+    assert filled == [1]
+    assert list(exchange.orders) == [first.client_id]
+    assert executor.active == {}
+
+
+def load_day_spot():
+    module = load_module('day.spot')
+    module.market_data.exchange = FakeExchange(latency=0, fill_delay=0)
+    module.executor.poll_interval = 0.01
+    module.markets.load = spot_markets
+    return module
+
+
+# Function to run day.spot's process_symbol on a buy signal: closes at `price`, above the day open,
+# with the latest bar `bar` minutes in
+async def buy_signal(module, symbol, price, bar=0):
+    async def historical_data(symbol, interval):
+        return Candles.from_ohlcv([[60_000 * (bar + i), price, price, price, price, 1.0] for i in range(20)])
+
+    async def day_open_price(symbol):
+        return price / 2
+
+    async def amplitude(symbol):
+        return 1.2
+
+    module.get_historical_data = historical_data
+    module.get_day_open_price = day_open_price
+    module.get_previous_day_amplitude = amplitude
+    await module.process_symbol(symbol)
+
+
+def test_day_spot_remembers_the_buy_only_after_the_fill():
+    async def run():
+        module = load_day_spot()
+        await module.markets.ensure_loaded()
+        await buy_signal(module, 'BTC/USDT', 100.0)
+        assert 'BTC/USDT' not in module.last_alert_messages
+        await module.executor.join()
+        return module
+
+    module = asyncio.run(run())
+    assert module.last_alert_messages['BTC/USDT'] == 'buy'
+
+
+def test_day_spot_does_not_remember_a_skipped_or_failed_buy():
+    async def rejected(*args, **kwargs):
+        raise ccxt.InsufficientFunds('bybit insufficient balance')
+
+    async def run():
+        module = load_day_spot()
+        await module.markets.ensure_loaded()
+        await buy_signal(module, 'SOL/USDT', 100.0)  # Not a known market
+        await buy_signal(module, 'BTC/USDT', 1e9)  # 10 USDT is below the amount step
+        module.market_data.exchange.create_order = rejected
+        await buy_signal(module, 'ETH/USDT', 50.0)
+        await module.executor.join()
+        return module
+
+    module = asyncio.run(run())
+    assert dict(module.last_alert_messages) == {}
+    assert module.executor.stats['skipped'] == 2
+    assert module.executor.stats['failed'] == 1
+
+
+def test_day_spot_buys_once_across_bars_while_the_order_is_pending():
+    async def run():
+        module = load_day_spot()
+        module.market_data.exchange.fill_delay = 0.1
+        await module.markets.ensure_loaded()
+        await buy_signal(module, 'BTC/USDT', 100.0, bar=0)
+        await buy_signal(module, 'BTC/USDT', 100.0, bar=1)  # Next bar, new signal id, first buy not filled yet
+        await module.executor.join()
+        await buy_signal(module, 'BTC/USDT', 100.0, bar=2)  # Filled, so last_alert_messages holds "buy"
+        await module.executor.join()
+        return module
+
+    module = asyncio.run(run())
+    assert len(module.market_data.exchange.orders) == 1
+    assert module.last_alert_messages['BTC/USDT'] == 'buy'
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import ccxt
+import rate_limiter
+from rate_limiter import COLD_PRIORITY, MAX_DEFERRED_CYCLES, RequestScheduler, SymbolPriorities, TokenBucket
+
+
+def test_bucket_grants_the_burst_then_refills_at_its_rate():
+    async def run():
+        bucket = TokenBucket('test', rate=20, capacity=5)
+        started = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        burst = time.monotonic() - started
+        await bucket.acquire(2)
+        return bucket, burst, time.monotonic() - started
+
+    bucket, burst, total = asyncio.run(run())
+    assert burst < 0.05
+    assert total >= 2 / 20 * 0.9  # Two tokens at 20/s
+    assert bucket.stats['granted'] == 6
+    assert bucket.stats['waited'] == 1
+
+
+def test_bucket_serves_waiters_by_priority():
+    async def run():
+        bucket = TokenBucket('test', rate=50, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await bucket.acquire(priority=priority)
+            order.append(name)
+
+        await asyncio.gather(waiter('cold', 0.5), waiter('warm', 0.1), waiter('hot', 0.0))
+        return bucket, order
+
+    bucket, order = asyncio.run(run())
+    assert order == ['hot', 'warm', 'cold']
+    assert bucket.stats['max_queue'] == 3
+
+
+def test_cancelled_waiter_does_not_hold_up_the_queue():
+    async def run():
+        bucket = TokenBucket('test', rate=20, capacity=1)
+        await bucket.acquire()
+        cancelled = asyncio.create_task(bucket.acquire(priority=0.0))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await bucket.acquire(priority=0.5)
+        return bucket
+
+    bucket = asyncio.run(run())
+    assert bucket.queue_depth() == 0
+    assert bucket.tokens < 1
+
+
+def test_saturation_is_the_share_of_the_rate_used_recently():
+    async def run():
+        bucket = TokenBucket('test', rate=1, capacity=100)
+        for _ in range(30):
+            await bucket.acquire()
+        return bucket.saturation()
+
+    assert asyncio.run(run()) == 30 / (1 * rate_limiter.SATURATION_WINDOW)
+
+
+def test_rate_limit_error_pauses_the_bucket_and_retries(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'RATE_LIMIT_COOLDOWN', 0.05)
+    calls = []
+
+    async def request():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise ccxt.RateLimitExceeded('bybit too many visits')
+        return 'ok'
+
+    async def run():
+        scheduler = RequestScheduler(buckets={'public': (1000, 1000)})
+        return scheduler, await scheduler.call('fetch_ohlcv', request)
+
+    scheduler, result = asyncio.run(run())
+    assert result == 'ok'
+    assert calls[1] - calls[0] >= 0.05
+    assert scheduler.buckets['public'].stats['rate_limited'] == 1
+
+
+def test_all_symbols_are_due_while_the_budget_has_room():
+    priorities = SymbolPriorities()
+    priorities.set('BTC/USDT', 0.5)
+    assert priorities.due(['BTC/USDT', 'ETH/USDT'], saturation=0.5) == ['BTC/USDT', 'ETH/USDT']
+    assert priorities.deferred == {}
+
+
+def test_cold_symbols_are_deferred_when_saturated_but_not_forever():
+    priorities = SymbolPriorities()
+    priorities.set('BTC/USDT', COLD_PRIORITY)  # Cold
+    priorities.set('ETH/USDT', 0.0)  # About to trigger; SOL/USDT was never evaluated, so also hot
+    symbols = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+    checked = [priorities.due(symbols, saturation=0.9) for _ in range(MAX_DEFERRED_CYCLES + 1)]
+    assert checked[:MAX_DEFERRED_CYCLES] == [['ETH/USDT', 'SOL/USDT']] * MAX_DEFERRED_CYCLES
+    assert checked[-1] == symbols
+    assert 'BTC/USDT' not in priorities.deferred
+
+
+def test_discard_forgets_symbols_no_longer_selected():
+    priorities = SymbolPriorities()
+    priorities.set('BTC/USDT', 0.5)
+    priorities.set('ETH/USDT', 0.5)
+    priorities.due(['BTC/USDT', 'ETH/USDT'], saturation=0.9)
+    priorities.discard(['ETH/USDT'])
+    assert priorities.values == {'ETH/USDT': 0.5}
+    assert priorities.deferred == {'ETH/USDT': 1}
@@ -0,0 +1,31 @@
+import pytest
+from candle_buffer import CandleBufferSet
+from htf_cache import HigherTimeframeCache
+from market_data import MarketDataClient
+from runner import DEFAULT_STRATEGIES, StrategyRunner, load_plugin
+
+
+def clients(module):
+    # Every MarketDataClient reachable from the script's globals, one attribute or bound method deep
+    found = []
+    for value in vars(module).values():
+        for candidate in [value] + list(getattr(value, '__dict__', {}).values()):
+            candidate = getattr(candidate, '__self__', candidate)
+            if isinstance(candidate, MarketDataClient):
+                found.append(candidate)
+    return found
+
+
+def test_default_strategies_all_load(capsys):
+    runner = StrategyRunner(DEFAULT_STRATEGIES, market_data=MarketDataClient())
+    assert [plugin.path for plugin in runner.plugins] == DEFAULT_STRATEGIES
+    assert 'Error loading strategy' not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('path', DEFAULT_STRATEGIES + ['day.spot'])
+def test_plugin_only_reaches_the_shared_client(path):
+    market_data = MarketDataClient()
+    module = load_plugin(path, market_data, CandleBufferSet(market_data), HigherTimeframeCache(market_data)).module
+    found = clients(module)
+    assert found
+    assert all(client is market_data for client in found)
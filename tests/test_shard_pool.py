@@ -0,0 +1,72 @@
+import asyncio
+import time
+from shard_pool import ShardPool, keep_symbols
+from webhook_stub_server import start_stub
+
+# A strategy that signals "buy" for every selected symbol each second unless that was its last alert
+PROBE = '''
+from fake_exchange import FakeExchange
+from market_data import MarketDataClient
+from state_store import state
+from tick_scheduler import TickScheduler
+from webhook_dispatcher import WebhookDispatcher
+
+market_data = MarketDataClient()
+market_data.exchange = FakeExchange(latency=0)
+ticks = TickScheduler('1s', market_data, delay=0)
+last_alert_messages = state.mapping('probe', 'last_alert_messages')
+alert_thresholds = {}
+selected_symbols = []
+webhook = WebhookDispatcher(None, last_alert_messages)
+
+def remember(symbol):
+    alert_thresholds[symbol] = 1.0
+
+async def run_cycle():
+    for symbol in selected_symbols:
+        if last_alert_messages.get(symbol) != "buy":
+            webhook.submit(symbol, "buy", {"action": "buy", "symbol": symbol}, on_delivered=lambda: remember(symbol))
+'''
+
+
+async def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_reset_lets_the_same_signal_through_again(tmp_path):
+    path = tmp_path / 'probe.py'
+    path.write_text(PROBE)
+
+    async def run():
+        pool = ShardPool(str(path), workers=1, state_path=None)
+        runner, url, stub = await start_stub(latency=0)
+        pool.module.webhook.url = url
+        pool.module.selected_symbols = ['BTC/USDT']
+        task = asyncio.create_task(pool.run())
+        try:
+            await wait_for(lambda: len(stub['payloads']) == 1)
+            await wait_for(lambda: 'BTC/USDT' in pool.told)
+            # /reset_symbols followed by /set_symbols with the same symbol before the next rebalance
+            pool.module.last_alert_messages.clear()
+            await wait_for(lambda: len(stub['payloads']) == 2)
+        finally:
+            task.cancel()
+            await pool.close()
+            await runner.cleanup()
+        return stub['payloads']
+
+    payloads = asyncio.run(run())
+    assert [payload['symbol'] for payload in payloads] == ['BTC/USDT', 'BTC/USDT']
+
+
+def test_keep_symbols_drops_alert_state_of_symbols_moved_away():
+    class Module:
+        last_alert_messages = {'BTC/USDT': 'buy', 'ETH/USDT': 'sell'}
+        alert_thresholds = {'BTC/USDT': {'long': 1.0}, 'ETH/USDT': {'long': 2.0}}
+
+    keep_symbols(Module, ['ETH/USDT'])
+    assert Module.last_alert_messages == {'ETH/USDT': 'sell'}
+    assert Module.alert_thresholds == {'ETH/USDT': {'long': 2.0}}
@@ -0,0 +1,67 @@
+from state_store import StateStore, MAX_BATCH
+
+
+def reopened(path, name='last_alert_messages'):
+    return dict(StateStore(path).mapping('script', name))
+
+
+def test_every_mutation_is_reloaded_after_a_restart(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = StateStore(path)
+    alerts = store.mapping('script', 'last_alert_messages')
+    alerts['BTC/USDT'] = 'buy'
+    alerts['ETH/USDT'] = 'sell'
+    alerts.update({'SOL/USDT': 'buy'}, XRP='sell')
+    alerts |= {'ADA/USDT': 'buy', 'DOT/USDT': 'buy'}
+    alerts.setdefault('LTC/USDT', 'sell')
+    del alerts['ETH/USDT']
+    alerts.pop('XRP')
+    key, _ = alerts.popitem()
+    store.save('script', 'selected_symbols', ['BTC/USDT'])
+    store.close()
+
+    expected = {'BTC/USDT': 'buy', 'SOL/USDT': 'buy', 'ADA/USDT': 'buy', 'DOT/USDT': 'buy', 'LTC/USDT': 'sell'}
+    del expected[key]
+    assert dict(alerts) == expected
+    assert reopened(path) == expected
+    assert StateStore(path).value('script', 'selected_symbols') == ['BTC/USDT']
+
+
+def test_clear_and_copy(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = StateStore(path)
+    alerts = store.mapping('script', 'last_alert_messages')
+    alerts['BTC/USDT'] = 'buy'
+    snapshot = alerts.copy()
+    snapshot['ETH/USDT'] = 'sell'  # A plain dict, not persisted
+    assert type(snapshot) is dict
+    store.close()
+    assert reopened(path) == {'BTC/USDT': 'buy'}
+
+    store = StateStore(path)
+    store.mapping('script', 'last_alert_messages').clear()
+    store.close()
+    assert reopened(path) == {}
+
+
+def test_writer_batches_changes_and_close_flushes_them(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = StateStore(path)
+    positions = store.mapping('script', 'position_status')
+    count = 3 * MAX_BATCH
+    for i in range(count):
+        positions[f"SYM{i}/USDT"] = 'long'
+    store.close()
+
+    assert store.stats['changes'] == count
+    assert store.stats['errors'] == 0
+    assert 3 <= store.stats['batches'] < count // 10
+    assert len(reopened(path, 'position_status')) == count
+
+
+def test_memory_only_store_starts_no_writer():
+    store = StateStore(None)
+    alerts = store.mapping('script', 'last_alert_messages')
+    alerts['BTC/USDT'] = 'buy'
+    assert store.writer is None
+    assert store.load('script', 'last_alert_messages') == {}
@@ -0,0 +1,104 @@
+import asyncio
+import datetime as dt
+import time
+from telegram.error import RetryAfter
+from telegram_outbox import TelegramOutbox
+
+INTERVAL = 0.05  # Seconds per message slot in these tests
+
+
+# Records what the outbox sends and when; `flood` RetryAfter errors are raised before the first success
+class FakeBot:
+    def __init__(self, flood=()):
+        self.flood = list(flood)
+        self.sent = []
+
+    async def _send(self, kind, value):
+        if self.flood:
+            raise RetryAfter(self.flood.pop(0))
+        self.sent.append((time.monotonic(), kind, value))
+
+    async def send_message(self, chat_id, text):
+        await self._send('message', text)
+
+    async def send_photo(self, chat_id, photo, caption):
+        await self._send('photo', caption)
+
+    async def send_media_group(self, chat_id, media):
+        await self._send('media_group', [item.caption for item in media])
+
+
+def outbox(bot, last_alert_messages=None):
+    return TelegramOutbox(bot, 1, {} if last_alert_messages is None else last_alert_messages,
+                          messages_per_second=1 / INTERVAL, burst_window=0.05)
+
+
+def test_text_burst_is_merged_and_duplicates_are_skipped():
+    async def run():
+        bot = FakeBot()
+        alerts = {'ETH/USDT': 'ETH up'}
+        box = outbox(bot, alerts)
+        assert box.submit('BTC/USDT', 'BTC up')
+        assert not box.submit('BTC/USDT', 'BTC up')  # Already queued
+        assert not box.submit('ETH/USDT', 'ETH up')  # Already delivered
+        assert box.submit('SOL/USDT', 'SOL up')
+        await box.join()
+        return bot, alerts
+
+    bot, alerts = asyncio.run(run())
+    assert [(kind, value) for _, kind, value in bot.sent] == [('message', 'BTC up\nSOL up')]
+    assert alerts == {'ETH/USDT': 'ETH up', 'BTC/USDT': 'BTC up', 'SOL/USDT': 'SOL up'}
+
+
+def test_charts_are_sent_as_one_photo_or_a_media_group():
+    async def run():
+        bot = FakeBot()
+        box = outbox(bot)
+        box.submit('BTC/USDT', 'BTC up', photo=b'png')
+        await box.join()
+        box.submit('ETH/USDT', 'ETH up', photo=b'png')
+        box.submit('SOL/USDT', 'SOL up', photo=b'png')
+        await box.join()
+        return bot
+
+    bot = asyncio.run(run())
+    assert [(kind, value) for _, kind, value in bot.sent] == [
+        ('photo', 'BTC up'), ('media_group', ['ETH up', 'SOL up'])]
+
+
+def test_slots_charged_per_photo_but_once_per_merged_text():
+    async def run():
+        bot = FakeBot()
+        box = outbox(bot)
+        for symbol in ('A', 'B', 'C', 'D'):
+            box.submit(symbol, f"{symbol} up", photo=b'png')
+        await box.join()
+        for symbol in ('E', 'F', 'G', 'H'):
+            box.submit(symbol, f"{symbol} up")
+        await box.join()
+        box.submit('I', 'I up')
+        await box.join()
+        return bot
+
+    bot = asyncio.run(run())
+    (group_at, _, _), (text_at, _, _), (next_at, _, _) = bot.sent
+    assert text_at - group_at >= 4 * INTERVAL * 0.9  # The media group used four slots
+    # The merged text used one slot, so the next message only waited for the burst window
+    assert next_at - text_at < 4 * INTERVAL
+
+
+def test_retry_after_waits_as_long_as_telegram_asks():
+    async def run():
+        bot = FakeBot(flood=[dt.timedelta(seconds=0.3)])
+        alerts = {}
+        box = outbox(bot, alerts)
+        started = time.monotonic()
+        box.submit('BTC/USDT', 'BTC up')
+        await box.join()
+        return bot, box, alerts, started
+
+    bot, box, alerts, started = asyncio.run(run())
+    assert len(bot.sent) == 1
+    assert bot.sent[0][0] - started >= 0.3
+    assert box.stats['flood_waits'] == 1
+    assert alerts == {'BTC/USDT': 'BTC up'}
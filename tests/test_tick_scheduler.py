@@ -0,0 +1,44 @@
+from tick_scheduler import TickScheduler
+
+MINUTE = 60_000
+NOW = 1_700_000_000_000 // MINUTE * MINUTE
+DELAY = 1_000
+
+
+def scheduler():
+    return TickScheduler('1m', None, delay=DELAY / 1000)
+
+
+def test_ticks_land_just_after_each_close():
+    ticks = scheduler()
+    assert ticks.plan(NOW + 10_000) == NOW + MINUTE + DELAY
+    # A cycle that finished within the bar sleeps until the next close
+    assert ticks.plan(NOW + MINUTE + DELAY + 500) == NOW + 2 * MINUTE + DELAY
+    assert ticks.coalesced == 0
+
+
+def test_tick_waits_for_the_close_delay_before_counting_a_bar_as_closed():
+    ticks = scheduler()
+    # 0.5s after the close is still inside the delay, so that close's tick is planned rather than run now
+    assert ticks.plan(NOW + 500) == NOW + DELAY
+
+
+def test_overrun_past_several_closes_runs_one_catch_up_tick():
+    ticks = scheduler()
+    ticks.plan(NOW + 10_000)
+    ticks.plan(NOW + MINUTE + DELAY + 500)  # Planned for the close at NOW + 2 minutes
+    finished = NOW + 5 * MINUTE + 30_000  # The cycle for 2 minutes overran the closes at 3, 4 and 5
+    assert ticks.plan(finished) == finished  # Runs right away, once, for the latest close
+    assert ticks.coalesced == 2
+    # Back on the grid afterwards instead of replaying each missed close
+    assert ticks.plan(finished + 2_000) == NOW + 6 * MINUTE + DELAY
+    assert ticks.coalesced == 2
+
+
+def test_overrun_by_less_than_a_bar_runs_right_away_without_coalescing():
+    ticks = scheduler()
+    ticks.plan(NOW + 10_000)  # Planned for the close at NOW + 1 minute
+    finished = NOW + 2 * MINUTE + 5_000
+    assert ticks.plan(finished) == finished
+    assert ticks.coalesced == 0
+    assert ticks.plan(finished + 1_000) == NOW + 3 * MINUTE + DELAY
@@ -0,0 +1,130 @@
+import asyncio
+import email.utils
+import time
+import pytest
+from aiohttp import web
+import webhook_dispatcher
+from webhook_dispatcher import WebhookDispatcher, retry_after_delay
+from webhook_stub_server import start_stub
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(webhook_dispatcher, 'BACKOFF_BASE', 0.001)
+
+def payload(symbol, action):
+    return {'symbol': symbol, 'action': action, 'bot_uuid': 'test'}
+
+# Function to serve the given HTTP statuses in turn (then 200), returns (runner, url, requests)
+async def start_scripted(statuses, headers=None):
+    requests = []
+
+    async def webhook(request):
+        requests.append((time.monotonic(), await request.json()))
+        status = statuses.pop(0) if statuses else 200
+        return web.Response(status=status, text='scripted', headers=headers if status != 200 else None)
+
+    app = web.Application()
+    app.router.add_post('/signal_bots/webhooks', webhook)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/signal_bots/webhooks", requests
+
+# Function to run `scenario(dispatcher, last_alert_messages)` against a server, closing both afterwards
+def run(start, scenario):
+    async def main():
+        runner, url, server = await start
+        last_alert_messages = {}
+        dispatcher = WebhookDispatcher(url, last_alert_messages)
+        try:
+            await scenario(dispatcher, last_alert_messages)
+            await dispatcher.close()
+        finally:
+            await runner.cleanup()
+        return dispatcher, last_alert_messages, server
+    return asyncio.run(main())
+
+def test_signals_for_a_symbol_arrive_in_submission_order():
+    actions = ['enter_long', 'exit_long', 'enter_short', 'exit_short']
+
+    async def scenario(dispatcher, last_alert_messages):
+        for action in actions:
+            for symbol in ('BTCUSDT', 'ETHUSDT'):
+                assert dispatcher.submit(symbol, action, payload(symbol, action))
+
+    dispatcher, last_alert_messages, stub = run(start_stub(latency=0.01), scenario)
+    for symbol in ('BTCUSDT', 'ETHUSDT'):
+        assert [p['action'] for p in stub['payloads'] if p['symbol'] == symbol] == actions
+    assert last_alert_messages == {'BTCUSDT': 'exit_short', 'ETHUSDT': 'exit_short'}
+
+def test_duplicates_are_skipped_while_queued_and_after_delivery():
+    async def scenario(dispatcher, last_alert_messages):
+        assert dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+        assert not dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+        await dispatcher.join()
+        assert not dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+        assert dispatcher.submit('BTCUSDT', 'enter_short', payload('BTCUSDT', 'enter_short'))
+
+    dispatcher, last_alert_messages, stub = run(start_stub(latency=0.01), scenario)
+    assert [p['action'] for p in stub['payloads']] == ['enter_long', 'enter_short']
+    assert dispatcher.stats['delivered'] == 2
+
+def test_alternating_signals_queued_together_are_all_sent():
+    async def scenario(dispatcher, last_alert_messages):
+        for action in ('enter_long', 'exit_long', 'enter_long'):
+            assert dispatcher.submit('BTCUSDT', action, payload('BTCUSDT', action))
+        assert not dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+
+    dispatcher, last_alert_messages, stub = run(start_stub(latency=0.01), scenario)
+    assert [p['action'] for p in stub['payloads']] == ['enter_long', 'exit_long', 'enter_long']
+    assert last_alert_messages == {'BTCUSDT': 'enter_long'}
+    assert dispatcher.pending == {}
+
+def test_signal_is_checked_against_the_queued_action_before_the_delivered_one():
+    async def scenario(dispatcher, last_alert_messages):
+        last_alert_messages['BTCUSDT'] = 'enter_long'
+        assert dispatcher.submit('BTCUSDT', 'exit_long', payload('BTCUSDT', 'exit_long'))
+        assert dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+
+    dispatcher, last_alert_messages, stub = run(start_stub(latency=0.01), scenario)
+    assert [p['action'] for p in stub['payloads']] == ['exit_long', 'enter_long']
+
+def test_server_errors_are_retried_until_delivered():
+    async def scenario(dispatcher, last_alert_messages):
+        dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+
+    dispatcher, last_alert_messages, requests = run(start_scripted([500, 502]), scenario)
+    assert len(requests) == 3
+    assert dispatcher.stats == {'delivered': 1, 'failed': 0, 'retries': 2, 'dropped': 0}
+    assert last_alert_messages == {'BTCUSDT': 'enter_long'}
+
+def test_rejected_payloads_are_not_retried_or_recorded():
+    delivered = []
+
+    async def scenario(dispatcher, last_alert_messages):
+        dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'), on_delivered=lambda: delivered.append(1))
+
+    dispatcher, last_alert_messages, requests = run(start_scripted([400]), scenario)
+    assert len(requests) == 1
+    assert dispatcher.stats['failed'] == 1
+    assert last_alert_messages == {} and delivered == []
+
+def test_rate_limited_retries_wait_for_retry_after():
+    async def scenario(dispatcher, last_alert_messages):
+        dispatcher.submit('BTCUSDT', 'enter_long', payload('BTCUSDT', 'enter_long'))
+
+    dispatcher, last_alert_messages, requests = run(start_scripted([429], {'Retry-After': '0.3'}), scenario)
+    assert len(requests) == 2
+    assert requests[1][0] - requests[0][0] >= 0.3
+    assert last_alert_messages == {'BTCUSDT': 'enter_long'}
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_delay('2') == 2.0
+    assert retry_after_delay('1.5') == 1.5
+    assert retry_after_delay(email.utils.formatdate(time.time() + 10, usegmt=True)) == pytest.approx(10, abs=1.5)
+    assert retry_after_delay(email.utils.formatdate(time.time() - 10, usegmt=True)) == 0.0
+    assert retry_after_delay('3600') == webhook_dispatcher.RETRY_AFTER_MAX
+    assert retry_after_delay(None) is None
+    assert retry_after_delay('soon') is None
@@ -0,0 +1,34 @@
+import asyncio
+import ccxt
+
+CLOSE_DELAY = 1.0  # Seconds to wait after a bar closes so the exchange has finalised it
+
+# Wakes a polling loop just after each bar of `timeframe` closes on the exchange clock.
+# A cycle that runs past one or more closes is followed by a single catch-up tick right away,
+# so overruns are coalesced instead of shifting every later tick.
+class TickScheduler:
+    def __init__(self, timeframe, market_data, delay=CLOSE_DELAY):
+        self.timeframe = timeframe
+        self.period_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.market_data = market_data
+        self.delay_ms = delay * 1000
+        self.last_close = None  # Close time (server ms) of the bar the last planned tick is for
+        self.coalesced = 0
+
+    # Function to plan the next tick after a cycle finished at server time now_ms, returns when to run it
+    def plan(self, now_ms):
+        latest = (now_ms - self.delay_ms) // self.period_ms * self.period_ms  # Latest close that is ready
+        if self.last_close is not None and latest > self.last_close:
+            missed = int((latest - self.last_close) // self.period_ms) - 1
+            if missed:
+                self.coalesced += missed
+                print(f"Cycle overran, coalesced {missed} missed {self.timeframe} ticks")
+            self.last_close = latest
+            return now_ms
+        self.last_close = latest + self.period_ms
+        return self.last_close + self.delay_ms
+
+    # Function to sleep until just after the next bar close
+    async def wait(self):
+        now_ms = await self.market_data.server_time_ms()
+        await asyncio.sleep(max(0.0, self.plan(now_ms) - now_ms) / 1000)
@@ -0,0 +1,146 @@
+import asyncio
+import email.utils
+import random
+import time
+import aiohttp
+from metrics import metrics
+
+MAX_QUEUE_SIZE = 1000
+WORKERS = 8
+CONNECTION_LIMIT = 20
+REQUEST_TIMEOUT = 10
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20
+RETRY_AFTER_MAX = 60  # Longest Retry-After wait honoured, in seconds
+
+# Function to get a retry delay with exponential backoff and full jitter
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+# Function to read a Retry-After header (seconds or an HTTP date) as a delay, None if missing or invalid
+def retry_after_delay(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+# Sends 3commas webhook signals from a bounded queue over a pooled aiohttp session.
+# Keeps the last_alert_messages dedupe: a signal is skipped if it repeats the symbol's most recently
+# queued action, or its last delivered one when nothing is queued, and last_alert_messages is only
+# updated on HTTP 200. Alternating signals (A, B, A) are all sent, in order.
+class WebhookDispatcher:
+    def __init__(self, url, last_alert_messages, workers=WORKERS, max_queue_size=MAX_QUEUE_SIZE,
+                 connection_limit=CONNECTION_LIMIT, max_attempts=MAX_ATTEMPTS):
+        self.url = url
+        self.last_alert_messages = last_alert_messages
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.connection_limit = connection_limit
+        self.max_attempts = max_attempts
+        self.pending = {}  # symbol -> its most recently queued (symbol, action, payload, on_delivered)
+        self.symbol_locks = {}  # Keeps signals for the same symbol in submission order
+        self.queue = None
+        self.session = None
+        self.tasks = []
+        self.stats = {'delivered': 0, 'failed': 0, 'retries': 0, 'dropped': 0}
+
+    # The queue, session and workers must be created inside the running event loop.
+    # A session assigned beforehand (e.g. replay.PaperWebhookSession) is used as is.
+    def _ensure_started(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+            if self.session is None:
+                self.session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                )
+            self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    # Function to queue a signal without waiting for the HTTP round-trip, returns False if skipped
+    def submit(self, symbol, action, payload, on_delivered=None):
+        queued = self.pending.get(symbol)
+        if (queued[1] if queued is not None else self.last_alert_messages.get(symbol)) == action:
+            return False
+        self._ensure_started()
+        item = (symbol, action, payload, on_delivered)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            print(f"Webhook queue full, dropping alert for {symbol} with action {action}")
+            return False
+        self.pending[symbol] = item
+        metrics.increment('signals', symbol)
+        return True
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            symbol, action, payload, on_delivered = item
+            try:
+                lock = self.symbol_locks.setdefault(symbol, asyncio.Lock())
+                async with lock:
+                    with metrics.timer('dispatch', symbol):
+                        delivered = await self._deliver(symbol, action, payload)
+                    if delivered:
+                        self.last_alert_messages[symbol] = action
+                        if on_delivered is not None:
+                            on_delivered()
+            except Exception as e:
+                print(f"Error dispatching alert for {symbol}: {e}")
+            finally:
+                if self.pending.get(symbol) is item:
+                    del self.pending[symbol]
+                self.queue.task_done()
+
+    async def _deliver(self, symbol, action, payload):
+        bot_uuid = payload.get('bot_uuid')
+        for attempt in range(1, self.max_attempts + 1):
+            delay = None
+            try:
+                async with self.session.post(self.url, json=payload) as response:
+                    content = await response.read()
+                    if response.status == 200:
+                        print(f"Successfully sent alert for {symbol} with action {action} to bot {bot_uuid}")
+                        self.stats['delivered'] += 1
+                        return True
+                    print(f"Failed to send alert for {symbol} to bot {bot_uuid}: {content}")
+                    if 400 <= response.status < 500 and response.status != 429:
+                        break  # Rejected payload, retrying will not help
+                    if response.status in (429, 503):
+                        delay = retry_after_delay(response.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error sending request for {symbol} to bot {bot_uuid}: {e}")
+
+            if attempt < self.max_attempts:
+                self.stats['retries'] += 1
+                await asyncio.sleep(backoff_delay(attempt) if delay is None else delay)
+
+        self.stats['failed'] += 1
+        metrics.increment('webhook_failed', symbol)
+        return False
+
+    def queue_depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    # Function to wait until every queued signal has been delivered or given up on
+    async def join(self):
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self):
+        await self.join()
+        for task in self.tasks:
+            task.cancel()
+        if self.session is not None:
+            await self.session.close()
+        self.queue = None
+        self.session = None
+        self.tasks = []
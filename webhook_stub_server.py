@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import random
+from aiohttp import web
+
+# Local stand-in for the 3commas signal webhook, used to exercise the dispatcher offline.
+# Each request waits `latency` seconds and fails with HTTP 500 with probability `failure_rate`.
+# Counters live in a plain dict made before startup rather than on the app, which aiohttp freezes.
+
+# Function to build the stub app, returns (app, stats)
+def make_app(latency=0.05, failure_rate=0.0, seed=0):
+    rng = random.Random(seed)
+    stats = {'received': 0, 'accepted': 0, 'payloads': []}  # Accepted payloads in arrival order
+
+    async def webhook(request):
+        payload = await request.json()
+        stats['received'] += 1
+        await asyncio.sleep(latency)
+        if rng.random() < failure_rate:
+            return web.Response(status=500, text="stub failure")
+        stats['accepted'] += 1
+        stats['payloads'].append(payload)
+        return web.Response(status=200, text="ok")
+
+    app = web.Application()
+    app.router.add_post('/signal_bots/webhooks', webhook)
+    return app, stats
+
+# Function to start the stub in the current event loop, returns (runner, url, stats)
+async def start_stub(host='127.0.0.1', port=0, latency=0.05, failure_rate=0.0):
+    app, stats = make_app(latency, failure_rate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}/signal_bots/webhooks", stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local 3commas webhook stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    web.run_app(make_app(args.latency, args.failure_rate)[0], host=args.host, port=args.port)